@@ -0,0 +1,141 @@
+# Benchmarks of vtkconverter in the asv (airspeed velocity) style: every time_* method is timed,
+# every peakmem_* method gives the peak resident memory and every track_* method returns the
+# value recorded. They can be run with "asv run" or, without asv, with "python -m benchmarks.run".
+
+import contextlib
+import glob
+import io
+import os
+import time
+
+from vtkconverter import functions
+from vtkconverter.writers import COLUMNAR_FORMATS, missing_dependency
+
+from benchmarks.synthetic import ARRAYS, MESH_EXTENSIONS, benchmark_sizes, synthetic_file
+
+MESH_TYPES = list(MESH_EXTENSIONS)
+OUT_FORMATS = ["point_cloud", "ip_fluent", "csv"] + [
+    out_format for out_format in COLUMNAR_FORMATS if missing_dependency(out_format) is None
+]
+
+
+def quiet():  # The messages of the functions are not printed
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def remove_outputs(fn):  # Files written next to the mesh file
+    for output_fn in glob.glob(glob.escape(fn[:-4]) + "_*"):
+        os.remove(output_fn)
+
+
+class MeshBenchmark:
+    params = (MESH_TYPES, benchmark_sizes())
+    param_names = ["mesh_type", "n_cells"]
+    timeout = 3600
+
+    def setup(self, mesh_type, n_cells):
+        functions.meshtals = dict()
+        functions.scale_factor = 1
+        functions.safety_factor = 1
+        self.fn = synthetic_file(mesh_type, n_cells)
+
+    def open(self):
+        functions.meshtals[self.fn] = functions.MeshTally(self.fn)
+        return functions.meshtals[self.fn]
+
+
+class Open(MeshBenchmark):
+    def time_meshtally(self, mesh_type, n_cells):
+        functions.MeshTally(self.fn)
+
+    def time_meshtally_centers_volumes(self, mesh_type, n_cells):
+        meshtal = functions.MeshTally(self.fn)
+        meshtal.centers
+        meshtal.cell_volumes
+
+    def peakmem_meshtally_centers_volumes(self, mesh_type, n_cells):
+        meshtal = functions.MeshTally(self.fn)
+        meshtal.centers
+        meshtal.cell_volumes
+
+
+class Statistics(MeshBenchmark):
+    def setup(self, mesh_type, n_cells):
+        super().setup(mesh_type, n_cells)
+        self.open().cell_volumes  # The volumes are computed once and saved
+
+    def time_integral_and_average(self, mesh_type, n_cells):
+        functions.integral_and_average(self.fn, ARRAYS[0])
+
+    def time_array_statistics(self, mesh_type, n_cells):
+        functions.array_statistics(self.fn, ARRAYS)
+
+
+class Transform(MeshBenchmark):
+    def setup(self, mesh_type, n_cells):
+        super().setup(mesh_type, n_cells)
+        self.open()
+
+    def time_translate(self, mesh_type, n_cells):
+        with quiet():
+            functions.translate(self.fn, 1, 2, 3)
+
+    def time_rotate(self, mesh_type, n_cells):
+        with quiet():
+            functions.rotate(self.fn, 0, 0, 30)
+
+    def time_fused_transform(self, mesh_type, n_cells):
+        transform = functions.Transform().rotate(0, 0, 30).translate(1, 2, 3).scale(10)
+        with quiet():
+            functions.transform(self.fn, transform)
+
+    def time_joint_mesh(self, mesh_type, n_cells):
+        with quiet():
+            functions.joint_mesh(self.fn, self.fn)
+
+    def peakmem_rotate(self, mesh_type, n_cells):
+        with quiet():
+            functions.rotate(self.fn, 0, 0, 30)
+
+
+class Export(MeshBenchmark):
+    params = (MESH_TYPES, benchmark_sizes(), OUT_FORMATS)
+    param_names = ["mesh_type", "n_cells", "out_format"]
+
+    def setup(self, mesh_type, n_cells, out_format):
+        super().setup(mesh_type, n_cells)
+        meshtal = self.open()
+        meshtal.centers  # Only the writing is timed
+
+    def teardown(self, mesh_type, n_cells, out_format):
+        remove_outputs(self.fn)
+
+    def write(self, out_format):
+        with quiet():
+            functions.write_mesh(self.fn, ARRAYS[:1], out_format)
+
+    def time_write_mesh(self, mesh_type, n_cells, out_format):
+        self.write(out_format)
+
+    def peakmem_write_mesh(self, mesh_type, n_cells, out_format):
+        self.write(out_format)
+
+    def track_rows_per_second(self, mesh_type, n_cells, out_format):
+        start = time.perf_counter()
+        self.write(out_format)
+        return n_cells / (time.perf_counter() - start)
+
+    track_rows_per_second.unit = "rows/s"
+
+    def track_output_megabytes(self, mesh_type, n_cells, out_format):
+        self.write(out_format)
+        fns = glob.glob(glob.escape(self.fn[:-4]) + "_*")
+        return sum(os.path.getsize(fn) for fn in fns) / 1024**2
+
+    track_output_megabytes.unit = "MB"
+
+
+class ExportStreaming(Export):
+    def write(self, out_format):
+        with quiet():
+            functions.write_mesh(self.fn, ARRAYS[:1], out_format, streaming=True)
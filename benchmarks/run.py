@@ -0,0 +1,145 @@
+# Runs the benchmarks without asv: python -m benchmarks.run [-k pattern] [--max-cells 1e7]
+# Every case runs in a new process, so that its peak resident memory is its own. The results
+# are appended to a history file (JSON lines) and compared with the last run of each case.
+
+import argparse
+import datetime
+import inspect
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+HISTORY_FN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("-k", "--filter", default="", help="Only the cases containing this text")
+    parser.add_argument(
+        "--max-cells", default=None, help="Largest mesh, up to 1e8 (1e6 by default)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="The best time is kept")
+    parser.add_argument("--history", default=HISTORY_FN)
+    parser.add_argument(
+        "--threshold", type=float, default=1.2, help="Slowdown reported as a regression"
+    )
+    return parser.parse_args(argv)
+
+
+def benchmark_cases():  # (class name, method name, parameters)
+    from benchmarks import benchmarks
+
+    for class_name, benchmark in inspect.getmembers(benchmarks, inspect.isclass):
+        if benchmark.__module__ != benchmarks.__name__ or benchmark is benchmarks.MeshBenchmark:
+            continue
+        methods = [
+            name
+            for name in dir(benchmark)
+            if name.startswith(("time_", "peakmem_", "track_"))
+        ]
+        for params in itertools.product(*benchmark.params):
+            for method in methods:
+                yield class_name, method, params
+
+
+# RUN ONE CASE (IN A WORKER PROCESS)
+def run_case(class_name, method_name, params, repeat):
+    from benchmarks import benchmarks
+    from vtkconverter.functions import peak_memory
+
+    benchmark = getattr(benchmarks, class_name)()
+    values = []
+    for _ in range(repeat if method_name.startswith("time_") else 1):
+        benchmark.setup(*params)
+        try:
+            start = time.perf_counter()
+            value = getattr(benchmark, method_name)(*params)
+            values.append(time.perf_counter() - start if value is None else value)
+        finally:
+            if hasattr(benchmark, "teardown"):
+                benchmark.teardown(*params)
+    if method_name.startswith("time_"):
+        return min(values), peak_memory()
+    if method_name.startswith("peakmem_"):
+        return peak_memory(), peak_memory()
+    return values[0], peak_memory()
+
+
+def commit_id():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def load_history(fn):  # Last result of each case
+    last = dict()
+    if os.path.isfile(fn):
+        with open(fn, "r") as f:
+            for line in f:
+                record = json.loads(line)
+                last[record["case"]] = record
+    return last
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    if args.max_cells is not None:  # Read by benchmark_sizes() in this and in the workers
+        os.environ["VTKCONVERTER_BENCHMARK_MAX_CELLS"] = args.max_cells
+    last = load_history(args.history)
+    date = datetime.datetime.now().isoformat(timespec="seconds")
+    environment = {"commit": commit_id(), "python": platform.python_version()}
+    environment["machine"] = platform.node()
+    n_regressions = 0
+    with open(args.history, "a") as history:
+        for class_name, method_name, params in benchmark_cases():
+            case = f"{class_name}.{method_name}{params}"
+            if args.filter not in case:
+                continue
+            # A new process for every case, the memory of the previous ones is not counted
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(run_case, class_name, method_name, params, args.repeat)
+                try:
+                    value, peak = future.result()
+                except Exception as e:
+                    print(f" {case}: FAILED {type(e).__name__}: {e}")
+                    continue
+            record = {"case": case, "date": date, "value": value, "peak_rss_mb": peak}
+            record.update(environment)
+            if value is None:  # The peak memory cannot be known (Windows)
+                message = f" {case}: unknown"
+            elif method_name.startswith("peakmem_"):
+                message = f" {case}: {value:.0f} MB"
+            else:
+                message = f" {case}: {value:.4g}"
+            if method_name.startswith("time_"):
+                message += f" s, {params[1] / value:.3g} cells/s"
+            if peak is not None and not method_name.startswith("peakmem_"):
+                message += f", peak RSS {peak:.0f} MB"
+            previous = last.get(case)
+            if previous is not None and method_name.startswith("time_"):
+                ratio = value / previous["value"]
+                message += f" ({ratio:.2f}x the run of {previous['date']})"
+                if ratio > args.threshold:
+                    message += " REGRESSION"
+                    n_regressions += 1
+            print(message)
+            history.write(json.dumps(record) + "\n")
+            history.flush()
+    print(f" {n_regressions} regressions")
+    return 0 if n_regressions == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# Synthetic meshes for the benchmarks. A cube of n x n x n cells with two cell arrays, saved
+# once as .vts, .vtr or .vtu in a directory that is kept between runs.
+
+import os
+import tempfile
+
+import numpy as np
+import pyvista as pv
+
+MESH_EXTENSIONS = {
+    "StructuredGrid": ".vts",
+    "RectilinearGrid": ".vtr",
+    "UnstructuredGrid": ".vtu",
+}
+ARRAYS = ["Value - Total", "Error - Total"]
+DIRECTORY = os.environ.get(
+    "VTKCONVERTER_BENCHMARK_DATA", os.path.join(tempfile.gettempdir(), "vtkconverter-benchmarks")
+)
+
+
+# SIZES OF THE MESHES: 10^3 CELLS UP TO VTKCONVERTER_BENCHMARK_MAX_CELLS (10^6 BY DEFAULT)
+def benchmark_sizes():
+    max_cells = int(float(os.environ.get("VTKCONVERTER_BENCHMARK_MAX_CELLS", "1e6")))
+    return [10**i for i in range(3, 9) if 10**i <= max_cells]
+
+
+def synthetic_mesh(mesh_type, n_cells):
+    side = max(1, round(n_cells ** (1 / 3)))
+    # Non uniform axes, so that the centers and volumes are not all the same
+    axis = np.cumsum(np.linspace(1, 2, side + 1)) - 1
+    mesh = pv.RectilinearGrid(axis, axis * 1.5, axis * 0.5)
+    if mesh_type == "StructuredGrid":
+        mesh = mesh.cast_to_structured_grid()
+    elif mesh_type == "UnstructuredGrid":
+        mesh = mesh.cast_to_unstructured_grid()
+    rng = np.random.default_rng(0)
+    mesh.cell_data[ARRAYS[0]] = rng.lognormal(size=mesh.n_cells)
+    mesh.cell_data[ARRAYS[1]] = rng.uniform(0, 1, size=mesh.n_cells)
+    return mesh
+
+
+def synthetic_file(mesh_type, n_cells):  # The file is only generated the first time
+    os.makedirs(DIRECTORY, exist_ok=True)
+    fn = os.path.join(DIRECTORY, f"{mesh_type}_{n_cells}{MESH_EXTENSIONS[mesh_type]}")
+    if not os.path.isfile(fn):
+        temporary_fn = fn[:-4] + ".tmp" + fn[-4:]  # An interrupted run leaves no broken file
+        synthetic_mesh(mesh_type, n_cells).save(temporary_fn)
+        os.replace(temporary_fn, fn)
+    return fn
@@ -44,5 +44,5 @@ setup(
     packages=["vtkconverter"],  # Required
     python_requires=">=3.7",
     install_requires=["numpy", "pyvista >= 0.36.1", "tqdm"],
-    extras_require={"test": ["unittest"],},
+    extras_require={"test": ["unittest"], "hdf5": ["h5py"], "parquet": ["pyarrow"], "zstd": ["zstandard"],},
 )
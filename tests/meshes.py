@@ -0,0 +1,15 @@
+import numpy as np
+import pyvista as pv
+
+# Small meshes shared by the tests. The cells have different sizes along each axis
+AXIS = np.array([0.0, 1.0, 3.0, 6.0])
+
+
+def rectilinear_grid(axis=AXIS, x_shift=0.0):
+    return pv.RectilinearGrid(axis + x_shift, axis * 2, axis + 1)
+
+
+def linear_mesh(mesh):  # Arrays that are a linear function of the coordinates
+    mesh.cell_data["cell_linear"] = mesh.cell_centers().points @ [1, 2, 3]
+    mesh.point_data["point_linear"] = np.asarray(mesh.points) @ [1, 2, 3]
+    return mesh
@@ -0,0 +1,57 @@
+import os
+import unittest
+from unittest import mock
+from vtkconverter import batch, functions, readers
+
+
+class MyTestCase(unittest.TestCase):
+    def test_find_files(self):
+        filenames = batch.find_files(["tests/data/*.vt?", "tests/data/example.vts"])
+        self.assertIn("tests/data/example.vts", filenames)
+        self.assertIn("tests/data/test_VTK_CUBE_SQUARE.vtr", filenames)
+        self.assertEqual(len(filenames), len(set(filenames)))
+        return
+
+    def test_batch_csv(self):
+        exit_status = batch.main(["tests/data/example.vts", "-a", "Values", "-j", "2"])
+        self.assertEqual(0, exit_status)
+        with open("tests/data/expected_results/example_['Values']_csv.csv", "r") as infile:
+            expected = infile.read()
+        with open("tests/data/example_['Values']_csv.csv", "r") as infile:
+            result = infile.read()
+        os.remove("tests/data/example_['Values']_csv.csv")
+        self.assertEqual(expected, result)
+        return
+
+    def test_convert_all_arrays(self):
+        for streaming in (False, True):
+            session = functions.ConverterSession()
+            init = readers.SlabReader.__init__
+            with mock.patch.object(
+                readers.SlabReader, "__init__", autospec=True, side_effect=init
+            ) as slab_reader:
+                error = batch.convert(
+                    session, "tests/data/example.vts", None, ["csv"], streaming
+                )
+            self.assertIsNone(error)
+            # The file is opened through the session, or read once by the streaming writer
+            self.assertEqual(not streaming, "tests/data/example.vts" in session.meshtals)
+            self.assertEqual(int(streaming), slab_reader.call_count)
+            with open("tests/data/expected_results/example_['Values']_csv.csv", "r") as infile:
+                expected = infile.read()
+            with open("tests/data/example_['Values']_csv.csv", "r") as infile:
+                result = infile.read()
+            os.remove("tests/data/example_['Values']_csv.csv")
+            self.assertEqual(expected, result)
+        return
+
+    def test_batch_failure(self):
+        exit_status = batch.main(
+            ["tests/data/example.vts", "tests/data/missing.vts", "-a", "Wrong", "-j", "1"]
+        )
+        self.assertEqual(1, exit_status)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from vtkconverter import functions
+from vtkconverter.cache import MeshCache
+from numpy.testing import assert_array_equal
+
+EXAMPLE_VTK_FILE = "tests/data/example.vts"
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        functions.disable_cache()
+        shutil.rmtree(self.directory)
+
+    def test_open_from_cache(self):
+        functions.enable_cache(self.directory)
+        functions.meshtals = dict()
+        functions.open_mesh(EXAMPLE_VTK_FILE)
+        original = functions.meshtals[EXAMPLE_VTK_FILE]
+        # The centers are not computed to be saved
+        self.assertNotIn("centers", original._cache)
+        functions.meshtals = dict()
+        functions.open_mesh(EXAMPLE_VTK_FILE)
+        cached = functions.meshtals[EXAMPLE_VTK_FILE]
+        self.assertNotIn("centers", cached._cache)
+        assert_array_equal(original.centers, cached.centers)
+        assert_array_equal(original.points, cached.points)
+        assert_array_equal(original.mesh["Values"], cached.mesh["Values"])
+        self.assertEqual("StructuredGrid", cached.mesh_type)
+        return
+
+    def test_computed_geometry(self):
+        mesh_cache = MeshCache(self.directory)
+        meshtal = functions.MeshTally(EXAMPLE_VTK_FILE)
+        centers = meshtal.centers
+        mesh_cache.store(EXAMPLE_VTK_FILE, meshtal)
+        # Only the centers were computed, so only them are read from the cache
+        mesh, geometry = mesh_cache.load(EXAMPLE_VTK_FILE)
+        self.assertListEqual(["centers"], list(geometry))
+        assert_array_equal(centers, geometry["centers"])
+        return
+
+    def test_shared_index(self):
+        # Two caches on the same directory, e.g. in two processes, do not lose their entries
+        first = MeshCache(self.directory)
+        second = MeshCache(self.directory)
+        first.store("tests/data/example.vts", functions.MeshTally("tests/data/example.vts"))
+        second.store("tests/data/meshtal_14.vts", functions.MeshTally("tests/data/meshtal_14.vts"))
+        self.assertIsNotNone(second.load("tests/data/example.vts"))
+        self.assertIsNotNone(first.load("tests/data/meshtal_14.vts"))
+        return
+
+    def test_eviction(self):
+        mesh_cache = MeshCache(self.directory, max_size=12000)
+        for filename in ["tests/data/example.vts", "tests/data/meshtal_14.vts"]:
+            mesh_cache.store(filename, functions.MeshTally(filename))
+        # The cache is too small for both meshes, the least recently used one is deleted
+        self.assertIsNone(mesh_cache.load("tests/data/example.vts"))
+        self.assertIsNotNone(mesh_cache.load("tests/data/meshtal_14.vts"))
+        self.assertLessEqual(mesh_cache.size(), 12000)
+        self.assertEqual(3, len(os.listdir(self.directory)))  # index, its lock and one entry
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
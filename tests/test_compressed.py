@@ -0,0 +1,67 @@
+import gzip
+import importlib.util
+import lzma
+import os
+import unittest
+from vtkconverter import functions
+from vtkconverter.compressed import CompressedWriter
+
+EXAMPLE_VTK_FILE = "tests/data/example.vts"
+
+
+class MyTestCase(unittest.TestCase):
+    def tearDown(self):
+        functions.compression = None
+        functions.compression_level = None
+        functions.chunk_size = 100000
+
+    def test_compressed_writer(self):
+        text = "".join(f"{i:.3f},{i * 2:.3f}\n" for i in range(1000))
+        for compression, module in [("gzip", gzip), ("xz", lzma)]:
+            fn = f"tests/data/compressed_writer.txt.{compression}"
+            with CompressedWriter(fn, compression, level=1, newline="\r\n") as f:
+                for start in range(0, len(text), 777):
+                    f.write(text[start : start + 777])
+            with module.open(fn, "rb") as f:
+                result = f.read().decode()
+            os.remove(fn)
+            self.assertEqual(text.replace("\n", "\r\n"), result)
+        return
+
+    @unittest.skipUnless(importlib.util.find_spec("zstandard"), "zstandard is not installed")
+    def test_compressed_writer_zstd(self):
+        import zstandard
+
+        with CompressedWriter("tests/data/compressed_writer.txt.zst", "zstd", newline="") as f:
+            f.write("x, y, z, value\n")
+        with open("tests/data/compressed_writer.txt.zst", "rb") as f:
+            result = zstandard.ZstdDecompressor().stream_reader(f).read().decode()
+        os.remove("tests/data/compressed_writer.txt.zst")
+        self.assertEqual("x, y, z, value\n", result)
+        return
+
+    def test_write_mesh_compressed(self):
+        # The decompressed files must be the same as the plain text files
+        mesh_tally = functions.MeshTally(EXAMPLE_VTK_FILE)
+        functions.meshtals = {"mesh_name": mesh_tally}
+        functions.compression = "gzip"
+        functions.chunk_size = 3
+        for out_format, result_fn in [
+            ("point_cloud", "example_Values_point_cloud.txt"),
+            ("ip_fluent", "example_Values_ip_fluent.txt"),
+            ("csv", "example_['Values']_csv.csv"),
+        ]:
+            for streaming in [False, True]:
+                meshtal_fn = EXAMPLE_VTK_FILE if streaming else "mesh_name"
+                functions.write_mesh(meshtal_fn, ["Values"], out_format, streaming=streaming)
+                with open(f"tests/data/expected_results/{result_fn}", "r") as infile:
+                    expected = infile.read()
+                with gzip.open(f"tests/data/{result_fn}.gz", "rt") as infile:
+                    result = infile.read()
+                os.remove(f"tests/data/{result_fn}.gz")
+                self.assertEqual(expected, result)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
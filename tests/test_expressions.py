@@ -0,0 +1,86 @@
+import unittest
+from vtkconverter import expressions, functions
+from vtkconverter.expressions import evaluate, grid_fingerprint, parse_expression
+import numpy as np
+import pyvista as pv
+from numpy.testing import assert_array_almost_equal
+from tests.meshes import rectilinear_grid
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        grid = rectilinear_grid().cast_to_structured_grid()
+        rng = np.random.default_rng(0)
+        neutron = grid.copy()
+        neutron.cell_data["Value - Total"] = rng.uniform(1, 2, grid.n_cells)
+        neutron.cell_data["nhd"] = neutron.cell_data["Value - Total"]
+        neutron.point_data["p"] = rng.uniform(1, 2, grid.n_points)
+        photon = grid.copy()
+        photon.cell_data["Value - Total"] = rng.uniform(0, 1, grid.n_cells).astype(np.float32)
+        other = grid.translate((1, 0, 0))
+        other.cell_data["Value - Total"] = np.ones(grid.n_cells)
+        functions.meshtals = {
+            "neutron.vts": functions.MeshTally("neutron.vts", mesh=neutron),
+            "photon.vts": functions.MeshTally("photon.vts", mesh=photon),
+            "other.vts": functions.MeshTally("other.vts", mesh=other),
+        }
+
+    def test_parse(self):
+        tree, error = parse_expression("a + sqrt(b) * -2.5 / c ** 2")
+        self.assertIsNone(error)
+        self.assertEqual(["a", "b", "c"], expressions.variable_names(tree))
+        for expression in ("a +", "a.b", "open(a)", "a if b else c", "a[0]", "2 * 3", "'a'"):
+            self.assertIsNone(parse_expression(expression)[0])
+        return
+
+    def test_evaluate(self):
+        rng = np.random.default_rng(1)
+        arrays = {"a": rng.uniform(1, 2, 1000), "b": rng.uniform(1, 2, 1000).astype(np.float32)}
+        a, b = arrays["a"], arrays["b"].astype(float)
+        expression = "-(a + b * 1.2) / sqrt(a) + abs(b - a) ** 2 - log10(b)"
+        tree = parse_expression(expression)[0]
+        expected = -(a + b * 1.2) / np.sqrt(a) + np.abs(b - a) ** 2 - np.log10(b)
+        numexpr = expressions.numexpr
+        expressions.numexpr = None  # numpy, even if numexpr is installed
+        try:
+            assert_array_almost_equal(expected, evaluate(tree, expression, arrays, 64))
+        finally:
+            expressions.numexpr = numexpr
+        assert_array_almost_equal(expected, evaluate(tree, expression, arrays, 64))
+        # The operands are not modified
+        assert_array_almost_equal(a, arrays["a"])
+        return
+
+    def test_fingerprint(self):
+        meshtals = functions.meshtals
+        self.assertEqual(meshtals["neutron.vts"].fingerprint, meshtals["photon.vts"].fingerprint)
+        self.assertNotEqual(meshtals["neutron.vts"].fingerprint, meshtals["other.vts"].fingerprint)
+        rectilinear = pv.RectilinearGrid(np.arange(3.0), np.arange(4.0), np.arange(5.0))
+        self.assertNotEqual(
+            grid_fingerprint(rectilinear), grid_fingerprint(rectilinear.cast_to_structured_grid())
+        )
+        return
+
+    def test_calculate_array(self):
+        variables = {"nhd": "Value - Total", "phd": ("photon.vts", "Value - Total")}
+        name = functions.calculate_array("neutron.vts", "Heating", "nhd + phd * 1.2", variables)
+        self.assertEqual("Heating", name)
+        neutron = functions.meshtals["neutron.vts"]
+        photon = functions.meshtals["photon.vts"]
+        expected = neutron.mesh["Value - Total"] + photon.mesh["Value - Total"] * 1.2
+        assert_array_almost_equal(expected, neutron.mesh.cell_data["Heating"])
+        self.assertIn("Heating", neutron.cells_info)
+        # The names that are not variables are arrays of the mesh
+        functions.calculate_array("neutron.vts", "Ratio", "Heating / nhd")
+        assert_array_almost_equal(expected / neutron.mesh["nhd"], neutron.mesh["Ratio"])
+        # Errors
+        variables = {"a": ("other.vts", "Value - Total")}
+        self.assertIsNone(functions.calculate_array("neutron.vts", "X", "nhd + a", variables))
+        self.assertIsNone(functions.calculate_array("neutron.vts", "X", "nhd + p"))
+        self.assertIsNone(functions.calculate_array("neutron.vts", "X", "nhd + missing"))
+        self.assertNotIn("X", neutron.cells_info)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
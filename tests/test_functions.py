@@ -1,4 +1,5 @@
 import os
+import threading
 import unittest
 from vtkconverter import functions
 import numpy as np
@@ -115,6 +116,257 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(expected, result)
         return
 
+    def test_write_mesh_chunked(self):
+        # Rows split across several chunks must give the same files
+        mesh_tally = functions.MeshTally(EXAMPLE_VTK_FILE)
+        functions.meshtals = {"mesh_name": mesh_tally}
+        functions.chunk_size = 3
+        try:
+            for out_format, result_fn in [
+                ("point_cloud", "example_Values_point_cloud.txt"),
+                ("ip_fluent", "example_Values_ip_fluent.txt"),
+                ("csv", "example_['Values']_csv.csv"),
+            ]:
+                functions.write_mesh("mesh_name", ["Values"], out_format)
+                with open(f"tests/data/expected_results/{result_fn}", "r") as infile:
+                    expected = infile.read()
+                with open(f"tests/data/{result_fn}", "r") as infile:
+                    result = infile.read()
+                os.remove(f"tests/data/{result_fn}")
+                self.assertEqual(expected, result)
+        finally:
+            functions.chunk_size = 100000
+        return
+
+    def test_stack_arrays(self):
+        mesh_tally = functions.MeshTally("tests/data/meshtal_14.vts")
+        matrix = functions.stack_arrays(mesh_tally, ["Value - Total", "Error - Total"], 2)
+        self.assertEqual((300, 2), matrix.shape)
+        assert_array_almost_equal(mesh_tally.mesh["Value - Total"] * 2, matrix[:, 0])
+        assert_array_almost_equal(mesh_tally.mesh["Error - Total"] * 2, matrix[:, 1])
+        return
+
+    def test_csv_float32_factor(self):
+        # A float32 array is scaled in float32 by the safety factor in every format, so the csv
+        # values are the same as the point_cloud ones
+        mesh_tally = functions.MeshTally("tests/data/meshtal_14.vts")
+        rng = np.random.default_rng(0)
+        values = rng.uniform(0, 1000, mesh_tally.mesh.n_cells).astype(np.float32)
+        mesh_tally.mesh.cell_data["Single"] = values
+        functions.meshtals = {"tests/data/meshtal_14.vts": mesh_tally}
+        functions.safety_factor = 1.1
+        try:
+            functions.write_mesh("tests/data/meshtal_14.vts", ["Single"], "csv")
+            functions.write_mesh("tests/data/meshtal_14.vts", ["Single"], "point_cloud")
+        finally:
+            functions.safety_factor = 1
+        csv_fn = "tests/data/meshtal_14_['Single']_csv.csv"
+        point_cloud_fn = "tests/data/meshtal_14_Single_point_cloud.txt"
+        with open(csv_fn, "r") as infile:
+            csv_values = [line.split(",")[-1].strip() for line in infile]
+        with open(point_cloud_fn, "r") as infile:
+            point_cloud_values = [line.split(",")[-1].strip() for line in infile][1:]
+        os.remove(csv_fn)
+        os.remove(point_cloud_fn)
+        self.assertListEqual(point_cloud_values, csv_values)
+        return
+
+    def test_write_mesh_streaming(self):
+        # Reading the file by slabs of 3 cells must give the same files as an opened mesh
+        functions.chunk_size = 3
+        try:
+            for out_format, result_fn in [
+                ("point_cloud", "example_Values_point_cloud.txt"),
+                ("ip_fluent", "example_Values_ip_fluent.txt"),
+                ("csv", "example_['Values']_csv.csv"),
+            ]:
+                functions.write_mesh(EXAMPLE_VTK_FILE, ["Values"], out_format, streaming=True)
+                with open(f"tests/data/expected_results/{result_fn}", "r") as infile:
+                    expected = infile.read()
+                with open(f"tests/data/{result_fn}", "r") as infile:
+                    result = infile.read()
+                os.remove(f"tests/data/{result_fn}")
+                self.assertEqual(expected, result)
+        finally:
+            functions.chunk_size = 100000
+        return
+
+    def test_write_mesh_streaming_multi_array(self):
+        filename = "tests/data/meshtal_14.vts"
+        result_fn = "tests/data/meshtal_14_['Value - Total', 'Error - Total']_csv.csv"
+        functions.meshtals = {filename: functions.MeshTally(filename)}
+        functions.write_mesh(filename, ["Value - Total", "Error - Total"], "csv")
+        with open(result_fn, "r") as infile:
+            expected = infile.read()
+        os.remove(result_fn)
+        functions.chunk_size = 50
+        try:
+            functions.write_mesh(
+                filename, ["Value - Total", "Error - Total"], "csv", streaming=True
+            )
+        finally:
+            functions.chunk_size = 100000
+        with open(result_fn, "r") as infile:
+            result = infile.read()
+        os.remove(result_fn)
+        self.assertEqual(expected, result)
+        return
+
+    def test_write_mesh_several_arrays(self):
+        # Writing several arrays at once, in one or several processes, must give the same
+        # files as writing them one by one
+        filename = "tests/data/meshtal_14.vts"
+        functions.meshtals = {filename: functions.MeshTally(filename)}
+        list_array_names = ["Value - Total", "Error - Total"]
+        for out_format in ["point_cloud", "ip_fluent"]:
+            result_fns = [
+                f"tests/data/meshtal_14_{array_name}_{out_format}.txt"
+                for array_name in list_array_names
+            ]
+            expected = []
+            for array_name, result_fn in zip(list_array_names, result_fns):
+                functions.write_mesh(filename, [array_name], out_format)
+                with open(result_fn, "r") as infile:
+                    expected.append(infile.read())
+                os.remove(result_fn)
+            functions.chunk_size = 50
+            functions.export_workers = 2
+            try:
+                functions.write_mesh(filename, list_array_names, out_format)
+            finally:
+                functions.chunk_size = 100000
+                functions.export_workers = 1
+            for expected_text, result_fn in zip(expected, result_fns):
+                with open(result_fn, "r") as infile:
+                    result = infile.read()
+                os.remove(result_fn)
+                self.assertEqual(expected_text, result)
+        return
+
+    def test_write_array_group_closes_files(self):
+        # A file that cannot be opened does not leave the ones already opened open, here the
+        # compression thread of the first one
+        n_threads = threading.active_count()
+        new_names = ["tests/data/first_point_cloud.txt.gz", "tests/data/missing/second.txt.gz"]
+        options = {"progress": False, "compression": "gzip", "level": 1}
+        with self.assertRaises(FileNotFoundError):
+            functions.write_array_group(
+                "point_cloud", np.zeros((2, 3)), [np.zeros(2)] * 2, new_names, 3, 10, options
+            )
+        os.remove(new_names[0])
+        self.assertEqual(n_threads, threading.active_count())
+        return
+
+    def test_sessions_in_threads(self):
+        # Two sessions with different factors, run at the same time, must give the same files
+        # as the default session run with each factor
+        filename = "tests/data/meshtal_14.vts"
+        jobs = [("Value - Total", 10), ("Error - Total", 1)]
+        result_fns = [f"tests/data/meshtal_14_{name}_point_cloud.txt" for name, _ in jobs]
+        expected = []
+        functions.meshtals = {filename: functions.MeshTally(filename)}
+        for (array_name, scale), result_fn in zip(jobs, result_fns):
+            functions.scale_factor = scale
+            functions.write_mesh(filename, [array_name], "point_cloud")
+            with open(result_fn, "r") as infile:
+                expected.append(infile.read())
+            os.remove(result_fn)
+        functions.scale_factor = 1
+        self.assertEqual(1, functions.default_session.scale_factor)
+
+        def run(array_name, scale):
+            session = functions.ConverterSession()
+            session.change_scale_factor(scale)
+            session.open_mesh(filename)
+            session.write_mesh(filename, [array_name], "point_cloud")
+
+        threads = [threading.Thread(target=run, args=job) for job in jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for expected_text, result_fn in zip(expected, result_fns):
+            with open(result_fn, "r") as infile:
+                result = infile.read()
+            os.remove(result_fn)
+            self.assertEqual(expected_text, result)
+        self.assertEqual(1, functions.scale_factor)
+        return
+
+    def test_lazy_attributes(self):
+        mesh_tally = functions.MeshTally(EXAMPLE_VTK_FILE)
+        functions.meshtals = {"mesh_name": mesh_tally}
+        functions.print_general_info("mesh_name")
+        self.assertNotIn("centers", mesh_tally._cache)
+        self.assertAlmostEqual(0.5, mesh_tally.centers[0][0])
+        self.assertIn("centers", mesh_tally._cache)
+        # A change of the geometry invalidates the cached centers
+        mesh_tally.mesh.translate((1, 0, 0), inplace=True)
+        self.assertAlmostEqual(1.5, mesh_tally.centers[0][0])
+        assert_array_almost_equal([2, 2, 2, 2, 2, 2, 2, 2], mesh_tally.cell_volumes)
+        return
+
+    def test_rectilinear_geometry(self):
+        mesh_tally = functions.MeshTally("tests/data/cuvmsh_44_CuV_CELF10.vtr")
+        assert_array_almost_equal(mesh_tally.mesh.cell_centers().points, mesh_tally.centers)
+        volumes = abs(mesh_tally.mesh.compute_cell_sizes()["Volume"])
+        assert_array_almost_equal(volumes, mesh_tally.cell_volumes)
+        return
+
+    def test_translate_rectilinear(self):
+        mesh_tally = functions.MeshTally("tests/data/test_VTK_CUBE_SQUARE.vtr")
+        functions.meshtals = {"mesh_name": mesh_tally}
+        functions.translate("mesh_name", x=1, y=2, z=3)
+        new_meshtal = functions.meshtals["tests/data/test_VTK_CUBE_SQUARE+Trans(1,2,3).vtr"]
+        self.assertEqual("RectilinearGrid", new_meshtal.mesh_type)
+        assert_array_almost_equal(mesh_tally.centers + [1, 2, 3], new_meshtal.centers)
+        return
+
+    def test_transforms_share_arrays(self):
+        mesh_tally = functions.MeshTally(EXAMPLE_VTK_FILE)
+        functions.meshtals = {"mesh_name": mesh_tally}
+        original_points = mesh_tally.points.copy()
+        functions.translate("mesh_name", x=1, y=2, z=3)
+        functions.rotate("mesh_name", theta_z=90)
+        for new_name in [
+            "tests/data/example+Trans(1,2,3).vts",
+            "tests/data/example+Rot(0,0,90).vts",
+        ]:
+            new_meshtal = functions.meshtals[new_name]
+            values = new_meshtal.mesh["Values"]
+            self.assertTrue(np.shares_memory(mesh_tally.mesh["Values"], values))
+            self.assertFalse(np.shares_memory(mesh_tally.points, new_meshtal.points))
+        # The original mesh is not modified
+        assert_array_almost_equal(original_points, mesh_tally.points)
+        return
+
+    def test_array_statistics(self):
+        mesh_tally = functions.MeshTally("tests/data/meshtal_14.vts")
+        functions.meshtals = {"mesh_name": mesh_tally}
+        statistics = functions.array_statistics("mesh_name")
+        self.assertListEqual(["Value - Total", "Error - Total"], list(statistics))
+        stats = statistics["Value - Total"]
+        values = np.asarray(mesh_tally.mesh["Value - Total"])
+        self.assertEqual("cells", stats["type"])
+        self.assertAlmostEqual(values.min(), stats["min"])
+        self.assertAlmostEqual(values.max(), stats["max"])
+        self.assertEqual(0, stats["nan_count"])
+        self.assertEqual(np.count_nonzero(values == 0), stats["zero_count"])
+        self.assertAlmostEqual(np.percentile(values, 50), stats["percentiles"][50])
+        return
+
+    def test_array_statistics_vectors(self):
+        mesh_tally = functions.MeshTally("tests/data/meshtal_14.vts")
+        mesh_tally.mesh.cell_data["Vector"] = np.ones((mesh_tally.mesh.n_cells, 3))
+        functions.meshtals = {"mesh_name": mesh_tally}
+        # The vector array is skipped, the scalar arrays still get their statistics
+        statistics = functions.array_statistics("mesh_name", ["Vector", "Value - Total"])
+        self.assertListEqual(["Value - Total"], list(statistics))
+        self.assertIsNone(functions.integral_and_average("mesh_name", "Vector"))
+        error = functions.write_mesh("mesh_name", ["Vector"], "csv")
+        self.assertIn("several components", error)
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
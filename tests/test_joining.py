@@ -0,0 +1,105 @@
+import unittest
+from vtkconverter import functions
+from vtkconverter.joining import coincident_points, connected_groups, join_meshes
+import numpy as np
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+from tests.meshes import linear_mesh, rectilinear_grid
+
+
+def sectors(n, mesh_type="RectilinearGrid"):  # n meshes one after the other along x
+    meshes = []
+    for k in range(n):
+        mesh = linear_mesh(rectilinear_grid(x_shift=6 * k))
+        if mesh_type == "StructuredGrid":
+            mesh = mesh.cast_to_structured_grid()
+        elif mesh_type == "UnstructuredGrid":
+            mesh = mesh.cast_to_unstructured_grid()
+        meshes.append(mesh)
+    return meshes
+
+
+class MyTestCase(unittest.TestCase):
+    def test_coincident_points(self):
+        rng = np.random.default_rng(0)
+        for tolerance in (0.0, 1e-3, 0.05):
+            points = rng.uniform(0, 1, size=(300, 3))
+            shifts = rng.uniform(-tolerance / 2, tolerance / 2, size=(60, 3))
+            points = np.vstack((points, points[:60] + shifts, points[:20]))
+            # Every pair of points compared
+            distances = np.sum((points[:, None, :] - points[None, :, :]) ** 2, axis=2)
+            i, j = np.nonzero(np.triu(distances <= tolerance**2, 1))
+            expected = connected_groups(len(points), i, j)
+            assert_array_equal(expected, coincident_points(points, tolerance))
+            self.assertTrue(np.all(expected[300:] < 300))
+        return
+
+    def test_tolerance_of_the_spacing(self):
+        # A tolerance close to the spacing of the points puts many points in each cell
+        rng = np.random.default_rng(2)
+        lattice = np.stack(np.meshgrid(*[np.arange(8.0)] * 3, indexing="ij"), -1).reshape(-1, 3)
+        points = np.vstack((lattice, lattice + rng.uniform(-0.4, 0.4, lattice.shape)))
+        distances = np.sum((points[:, None, :] - points[None, :, :]) ** 2, axis=2)
+        for tolerance in (0.3, 0.7, 1.0, 2.5):
+            i, j = np.nonzero(np.triu(distances <= tolerance**2, 1))
+            expected = connected_groups(len(points), i, j)
+            assert_array_equal(expected, coincident_points(points, tolerance))
+        return
+
+    def test_structured_layouts(self):
+        for mesh_type in ("RectilinearGrid", "StructuredGrid"):
+            meshes = sectors(3, mesh_type)
+            joined = join_meshes(meshes)
+            self.assertEqual(mesh_type, type(joined).__name__)
+            self.assertEqual((10, 4, 4), tuple(joined.dimensions))
+            # The arrays are still the linear functions of the coordinates
+            assert_array_almost_equal(
+                joined.cell_centers().points @ [1, 2, 3], joined.cell_data["cell_linear"]
+            )
+            assert_array_almost_equal(
+                np.asarray(joined.points) @ [1, 2, 3], joined.point_data["point_linear"]
+            )
+        # Meshes that do not follow each other are joined as an UnstructuredGrid
+        meshes = sectors(2)
+        self.assertEqual("UnstructuredGrid", type(join_meshes(meshes[::-1])).__name__)
+        self.assertEqual("UnstructuredGrid", type(join_meshes(meshes, None)).__name__)
+        return
+
+    def test_unstructured(self):
+        meshes = sectors(4, "UnstructuredGrid")
+        joined = join_meshes(meshes, tolerance=1e-6)
+        expected = meshes[0].merge(meshes[1:], merge_points=True, tolerance=1e-6)
+        self.assertEqual(expected.n_points, joined.n_points)
+        self.assertEqual(expected.n_cells, joined.n_cells)
+        self.assertAlmostEqual(expected.volume, joined.volume)
+        assert_array_almost_equal(
+            np.asarray(joined.points) @ [1, 2, 3], joined.point_data["point_linear"]
+        )
+        assert_array_almost_equal(
+            np.concatenate([mesh.cell_data["cell_linear"] for mesh in meshes]),
+            joined.cell_data["cell_linear"],
+        )
+        # Without merging, all the points are kept
+        joined = join_meshes(meshes, tolerance=None)
+        self.assertEqual(sum(mesh.n_points for mesh in meshes), joined.n_points)
+        return
+
+    def test_joint_mesh(self):
+        meshes = sectors(3, "StructuredGrid")
+        functions.meshtals = {
+            f"sector{k}.vts": functions.MeshTally(f"sector{k}.vts", mesh=mesh)
+            for k, mesh in enumerate(meshes)
+        }
+        new_name = functions.joint_mesh("sector0.vts", "sector1.vts", "sector2.vts")
+        self.assertEqual("sector0+sector1+sector2.vts", new_name)
+        self.assertEqual("StructuredGrid", functions.meshtals[new_name].mesh_type)
+        # The centers already computed are reused for an UnstructuredGrid
+        centers = [functions.meshtals[f"sector{k}.vts"].centers for k in (2, 0)]
+        new_name = functions.joint_mesh("sector2.vts", "sector0.vts")
+        joined = functions.meshtals[new_name]
+        self.assertEqual("sector2+sector0.vtu", new_name)
+        assert_array_equal(np.concatenate(centers), joined.computed("centers"))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
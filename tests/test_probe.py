@@ -0,0 +1,154 @@
+import os
+import tempfile
+import unittest
+from vtkconverter import functions
+from vtkconverter.probe import LatticeIndex, LocatorIndex
+import numpy as np
+import pyvista as pv
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+from tests.meshes import AXIS, linear_mesh, rectilinear_grid
+
+RECTILINEAR_FILE = "tests/data/test_VTK_CUBE_SQUARE.vtr"
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        rectilinear = linear_mesh(rectilinear_grid())
+        functions.meshtals = {
+            "rectilinear.vtr": functions.MeshTally("rectilinear.vtr", mesh=rectilinear),
+            "structured.vts": functions.MeshTally(
+                "structured.vts", mesh=rectilinear.cast_to_structured_grid()
+            ),
+            "unstructured.vtu": functions.MeshTally(
+                "unstructured.vtu", mesh=rectilinear.cast_to_unstructured_grid()
+            ),
+        }
+        rng = np.random.default_rng(0)
+        self.points = rng.uniform([0, 0, 1], [6, 12, 7], size=(500, 3))
+
+    def test_index_types(self):
+        meshtals = functions.meshtals
+        self.assertIsInstance(meshtals["rectilinear.vtr"].spatial_index, LatticeIndex)
+        self.assertIsInstance(meshtals["structured.vts"].spatial_index, LatticeIndex)
+        self.assertIsInstance(meshtals["unstructured.vtu"].spatial_index, LocatorIndex)
+        # The index is built once and reused
+        index = meshtals["unstructured.vtu"].spatial_index
+        self.assertIs(index, meshtals["unstructured.vtu"].spatial_index)
+        return
+
+    def test_nearest(self):
+        expected = functions.meshtals["rectilinear.vtr"].mesh.find_containing_cell(self.points)
+        cell_values = functions.meshtals["rectilinear.vtr"].mesh.cell_data["cell_linear"]
+        for name in functions.meshtals:
+            result = functions.probe(name, self.points, ["cell_linear", "point_linear"])
+            assert_array_almost_equal(cell_values[expected], result["cell_linear"])
+            # The closest point of the cell of every point
+            points = functions.meshtals[name].points
+            closest = np.argmin(
+                np.sum((self.points[:, None, :] - points[None, :, :]) ** 2, axis=2), axis=1
+            )
+            assert_array_almost_equal(points[closest] @ [1, 2, 3], result["point_linear"])
+        return
+
+    def test_trilinear(self):
+        exact = self.points @ [1, 2, 3]
+        outside = np.array([[-1.0, 0, 0], [0, 0, 100]])
+        functions.chunk_size = 128  # Several batches
+        try:
+            for name in functions.meshtals:
+                result = functions.probe(
+                    name, np.vstack((self.points, outside)), method="trilinear"
+                )
+                # A linear function is interpolated exactly from the points of the cells
+                assert_array_almost_equal(exact, result["point_linear"][:-2])
+                self.assertTrue(np.all(np.isnan(result["point_linear"][-2:])))
+                self.assertTrue(np.all(np.isnan(result["cell_linear"][-2:])))
+        finally:
+            functions.chunk_size = 100000
+        # Between the cell centers, the cell values of a lattice are interpolated exactly too
+        inner = np.array([[1.0, 3.0, 2.5], [3.5, 5.0, 4.0]])
+        result = functions.probe("rectilinear.vtr", inner, ["cell_linear"], "trilinear")
+        assert_array_almost_equal(inner @ [1, 2, 3], result["cell_linear"])
+        return
+
+    def test_decreasing_axis(self):
+        # The indices of a decreasing axis cannot be searched, a locator is used instead
+        mesh = linear_mesh(pv.RectilinearGrid(AXIS[::-1], AXIS * 2, AXIS + 1))
+        functions.meshtals["decreasing.vtr"] = functions.MeshTally("decreasing.vtr", mesh=mesh)
+        self.assertIsInstance(functions.meshtals["decreasing.vtr"].spatial_index, LocatorIndex)
+        result = functions.probe("decreasing.vtr", self.points, ["cell_linear"])
+        expected = mesh.cell_data["cell_linear"][mesh.find_containing_cell(self.points)]
+        assert_array_almost_equal(expected, result["cell_linear"])
+        result = functions.probe("decreasing.vtr", self.points, ["point_linear"], "trilinear")
+        assert_array_almost_equal(self.points @ [1, 2, 3], result["point_linear"])
+        return
+
+    def test_threads(self):
+        # The batches probed at the same time by several threads give the same values
+        expected = {
+            method: functions.probe("unstructured.vtu", self.points, method=method)
+            for method in ("nearest", "trilinear")
+        }
+        functions.chunk_size = 16
+        functions.export_workers = 4
+        try:
+            for method, values in expected.items():
+                result = functions.probe("unstructured.vtu", self.points, method=method)
+                for name in values:
+                    assert_array_equal(values[name], result[name])
+        finally:
+            functions.chunk_size = 100000
+            functions.export_workers = 1
+        return
+
+    def test_file_mesh(self):
+        functions.meshtals = {RECTILINEAR_FILE: functions.MeshTally(RECTILINEAR_FILE)}
+        meshtal = functions.meshtals[RECTILINEAR_FILE]
+        name = meshtal.cells_info[0]
+        result = functions.probe(RECTILINEAR_FILE, meshtal.centers, [name])
+        assert_array_equal(np.asarray(meshtal.mesh[name], dtype=float), result[name])
+        return
+
+    def test_remap(self):
+        directory = tempfile.mkdtemp()
+        target_fn = os.path.join(directory, "target.vtr")
+        points_fn = os.path.join(directory, "points.csv")
+        pv.RectilinearGrid(np.linspace(-1, 7, 5), np.linspace(0, 12, 7), [1.0, 7.0]).save(
+            target_fn
+        )
+        with open(points_fn, "w") as f:
+            f.write("x, y, z, value\n")
+            for point in self.points[:20]:
+                f.write("%.6f,%.6f,%.6f,0\n" % tuple(point))
+        try:
+            source = functions.meshtals["rectilinear.vtr"]
+            new_name = functions.remap("rectilinear.vtr", target_fn, method="conservative")
+            remapped = functions.meshtals[new_name]
+            self.assertEqual(os.path.join(directory, "target+Remap(rectilinear).vtr"), new_name)
+            # The integral of a cell array is kept
+            integral = np.sum(source.mesh["cell_linear"] * source.cell_volumes)
+            self.assertAlmostEqual(
+                integral, np.sum(remapped.mesh["cell_linear"] * remapped.cell_volumes)
+            )
+            # Only between lattices
+            self.assertIsNone(functions.remap("unstructured.vtu", target_fn, method="conservative"))
+            # The points of a list get the values of the cell and point arrays
+            functions.export_workers = 2
+            functions.chunk_size = 6
+            new_name = functions.remap("unstructured.vtu", points_fn, method="trilinear")
+            remapped = functions.meshtals[new_name]
+            self.assertEqual("PolyData", remapped.mesh_type)
+            assert_array_almost_equal(
+                self.points[:20] @ [1, 2, 3], remapped.mesh["point_linear"], decimal=4
+            )
+        finally:
+            functions.export_workers = 1
+            functions.chunk_size = 100000
+            os.remove(target_fn)
+            os.remove(points_fn)
+            os.rmdir(directory)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import pstats
+import unittest
+from vtkconverter import batch, functions, profiling
+
+EXAMPLE_VTK_FILE = "tests/data/example.vts"
+RESULT_FN = "tests/data/example_['Values']_csv.csv"
+
+
+class MyTestCase(unittest.TestCase):
+    def tearDown(self):
+        profiling.stop_profiling()
+
+    def test_profiled_phases(self):
+        functions.meshtals = dict()
+        profiling.start_profiling()
+        functions.open_mesh(EXAMPLE_VTK_FILE)
+        functions.write_mesh(EXAMPLE_VTK_FILE, ["Values"], "csv")
+        report = profiling.stop_profiling()
+        os.remove(RESULT_FN)
+        phases = {record["name"]: record for record in report["phases"]}
+        for name in ["open_mesh", "write_mesh", "write_mesh/format", "write_mesh/write"]:
+            self.assertIn(name, phases)
+        self.assertEqual(1, phases["write_mesh"]["calls"])
+        self.assertGreaterEqual(report["total"]["wall_s"], phases["write_mesh"]["wall_s"])
+        if phases["write_mesh"]["bytes_written"] is not None:  # Only known in Linux
+            self.assertGreaterEqual(phases["write_mesh"]["bytes_written"], 100)
+        self.assertIsNone(profiling.profiler)
+        return
+
+    def test_batch_profile(self):
+        exit_status = batch.main(
+            [
+                EXAMPLE_VTK_FILE,
+                "-a",
+                "Values",
+                "-j",
+                "1",
+                "--profile",
+                "tests/data/profile.json",
+                "--profile-dump",
+                "tests/data/profile.prof",
+            ]
+        )
+        os.remove(RESULT_FN)
+        self.assertEqual(0, exit_status)
+        with open("tests/data/profile.json", "r") as f:
+            report = json.load(f)
+        os.remove("tests/data/profile.json")
+        names = [record["name"] for record in report[EXAMPLE_VTK_FILE]["phases"]]
+        self.assertIn("write_mesh", names)
+        stats = pstats.Stats("tests/data/profile_example.prof")
+        os.remove("tests/data/profile_example.prof")
+        self.assertGreater(stats.total_calls, 0)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pyvista as pv
+import vtk
+from vtkconverter import functions
+from vtkconverter import readers
+from vtkconverter.readers import RawXMLReader, SlabReader, copy_mapped_arrays, read_mesh
+from numpy.testing import assert_array_equal
+
+WRITERS = {
+    ".vts": vtk.vtkXMLStructuredGridWriter,
+    ".vtr": vtk.vtkXMLRectilinearGridWriter,
+    ".vtu": vtk.vtkXMLUnstructuredGridWriter,
+}
+
+
+def write_raw(mesh, fn):  # VTK XML file with the data appended in raw binary
+    writer = WRITERS[fn[-4:]]()
+    writer.SetInputData(mesh)
+    writer.SetFileName(fn)
+    writer.SetDataModeToAppended()
+    writer.EncodeAppendedDataOff()
+    writer.SetCompressorTypeToNone()
+    writer.Write()
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for filename in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, filename))
+        os.rmdir(self.directory)
+
+    def test_raw_reader_against_pv_read(self):
+        meshes = {
+            "meshtal_14.vts": pv.read("tests/data/meshtal_14.vts"),
+            "cuvmsh_44_CuV_CELF10.vtr": pv.read("tests/data/cuvmsh_44_CuV_CELF10.vtr"),
+            "meshtal_14.vtu": pv.read("tests/data/meshtal_14.vts").cast_to_unstructured_grid(),
+        }
+        for filename, mesh in meshes.items():
+            mesh.point_data["Points array"] = np.arange(mesh.n_points, dtype=np.int32)
+            filename = os.path.join(self.directory, filename)
+            write_raw(mesh, filename)
+            with RawXMLReader(filename) as reader:
+                self.assertTrue(reader.supported)
+                result = reader.read()
+                expected = pv.read(filename)
+                self.assertEqual(type(expected), type(result))
+                assert_array_equal(expected.points, result.points)
+                assert_array_equal(expected.cell_centers().points, result.cell_centers().points)
+                for array_name in list(expected.cell_data) + list(expected.point_data):
+                    assert_array_equal(expected[array_name], result[array_name])
+                # The arrays are views of the file, not copies
+                view = reader.get_array("Value - Total")
+                self.assertTrue(np.shares_memory(view, result["Value - Total"]))
+                del view
+                # The file can only be unmapped once the arrays are in memory
+                self.assertTrue(copy_mapped_arrays(result, filename))
+            assert_array_equal(expected["Value - Total"], result["Value - Total"])
+            self.assertNotIn(os.path.abspath(filename), readers.mapped_files)
+        return
+
+    def test_raw_reader_selected_arrays(self):
+        filename = os.path.join(self.directory, "meshtal_14.vts")
+        write_raw(pv.read("tests/data/meshtal_14.vts"), filename)
+        with RawXMLReader(filename) as reader:
+            mesh = reader.read(["Error - Total"])
+            self.assertListEqual(["Error - Total"], list(mesh.cell_data))
+            copy_mapped_arrays(mesh, filename)
+        return
+
+    def test_fallback(self):
+        # Compressed binary and ascii files are read with pv.read
+        self.assertFalse(RawXMLReader("tests/data/example.vts").supported)
+        self.assertFalse(RawXMLReader("tests/data/meshtal_14.vts").supported)
+        self.assertEqual(8, read_mesh("tests/data/example.vts").n_cells)
+        return
+
+    def test_export_memory_mapped(self):
+        filename = os.path.join(self.directory, "meshtal_14.vts")
+        write_raw(pv.read("tests/data/meshtal_14.vts"), filename)
+        functions.meshtals = {filename: functions.MeshTally(filename)}
+        expected = np.array(functions.meshtals[filename].mesh["Value - Total"])
+        translated = functions.shallow_copy(functions.meshtals[filename])
+        functions.meshtals["translated.vts"] = translated
+        functions.export_mesh(filename, "binary")
+        # The file is unmapped before it is replaced, the arrays of the meshes are copies
+        self.assertNotIn(os.path.abspath(filename), readers.mapped_files)
+        assert_array_equal(expected, functions.meshtals[filename].mesh["Value - Total"])
+        assert_array_equal(expected, translated.mesh["Value - Total"])
+        assert_array_equal(expected, pv.read(filename)["Value - Total"])
+        return
+
+    def test_slab_reader(self):
+        reader = SlabReader("tests/data/meshtal_14.vts", 90)
+        self.assertEqual(300, reader.n_rows("cells"))
+        slabs = list(reader.slabs(["Value - Total"], "cells"))
+        self.assertEqual([90, 90, 90, 30], [len(centers) for centers, _ in slabs])
+        self.assertTrue(reader.streamed)
+        return
+
+    def test_slab_reader_whole_file(self):
+        # A .vtu file cannot be read by pieces, it is read at once and then split
+        filename = os.path.join(self.directory, "meshtal_14.vtu")
+        pv.read("tests/data/meshtal_14.vts").cast_to_unstructured_grid().save(filename)
+        reader = SlabReader(filename, 90)
+        self.assertFalse(reader.streamed)
+        slabs = list(reader.slabs(["Value - Total"], "cells"))
+        self.assertEqual([90, 90, 90, 30], [len(centers) for centers, _ in slabs])
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import unittest
+import numpy as np
+from vtkconverter import functions
+from vtkconverter.registry import MeshRegistry
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+
+EXAMPLE_VTK_FILE = "tests/data/meshtal_14.vts"
+
+
+class MyTestCase(unittest.TestCase):
+    def test_spill_and_reload(self):
+        meshtals = MeshRegistry()
+        original = functions.MeshTally(EXAMPLE_VTK_FILE)
+        centers = original.centers.copy()
+        meshtals[EXAMPLE_VTK_FILE] = original
+        meshtals["copy.vts"] = functions.MeshTally("copy.vts", mesh=original.mesh.copy())
+        total = meshtals.memory_usage()
+        # Only the mesh used last fits in the budget, the other one is spilled to disk
+        meshtals.memory_budget = total * 0.75
+        meshtals.fit()
+        self.assertFalse(original.resident)
+        self.assertTrue(os.path.isdir(original.spill_directory))
+        self.assertLess(meshtals.memory_usage(), total)
+        self.assertIn(EXAMPLE_VTK_FILE, meshtals)
+        self.assertFalse(original.resident)
+        # It is read again when it is used, and the other one is spilled instead
+        meshtal = meshtals[EXAMPLE_VTK_FILE]
+        self.assertTrue(meshtal.resident)
+        self.assertFalse(meshtals.meshtals["copy.vts"].resident)
+        self.assertIn("centers", meshtal._cache)
+        assert_array_equal(centers, meshtal.centers)
+        reference = functions.MeshTally(EXAMPLE_VTK_FILE)
+        assert_array_equal(reference.mesh["Value - Total"], meshtal.mesh["Value - Total"])
+        assert_array_equal(reference.points, meshtal.points)
+        spill_directory = meshtal.spill_directory
+        del meshtals[EXAMPLE_VTK_FILE]
+        self.assertFalse(os.path.isdir(spill_directory))
+        return
+
+    def test_shared_arrays_counted_once(self):
+        meshtals = MeshRegistry()
+        meshtals[EXAMPLE_VTK_FILE] = functions.MeshTally(EXAMPLE_VTK_FILE)
+        alone = meshtals.memory_usage()
+        # The translated copy shares its arrays, only its new points use more memory
+        copy = functions.shallow_copy(meshtals[EXAMPLE_VTK_FILE], own_points=True)
+        meshtals["copy.vts"] = copy
+        self.assertEqual(alone + copy.points.nbytes, meshtals.memory_usage())
+        return
+
+    def test_spill_keeps_shared_arrays(self):
+        meshtals = MeshRegistry()
+        original = functions.MeshTally(EXAMPLE_VTK_FILE)
+        meshtals[EXAMPLE_VTK_FILE] = original
+        copy = functions.shallow_copy(original, own_points=True)
+        meshtals["copy.vts"] = copy
+        total = meshtals.memory_usage()
+        points_bytes = original.points.nbytes
+        # Only the points of the original are freed, its values are still used by the copy
+        meshtals.memory_budget = total - 1
+        meshtals.fit()
+        self.assertFalse(original.resident)
+        self.assertEqual(len(copy.mesh.cell_data), len(original.kept))
+        self.assertEqual(total - points_bytes, meshtals.memory_usage())
+        # The values are shared again when it is read again
+        meshtals.memory_budget = None
+        meshtal = meshtals[EXAMPLE_VTK_FILE]
+        self.assertTrue(np.shares_memory(meshtal.mesh["Value - Total"], copy.mesh["Value - Total"]))
+        self.assertEqual(total, meshtals.memory_usage())
+        # With both spilled, the values are saved to disk once no mesh in memory uses them
+        meshtals.memory_budget = 0
+        meshtals.fit()
+        self.assertEqual(0, meshtals.memory_usage())
+        self.assertEqual(dict(), meshtal.kept)
+        assert_array_equal(
+            functions.MeshTally(EXAMPLE_VTK_FILE).mesh["Value - Total"],
+            meshtals[EXAMPLE_VTK_FILE].mesh["Value - Total"],
+        )
+        return
+
+    def test_memory_budget(self):
+        functions.meshtals = dict()
+        functions.open_mesh(EXAMPLE_VTK_FILE)
+        functions.change_memory_budget(0)
+        self.assertIsInstance(functions.meshtals, MeshRegistry)
+        functions.translate(EXAMPLE_VTK_FILE, 1, 2, 3)
+        name = "tests/data/meshtal_14+Trans(1,2,3).vts"
+        self.assertFalse(functions.meshtals.meshtals[EXAMPLE_VTK_FILE].resident)
+        # The translation is still right after both meshes have been spilled and read again
+        functions.translate(name, -1, -2, -3)
+        back = functions.meshtals["tests/data/meshtal_14+Trans(1,2,3)+Trans(-1,-2,-3).vts"]
+        assert_array_almost_equal(functions.meshtals[EXAMPLE_VTK_FILE].points, back.points)
+        functions.change_memory_budget(None)
+        functions.meshtals = MeshRegistry()
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
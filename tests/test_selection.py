@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from vtkconverter import functions
+import numpy as np
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+from tests.meshes import AXIS, linear_mesh, rectilinear_grid
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        rectilinear = linear_mesh(rectilinear_grid(np.append(AXIS, 10.0)))
+        functions.meshtals = {
+            "rectilinear.vtr": functions.MeshTally("rectilinear.vtr", mesh=rectilinear),
+            "structured.vts": functions.MeshTally(
+                "structured.vts", mesh=rectilinear.cast_to_structured_grid()
+            ),
+            "unstructured.vtu": functions.MeshTally(
+                "unstructured.vtu", mesh=rectilinear.cast_to_unstructured_grid()
+            ),
+        }
+        self.bounds = (0.5, 6.0, 0.0, 7.0, 2.0, 11.0)
+
+    def test_box(self):
+        # The ranges of indices of the lattices select the same cells and points as the centers
+        # and points of the UnstructuredGrid
+        for name in functions.meshtals:
+            functions.select_box(name, self.bounds)
+        reference = functions.meshtals["unstructured.vtu"]
+        centers = np.asarray(reference.centers)
+        points = np.asarray(reference.points)
+        expected_cells = np.all(
+            (centers >= self.bounds[0::2]) & (centers <= self.bounds[1::2]), axis=1
+        )
+        expected_points = np.all(
+            (points >= self.bounds[0::2]) & (points <= self.bounds[1::2]), axis=1
+        )
+        self.assertTrue(0 < expected_cells.sum() < len(centers))
+        for meshtal in functions.meshtals.values():
+            assert_array_equal(expected_cells, meshtal.selection["cells"])
+            assert_array_equal(expected_points, meshtal.selection["points"])
+        return
+
+    def test_plane_and_threshold(self):
+        meshtal = functions.meshtals["unstructured.vtu"]
+        functions.select_plane("unstructured.vtu", (3.0, 0, 0), (1, 0, 0))
+        self.assertTrue(np.all(meshtal.selected(meshtal.centers, "cells")[:, 0] >= 3))
+        self.assertTrue(np.all(meshtal.selected(meshtal.points, "points")[:, 0] >= 3))
+        # The selections are combined: only the cells in both are kept
+        functions.select_threshold("unstructured.vtu", "cell_linear", upper=40)
+        values = meshtal.selected(meshtal.mesh["cell_linear"], "cells")
+        centers = meshtal.selected(meshtal.centers, "cells")
+        self.assertTrue(len(values) > 0)
+        self.assertTrue(np.all(values <= 40))
+        self.assertTrue(np.all(centers[:, 0] >= 3))
+        # A threshold on a cell array does not change the points
+        self.assertTrue(np.all(meshtal.selected(meshtal.points, "points")[:, 0] >= 3))
+        self.assertIsNone(functions.select_threshold("unstructured.vtu", "invalid", 0))
+        functions.clear_selection("unstructured.vtu")
+        self.assertEqual(meshtal.mesh.n_cells, len(meshtal.selected(meshtal.centers, "cells")))
+        return
+
+    def test_threshold_vector(self):
+        # A vector array is selected by its magnitude, or by one of its components
+        meshtal = functions.meshtals["structured.vts"]
+        meshtal.mesh.point_data["vector"] = meshtal.points
+        functions.select_threshold("structured.vts", "vector", upper=5)
+        magnitudes = np.linalg.norm(meshtal.points, axis=1)
+        assert_array_equal(magnitudes <= 5, meshtal.selection["points"])
+        functions.clear_selection("structured.vts")
+        functions.select_threshold("structured.vts", "vector", lower=3, component=0)
+        assert_array_equal(meshtal.points[:, 0] >= 3, meshtal.selection["points"])
+        self.assertIsNone(functions.select_threshold("structured.vts", "vector", 0, component=3))
+        self.assertEqual(meshtal.mesh.n_points, len(meshtal.selection["points"]))
+        return
+
+    def test_statistics(self):
+        functions.select_box("rectilinear.vtr", self.bounds)
+        meshtal = functions.meshtals["rectilinear.vtr"]
+        mask = meshtal.selection["cells"]
+        values = np.asarray(meshtal.mesh["cell_linear"])[mask]
+        volumes = meshtal.cell_volumes[mask]
+        stats = functions.array_statistics("rectilinear.vtr", ["cell_linear"])["cell_linear"]
+        self.assertAlmostEqual(values.max(), stats["max"])
+        self.assertAlmostEqual(values.sum(), stats["integral_no_volume"])
+        self.assertAlmostEqual(volumes @ values / volumes.sum(), stats["average_volume"])
+        return
+
+    def test_exports(self):
+        directory = tempfile.mkdtemp()
+        source = functions.meshtals.pop("structured.vts")
+        source.filename = os.path.join(directory, "structured.vts")
+        functions.meshtals[source.filename] = source
+        functions.select_box(source.filename, self.bounds)
+        mask = source.selection["points"]
+        expected = np.column_stack((source.points[mask], source.mesh["point_linear"][mask]))
+        try:
+            functions.write_mesh(source.filename, ["point_linear"], "csv")
+            functions.write_mesh(source.filename, ["point_linear"], "point_cloud")
+            csv_fn = os.path.join(directory, "structured_['point_linear']_csv.csv")
+            cloud_fn = os.path.join(directory, "structured_point_linear_point_cloud.txt")
+            assert_array_almost_equal(expected, np.loadtxt(csv_fn, delimiter=","), decimal=3)
+            assert_array_almost_equal(
+                expected, np.loadtxt(cloud_fn, delimiter=",", skiprows=1), decimal=3
+            )
+        finally:
+            for fn in os.listdir(directory):
+                os.remove(os.path.join(directory, fn))
+            os.rmdir(directory)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
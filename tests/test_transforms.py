@@ -0,0 +1,71 @@
+import unittest
+from vtkconverter import functions
+from vtkconverter.transforms import Transform, rotation_matrix
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+EXAMPLE_VTK_FILE = "tests/data/example.vts"
+RECTILINEAR_FILE = "tests/data/test_VTK_CUBE_SQUARE.vtr"
+
+
+class MyTestCase(unittest.TestCase):
+    def test_composed_matrix(self):
+        transform = Transform().rotate(0, 0, 90).translate(1, 0, 0).scale(2)
+        self.assertEqual("+Rot(0,0,90)+Trans(1,0,0)+Scale(2)", transform.name)
+        # (1, 0, 0) -> rotated (0, 1, 0) -> translated (1, 1, 0) -> scaled (2, 2, 0)
+        assert_array_almost_equal([[2, 2, 0]], transform.apply(np.array([[1.0, 0, 0]])))
+        self.assertAlmostEqual(8, transform.volume_factor())
+        assert_array_almost_equal(rotation_matrix(0, 0, 90), transform.linear / 2)
+        return
+
+    def test_same_as_chained_operations(self):
+        functions.meshtals = {EXAMPLE_VTK_FILE: functions.MeshTally(EXAMPLE_VTK_FILE)}
+        functions.meshtals[EXAMPLE_VTK_FILE].centers  # Transformed instead of computed again
+        functions.rotate(EXAMPLE_VTK_FILE, 10, 20, 30)
+        functions.translate("tests/data/example+Rot(10,20,30).vts", 1, 2, 3)
+        chained = functions.meshtals.pop("tests/data/example+Rot(10,20,30)+Trans(1,2,3).vts")
+        transform = Transform().rotate(10, 20, 30).translate(1, 2, 3)
+        new_name = functions.transform(EXAMPLE_VTK_FILE, transform)
+        self.assertEqual("tests/data/example+Rot(10,20,30)+Trans(1,2,3).vts", new_name)
+        fused = functions.meshtals[new_name]
+        self.assertIsNotNone(fused.computed("centers"))
+        assert_array_almost_equal(chained.points, fused.points)
+        assert_array_almost_equal(chained.centers, fused.centers)
+        assert_array_almost_equal(chained.cell_volumes, fused.cell_volumes)
+        return
+
+    def test_intermediates_and_rectilinear(self):
+        functions.meshtals = {RECTILINEAR_FILE: functions.MeshTally(RECTILINEAR_FILE)}
+        original = functions.meshtals[RECTILINEAR_FILE]
+        transform = Transform().translate(1, 2, 3).scale(2)
+        functions.transform(RECTILINEAR_FILE, transform, intermediates=True)
+        self.assertIn("tests/data/test_VTK_CUBE_SQUARE+Trans(1,2,3).vtr", functions.meshtals)
+        scaled = functions.meshtals["tests/data/test_VTK_CUBE_SQUARE+Trans(1,2,3)+Scale(2).vtr"]
+        # Translations and scalings keep a RectilinearGrid
+        self.assertEqual("RectilinearGrid", scaled.mesh_type)
+        assert_array_almost_equal((original.centers + [1, 2, 3]) * 2, scaled.centers)
+        assert_array_almost_equal(original.cell_volumes * 8, scaled.cell_volumes)
+        return
+
+    def test_rigid_motions_keep_geometry(self):
+        functions.meshtals = {EXAMPLE_VTK_FILE: functions.MeshTally(EXAMPLE_VTK_FILE)}
+        original = functions.meshtals[EXAMPLE_VTK_FILE]
+        original.centers, original.cell_volumes, original.bounds
+        functions.translate(EXAMPLE_VTK_FILE, 1, 2, 3)
+        translated = functions.meshtals["tests/data/example+Trans(1,2,3).vts"]
+        functions.rotate("tests/data/example+Trans(1,2,3).vts", 0, 0, 30)
+        rotated = functions.meshtals["tests/data/example+Trans(1,2,3)+Rot(0,0,30).vts"]
+        # The centers and volumes are moved with the mesh instead of being computed again
+        for meshtal in (translated, rotated):
+            self.assertIsNotNone(meshtal.computed("centers"))
+            self.assertIs(original.cell_volumes, meshtal.computed("cell_volumes"))
+            assert_array_almost_equal(meshtal.compute_centers(), meshtal.centers)
+            assert_array_almost_equal(meshtal.compute_cell_volumes(), meshtal.cell_volumes)
+        self.assertIsNotNone(translated.computed("bounds"))
+        assert_array_almost_equal(translated.mesh.bounds, translated.bounds)
+        assert_array_almost_equal(rotated.mesh.bounds, rotated.bounds)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
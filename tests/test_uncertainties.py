@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+from vtkconverter import functions
+from vtkconverter.uncertainties import ErrorSum, error_pairs, sum_relative_error
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+from tests.meshes import rectilinear_grid
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.directory = tempfile.mkdtemp()
+        functions.meshtals = dict()
+        for name in ("neutron", "photon"):
+            mesh = rectilinear_grid()
+            mesh.cell_data["Value - Total"] = rng.uniform(1, 2, mesh.n_cells)
+            mesh.cell_data["Error - Total"] = rng.uniform(0, 0.2, mesh.n_cells)
+            fn = os.path.join(self.directory, f"{name}.vtr")
+            functions.meshtals[fn] = functions.MeshTally(fn, mesh=mesh)
+        self.neutron, self.photon = list(functions.meshtals)
+
+    def tearDown(self):
+        for fn in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, fn))
+        os.rmdir(self.directory)
+
+    def test_pairs(self):
+        names = ["Value - Total", "Error - Total", "Value - 14 MeV", "Values", "Error - Other"]
+        self.assertEqual({"Value - Total": "Error - Total"}, error_pairs(names))
+        return
+
+    def test_propagation(self):
+        rng = np.random.default_rng(1)
+        values = rng.uniform(1, 2, (50, 2))
+        errors = rng.uniform(0, 0.2, (50, 2))
+        weights = rng.uniform(1, 3, 50)
+        expected = np.sqrt(np.sum((values * errors * weights[:, None]) ** 2, axis=0))
+        expected /= np.abs(weights @ values)
+        assert_array_almost_equal(expected, sum_relative_error(values, errors, weights))
+        error_sum = ErrorSum(50)
+        error_sum.add(values[:, 0], errors[:, 0])
+        error_sum.add(values[:, 1], errors[:, 1], 2.0)
+        sigma = np.hypot(values[:, 0] * errors[:, 0], 2 * values[:, 1] * errors[:, 1])
+        total = values[:, 0] + 2 * values[:, 1]
+        assert_array_almost_equal(total, error_sum.total)
+        assert_array_almost_equal(sigma / total, error_sum.relative_error())
+        return
+
+    def test_statistics(self):
+        meshtal = functions.meshtals[self.neutron]
+        stats = functions.array_statistics(self.neutron)
+        values = np.asarray(meshtal.mesh["Value - Total"])
+        errors = np.asarray(meshtal.mesh["Error - Total"])
+        volumes = meshtal.cell_volumes
+        expected = np.sqrt(np.sum((values * errors * volumes) ** 2)) / (volumes @ values)
+        self.assertAlmostEqual(expected, stats["Value - Total"]["integral_volume_error"])
+        self.assertNotIn("integral_volume_error", stats["Error - Total"])
+        return
+
+    def test_sum_with_errors(self):
+        terms = [(self.neutron, "Value - Total"), (self.photon, "Value - Total", 1.2)]
+        functions.sum_with_errors(self.neutron, "Value - Heating", terms)
+        neutron = functions.meshtals[self.neutron].mesh
+        photon = functions.meshtals[self.photon].mesh
+        total = neutron["Value - Total"] + 1.2 * photon["Value - Total"]
+        sigma = np.hypot(
+            neutron["Value - Total"] * neutron["Error - Total"],
+            1.2 * photon["Value - Total"] * photon["Error - Total"],
+        )
+        assert_array_almost_equal(total, neutron["Value - Heating"])
+        assert_array_almost_equal(sigma / total, neutron["Error - Heating"])
+        self.assertIsNone(functions.sum_with_errors(self.neutron, "Heating", terms))
+        return
+
+    def test_export(self):
+        # The relative errors are not multiplied by the safety factor, and the rows with a
+        # relative error over the maximum are not written
+        mesh = functions.meshtals[self.neutron].mesh
+        reliable = np.asarray(mesh["Error - Total"]) <= 0.1
+        functions.change_safety_factor(2)
+        functions.change_max_relative_error(0.1)
+        try:
+            functions.write_mesh(self.neutron, ["Value - Total", "Error - Total"], "csv")
+        finally:
+            functions.change_safety_factor(1)
+            functions.change_max_relative_error(None)
+        fn = os.path.join(self.directory, "neutron_['Value - Total', 'Error - Total']_csv.csv")
+        table = np.loadtxt(fn, delimiter=",")
+        self.assertEqual(np.count_nonzero(reliable), len(table))
+        assert_array_almost_equal(mesh["Value - Total"][reliable] * 2, table[:, 3], decimal=3)
+        assert_array_almost_equal(mesh["Error - Total"][reliable], table[:, 4], decimal=3)
+        return
+
+    def test_export_per_array(self):
+        # Each point_cloud file only drops the rows of its own relative error, the csv file drops
+        # the rows of any of them
+        mesh = functions.meshtals[self.neutron].mesh
+        errors = np.full(mesh.n_cells, 0.05)
+        mesh.cell_data["Value - Neutron"] = np.asarray(mesh["Value - Total"]) * 3
+        mesh.cell_data["Error - Neutron"] = errors.copy()
+        mesh.cell_data["Error - Total"] = errors.copy()
+        mesh["Error - Total"][[0, 1]] = 0.9
+        mesh["Error - Neutron"][[5, 6, 7]] = 0.9
+        names = ["Value - Total", "Value - Neutron"]
+        functions.change_max_relative_error(0.5)
+        try:
+            functions.write_mesh(self.neutron, names, "point_cloud")
+            functions.write_mesh(self.neutron, names, "csv")
+        finally:
+            functions.change_max_relative_error(None)
+        for array_name, n_rows in zip(names, (mesh.n_cells - 2, mesh.n_cells - 3)):
+            fn = os.path.join(self.directory, f"neutron_{array_name}_point_cloud.txt")
+            table = np.loadtxt(fn, delimiter=",", skiprows=1)
+            self.assertEqual(n_rows, len(table))
+        fn = os.path.join(self.directory, f"neutron_{names}_csv.csv".replace("/", "-"))
+        self.assertEqual(mesh.n_cells - 5, len(np.loadtxt(fn, delimiter=",")))
+        return
+
+    def test_export_streaming(self):
+        # The streaming exports drop the same rows as the exports of an opened mesh
+        mesh = functions.meshtals[self.neutron].mesh
+        reliable = np.asarray(mesh["Error - Total"]) <= 0.1
+        fn = os.path.join(self.directory, "saved.vtr")
+        mesh.save(fn)
+        functions.change_max_relative_error(0.1)
+        try:
+            for out_format in ("point_cloud", "ip_fluent", "csv", "npz"):
+                functions.write_mesh(fn, ["Value - Total"], out_format, streaming=True)
+        finally:
+            functions.change_max_relative_error(None)
+        stem = os.path.join(self.directory, "saved_")
+        table = np.loadtxt(stem + "Value - Total_point_cloud.txt", delimiter=",", skiprows=1)
+        assert_array_almost_equal(mesh["Value - Total"][reliable], table[:, 3], decimal=3)
+        with open(stem + "Value - Total_ip_fluent.txt") as f:
+            lines = f.read().split("\n")
+        self.assertEqual(str(np.count_nonzero(reliable)), lines[2])
+        table = np.loadtxt(stem + "['Value - Total']_csv.csv", delimiter=",")
+        self.assertEqual(np.count_nonzero(reliable), len(table))
+        with np.load(stem + "['Value - Total']_npz.npz") as archive:
+            assert_array_almost_equal(mesh["Value - Total"][reliable], archive["Value - Total"])
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
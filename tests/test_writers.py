@@ -0,0 +1,79 @@
+import importlib.util
+import json
+import os
+import unittest
+import numpy as np
+from vtkconverter import functions
+from numpy.testing import assert_array_almost_equal
+
+MESHTAL_FILE = "tests/data/meshtal_14.vts"
+ARRAYS = ["Value - Total", "Error - Total"]
+RESULT = "tests/data/meshtal_14_['Value - Total', 'Error - Total']"
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mesh_tally = functions.MeshTally(MESHTAL_FILE)
+        functions.meshtals = {MESHTAL_FILE: self.mesh_tally}
+
+    def check_columns(self, columns):
+        assert_array_almost_equal(self.mesh_tally.centers[:, 0], columns["x"])
+        assert_array_almost_equal(self.mesh_tally.centers[:, 2], columns["z"])
+        for array_name in ARRAYS:
+            assert_array_almost_equal(self.mesh_tally.mesh[array_name], columns[array_name])
+
+    def test_write_mesh_npz(self):
+        for streaming in [False, True]:
+            functions.write_mesh(MESHTAL_FILE, ARRAYS, "npz", streaming=streaming)
+            with np.load(f"{RESULT}_npz.npz") as result:
+                self.check_columns(result)
+                metadata = json.loads(str(result["__metadata__"]))
+            os.remove(f"{RESULT}_npz.npz")
+            self.assertEqual("cells", metadata["values_type"])
+        return
+
+    def test_column_names(self):
+        # An array named as a coordinate or given twice would overwrite a column
+        self.mesh_tally.mesh.cell_data["x"] = self.mesh_tally.mesh["Value - Total"]
+        error = functions.write_mesh(MESHTAL_FILE, ["x"], "npz")
+        self.assertIn("coordinate", error)
+        error = functions.write_mesh(MESHTAL_FILE, ARRAYS[:1] * 2, "npz", streaming=True)
+        self.assertIn("twice", error)
+        self.assertFalse(os.path.exists("tests/data/meshtal_14_['x']_npz.npz"))
+        return
+
+    @unittest.skipUnless(importlib.util.find_spec("h5py"), "h5py is not installed")
+    def test_hdf5_dataset_names(self):
+        # "/" is written as "-" in the names of the datasets, so these two arrays would clash
+        for name in ("a/b", "a-b"):
+            self.mesh_tally.mesh.cell_data[name] = self.mesh_tally.mesh["Value - Total"]
+        error = functions.write_mesh(MESHTAL_FILE, ["a/b", "a-b"], "hdf5")
+        self.assertIn("rename one of them", error)
+        # Other formats keep the names as they are
+        functions.write_mesh(MESHTAL_FILE, ["a/b", "a-b"], "npz")
+        os.remove("tests/data/meshtal_14_['a-b', 'a-b']_npz.npz")
+        return
+
+    @unittest.skipUnless(importlib.util.find_spec("h5py"), "h5py is not installed")
+    def test_write_mesh_hdf5(self):
+        import h5py
+
+        functions.write_mesh(MESHTAL_FILE, ARRAYS, "hdf5")
+        with h5py.File(f"{RESULT}_hdf5.h5", "r") as f:
+            self.check_columns({name: f[name][:] for name in f})
+        os.remove(f"{RESULT}_hdf5.h5")
+        return
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_write_mesh_parquet(self):
+        import pyarrow.parquet as pq
+
+        functions.write_mesh(MESHTAL_FILE, ARRAYS, "parquet", streaming=True)
+        table = pq.read_table(f"{RESULT}_parquet.parquet")
+        self.check_columns({name: table[name].to_numpy() for name in table.column_names})
+        os.remove(f"{RESULT}_parquet.parquet")
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
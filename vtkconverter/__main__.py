@@ -1,4 +1,36 @@
-from vtkconverter.main import main
+import sys
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        # The batch mode does not import the interactive menu, which needs tkinter
+        from vtkconverter.batch import main as batch_main
+
+        sys.exit(batch_main(sys.argv[2:]))
+    else:
+        # python -m vtkconverter [--profile REPORT.json] [--profile-dump FILE.prof|FILE.html]
+        #                        [--memory-budget MB]
+        import argparse
+        import contextlib
+        from vtkconverter import functions, profiling
+        from vtkconverter.main import main
+
+        parser = argparse.ArgumentParser(prog="python -m vtkconverter")
+        parser.add_argument("--profile", metavar="REPORT.json", default=None)
+        parser.add_argument("--profile-dump", metavar="FILE.prof|FILE.html", default=None)
+        parser.add_argument("--memory-budget", metavar="MB", type=float, default=None)
+        args = parser.parse_args()
+        if args.memory_budget is not None:
+            functions.change_memory_budget(args.memory_budget)
+        if args.profile is not None:
+            profiler = profiling.start_profiling()
+        dump = contextlib.nullcontext()
+        if args.profile_dump is not None:
+            dump = profiling.profile_dump(args.profile_dump)
+        try:
+            with dump:
+                main()
+        finally:
+            if args.profile is not None:
+                profiler.print_report()
+                profiler.save(args.profile)
+                profiling.stop_profiling()
@@ -0,0 +1,215 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_batch (non interactive entry point of vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# USAGE: python -m vtkconverter batch "meshes/*.vts" --arrays "Value - Total" --formats csv
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from vtkconverter import functions
+from vtkconverter import profiling
+from vtkconverter.compressed import COMPRESSIONS
+from vtkconverter.readers import VTK_EXTENSIONS
+OUT_FORMATS = ("point_cloud", "ip_fluent", "csv", "npz", "hdf5", "parquet")
+
+
+# READ THE COMMAND LINE ARGUMENTS
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m vtkconverter batch",
+        description="Convert many VTK files without the interactive menu",
+    )
+    parser.add_argument("files", nargs="+", help="VTK files or glob patterns")
+    parser.add_argument(
+        "-a",
+        "--arrays",
+        nargs="+",
+        default=None,
+        help="Arrays to write. By default, all the cell arrays of each file",
+    )
+    parser.add_argument(
+        "-f", "--formats", nargs="+", choices=OUT_FORMATS, default=["csv"]
+    )
+    parser.add_argument("--scale-factor", type=float, default=1)
+    parser.add_argument("--safety-factor", type=float, default=1)
+    parser.add_argument(
+        "--max-relative-error",
+        type=float,
+        default=None,
+        help="Skip the rows whose relative error is over this value",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of files converted at the same time",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Read the files by slabs instead of loading them completely",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=list(COMPRESSIONS),
+        default=None,
+        help="Compress the text files (point_cloud, ip_fluent and csv)",
+    )
+    parser.add_argument("--compression-level", type=int, default=None)
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT.json",
+        default=None,
+        help="Save the time, memory and bytes written of every phase of the conversions",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        metavar="FILE.prof|FILE.html",
+        default=None,
+        help="Save a cProfile (.prof) or pyinstrument (.html) dump of each conversion",
+    )
+    return parser.parse_args(argv)
+
+
+# EXPAND THE GLOB PATTERNS TO A LIST OF VTK FILES
+def find_files(patterns):
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for filename in matches:
+            if filename.lower().endswith(VTK_EXTENSIONS) and filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+# CONVERT ONE FILE
+def convert_file(
+    filename,
+    list_array_names,
+    out_formats,
+    scale,
+    safety,
+    streaming,
+    compression=None,
+    compression_level=None,
+    profile=False,
+    profile_dump=None,
+    max_relative_error=None,
+):
+    # Runs in a worker process. Every file is converted in its own session, and any error is
+    # returned instead of raised.
+    # Returns (file name, ok, error message, profiling report or None)
+    session = functions.ConverterSession()
+    session.scale_factor = scale
+    session.safety_factor = safety
+    session.max_relative_error = max_relative_error
+    session.compression = compression
+    session.compression_level = compression_level
+    if profile:
+        profiling.start_profiling()
+    dump = contextlib.nullcontext()
+    if profile_dump is not None:
+        dump = profiling.profile_dump(dump_name(profile_dump, filename))
+    try:
+        with dump:
+            error = convert(session, filename, list_array_names, out_formats, streaming)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return filename, error is None, error or "", profiling.stop_profiling()
+
+
+def convert(session, filename, list_array_names, out_formats, streaming):  # Error or None
+    # Without list_array_names, all the cell arrays are written. When streaming, the reader
+    # that writes each format lists them, so the file is not read only to find their names.
+    if not streaming:
+        session.open_mesh(filename)
+        if list_array_names is None:
+            list_array_names = session.meshtals[filename].cells_info
+    for out_format in out_formats:
+        error = session.write_mesh(filename, list_array_names, out_format, streaming=streaming)
+        if error is not None:
+            return error
+    return None
+
+
+def dump_name(profile_dump, filename):  # One dump per converted file: dump_file.prof
+    stem, extension = os.path.splitext(profile_dump)
+    return f"{stem}_{os.path.splitext(os.path.basename(filename))[0]}{extension}"
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    filenames = find_files(args.files)
+    if len(filenames) == 0:
+        print(" No VTK file found")
+        return 2
+    workers = max(1, min(args.workers or 1, len(filenames)))
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                convert_file,
+                filename,
+                args.arrays,
+                args.formats,
+                args.scale_factor,
+                args.safety_factor,
+                args.streaming,
+                args.compression,
+                args.compression_level,
+                args.profile is not None,
+                args.profile_dump,
+                args.max_relative_error,
+            )
+            for filename in filenames
+        ]
+        for filename, future in zip(filenames, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:  # The worker process died
+                results.append((filename, False, f"{type(e).__name__}: {e}", None))
+
+    # Summary
+    n_failed = 0
+    print("\n Summary :")
+    for filename, ok, message, _ in results:
+        if ok:
+            print(f" - [OK]     {filename}")
+        else:
+            n_failed += 1
+            print(f" - [FAILED] {filename}: {message}")
+    print(f" {len(results) - n_failed} converted, {n_failed} failed")
+    if args.profile is not None:
+        with open(args.profile, "w") as f:
+            json.dump({filename: report for filename, _, _, report in results}, f, indent=2)
+        print(f" Profiling report saved in {args.profile}")
+    return 0 if n_failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
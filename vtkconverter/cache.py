@@ -0,0 +1,323 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_cache (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pyvista as pv
+import vtk
+
+from vtk.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "vtkconverter")
+CACHED_MESH_TYPES = ("StructuredGrid", "RectilinearGrid", "UnstructuredGrid")
+# Geometry of a MeshTally saved with the mesh if it is already computed: {file name: key}
+CACHED_GEOMETRY = {"centers": "centers", "volumes": "cell_volumes"}
+
+
+# LOCK A FILE FOR THE OTHER PROCESSES, WAITING FOR IT IF ANOTHER PROCESS HAS IT
+@contextmanager
+def locked_file(fn):
+    with open(fn, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# WRITE A JSON FILE ATOMICALLY: THE READERS GET THE OLD OR THE NEW ONE, NEVER A PART
+def write_json(fn, content):
+    descriptor, temporary_fn = tempfile.mkstemp(dir=os.path.dirname(fn), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w") as f:
+            json.dump(content, f)
+        os.replace(temporary_fn, fn)
+    except BaseException:
+        os.remove(temporary_fn)
+        raise
+
+
+# BUFFERS OF A MESH SAVED AS .npy FILES: {file name: (address, bytes, object in memory)}
+def mesh_buffers(mesh):
+    # The address identifies a buffer shared by several meshes. The object is a view of the
+    # buffer (or the vtkCellArray of the cells) that keeps it alive and can be given back to
+    # load_mesh_arrays instead of the file
+    def buffer(array):
+        array = np.asarray(array)
+        return array.__array_interface__["data"][0], array.nbytes, array
+
+    buffers = dict()
+    if isinstance(mesh, pv.RectilinearGrid):
+        buffers.update({axis: buffer(getattr(mesh, axis)) for axis in ("x", "y", "z")})
+    elif mesh.GetPoints() is not None:
+        buffers["points"] = buffer(mesh.points)
+    if isinstance(mesh, pv.UnstructuredGrid):  # The connectivity, only known by VTK
+        cells = mesh.GetCells()
+        address = buffer(vtk_to_numpy(cells.GetConnectivityArray()))[0]
+        buffers["cells"] = (address, cells.GetActualMemorySize() * 1024, cells)
+    for i, name in enumerate(mesh.cell_data):
+        buffers[f"cell_{i}"] = buffer(mesh.cell_data[name])
+    for i, name in enumerate(mesh.point_data):
+        buffers[f"point_{i}"] = buffer(mesh.point_data[name])
+    return {name: value for name, value in buffers.items() if value[1] > 0}
+
+
+# SAVE A MESH AS ONE .npy FILE PER ARRAY IN A DIRECTORY
+def save_mesh_arrays(directory, mesh, extra, filename="", kept=()):
+    # extra: other arrays saved with the mesh, e.g. its centers. kept: names of the buffers
+    # (see mesh_buffers) that are not saved because the caller keeps them in memory, e.g.
+    # because other meshes use them too. Returns the size in bytes
+    mesh_type = type(mesh).__name__
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    cells_info = list(mesh.cell_data)
+    points_info = list(mesh.point_data)
+    meta = {
+        "filename": filename,
+        "mesh_type": mesh_type,
+        "cells_info": cells_info,
+        "points_info": points_info,
+        "extra": list(extra),
+        "kept": list(kept),
+    }
+    arrays = dict(extra)
+    if mesh_type == "StructuredGrid":
+        meta["dimensions"] = list(mesh.dimensions)
+        arrays["points"] = mesh.points
+    elif mesh_type == "RectilinearGrid":
+        arrays.update({"x": mesh.x, "y": mesh.y, "z": mesh.z})
+    else:
+        arrays.update({"points": mesh.points, "celltypes": mesh.celltypes})
+        if "cells" not in kept:
+            arrays["cells"] = mesh.cells
+    for i, name in enumerate(cells_info):
+        arrays[f"cell_{i}"] = mesh.cell_data[name]
+    for i, name in enumerate(points_info):
+        arrays[f"point_{i}"] = mesh.point_data[name]
+    for name, values in arrays.items():
+        if name not in kept:
+            np.save(os.path.join(directory, name + ".npy"), np.asarray(values))
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return directory_size(directory)
+
+
+# SAVE THE BUFFERS KEPT IN MEMORY BY save_mesh_arrays, WHEN THEY ARE NOT NEEDED ANY MORE
+def save_kept_arrays(directory, kept):  # kept: {name: object of mesh_buffers}
+    with open(os.path.join(directory, "meta.json"), "r") as f:
+        meta = json.load(f)
+    for name, value in kept.items():
+        if name == "cells":  # Legacy layout: number of points of each cell and their ids
+            legacy = vtk.vtkIdTypeArray()
+            value.ExportLegacyFormat(legacy)
+            value = vtk_to_numpy(legacy)
+        np.save(os.path.join(directory, name + ".npy"), np.asarray(value))
+    meta["kept"] = [name for name in meta["kept"] if name not in kept]
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return directory_size(directory)
+
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+# READ A MESH SAVED WITH save_mesh_arrays
+def load_mesh_arrays(directory, mmap_mode=None, kept=None):
+    # Returns (mesh, dictionary of the extra arrays). With mmap_mode="c" the arrays are
+    # memory-mapped and their pages are only read when they are used. kept: {name: object of
+    # mesh_buffers} of the buffers that were not saved, the new mesh shares them
+    with open(os.path.join(directory, "meta.json"), "r") as f:
+        meta = json.load(f)
+    kept = dict() if kept is None else kept
+
+    def array(name):
+        if name in kept:
+            return kept[name]
+        return np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+
+    if meta["mesh_type"] == "StructuredGrid":
+        mesh = pv.StructuredGrid()
+        mesh.SetDimensions(meta["dimensions"])
+        mesh.SetPoints(pv.vtk_points(array("points"), deep=False))
+    elif meta["mesh_type"] == "RectilinearGrid":
+        mesh = pv.RectilinearGrid(array("x"), array("y"), array("z"))
+    elif "cells" in kept:
+        mesh = pv.UnstructuredGrid()
+        mesh.SetPoints(pv.vtk_points(array("points"), deep=False))
+        cell_types = np.asarray(array("celltypes"), dtype=np.uint8)
+        mesh.SetCells(numpy_to_vtk(cell_types, deep=True), kept["cells"])
+    else:
+        mesh = pv.UnstructuredGrid(
+            np.asarray(array("cells")), np.asarray(array("celltypes")), array("points")
+        )
+    for i, name in enumerate(meta["cells_info"]):
+        mesh.cell_data[name] = array(f"cell_{i}")
+    for i, name in enumerate(meta["points_info"]):
+        mesh.point_data[name] = array(f"point_{i}")
+    # The entries saved before the extra arrays were listed only have the centers and volumes
+    extra = {name: array(name) for name in meta.get("extra", ["centers", "volumes"])}
+    return mesh, extra
+
+
+# CLASS DEFINITION
+class MeshCache:
+    # Saves the meshes already read in a directory, one sub-directory per file, with every
+    # array in a .npy file that is memory-mapped when the file is opened again. The centers
+    # and volumes are saved too if they were already computed, they are never computed to be
+    # saved.
+    # An entry is identified by the hash of the content of the file. The hash is only
+    # computed again when the path, size or modification time of the file change.
+    # When the cache is bigger than max_size, the least recently used entries are deleted.
+    # The sessions of several threads and processes may use the same directory: every
+    # operation holds a lock (index.lock, for the processes), reads the index again and
+    # replaces index.json atomically, so an entry is never read while another one is
+    # writing it and no update of the index is lost.
+    lock = threading.RLock()
+
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_size=10 * 1024**3):  # bytes
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        self.index_fn = os.path.join(directory, "index.json")
+        self.lock_fn = os.path.join(directory, "index.lock")
+        with self.locked():
+            pass
+
+    @contextmanager
+    def locked(self):  # Lock the cache for the other threads and processes, with its index read
+        with MeshCache.lock, locked_file(self.lock_fn):
+            self.read_index()
+            yield
+
+    def read_index(self):
+        if os.path.isfile(self.index_fn):
+            with open(self.index_fn, "r") as f:
+                self.index = json.load(f)
+        else:
+            # "files": path -> [size, mtime, key], "entries": key -> [size, last use]
+            self.index = {"files": dict(), "entries": dict()}
+
+    def save_index(self):
+        write_json(self.index_fn, self.index)
+
+    def file_key(self, fn):
+        path = os.path.abspath(fn)
+        stat = os.stat(path)
+        known = self.index["files"].get(path)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        content_hash = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024**2), b""):
+                content_hash.update(block)
+        key = content_hash.hexdigest()
+        self.index["files"][path] = [stat.st_size, stat.st_mtime_ns, key]
+        return key
+
+    def entry_directory(self, key):
+        return os.path.join(self.directory, key)
+
+    # READ A MESH SAVED BEFORE
+    def load(self, fn):
+        # Returns (mesh, {MeshTally key: geometry saved with it}) or None if the file is not in
+        # the cache
+        with self.locked():
+            key = self.file_key(fn)
+            directory = self.entry_directory(key)
+            if key not in self.index["entries"] or not os.path.isdir(directory):
+                self.save_index()
+                return None
+            mesh, extra = load_mesh_arrays(directory, mmap_mode="c")
+            self.index["entries"][key][1] = time.time()
+            self.save_index()
+            geometry = {CACHED_GEOMETRY[name]: value for name, value in extra.items()}
+            return mesh, geometry
+
+    # SAVE A MESH
+    def store(self, fn, meshtal):
+        with self.locked():
+            if meshtal.mesh_type not in CACHED_MESH_TYPES:
+                return False
+            key = self.file_key(fn)
+            directory = self.entry_directory(key)
+            extra = dict()
+            for name, geometry_key in CACHED_GEOMETRY.items():
+                value = meshtal.computed(geometry_key)
+                if value is not None:
+                    extra[name] = value
+            size = save_mesh_arrays(directory, meshtal.mesh, extra, os.path.abspath(fn))
+            self.index["entries"][key] = [size, time.time()]
+            self.evict()
+            self.save_index()
+            return True
+
+    # DELETE THE LEAST RECENTLY USED ENTRIES UNTIL THE CACHE FITS IN max_size
+    def evict(self):
+        entries = self.index["entries"]
+        total = sum(size for size, _ in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k][1]):
+            if total <= self.max_size:
+                break
+            total -= entries[key][0]
+            del entries[key]
+            shutil.rmtree(self.entry_directory(key), ignore_errors=True)
+        # Forget the files whose entry does not exist any more
+        files = self.index["files"]
+        for path in [path for path in files if files[path][2] not in entries]:
+            del files[path]
+
+    def size(self):
+        with self.locked():
+            return sum(size for size, _ in self.index["entries"].values())
+
+    def clear(self):
+        with self.locked():
+            for key in list(self.index["entries"]):
+                shutil.rmtree(self.entry_directory(key), ignore_errors=True)
+            self.index = {"files": dict(), "entries": dict()}
+            self.save_index()
+
+
+# END OF CLASS DEFINITION
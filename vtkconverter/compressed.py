@@ -0,0 +1,129 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_compressed (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# Compressed text output. The text written by the exporters is passed to a background thread
+# that compresses it and writes it to the file, so the formatting of the next chunk overlaps
+# with the compression of the previous one (zlib, lzma and zstandard release the GIL).
+
+import gzip
+import lzma
+import os
+import queue
+import threading
+
+# Compression: (extension, optional module needed, default level)
+COMPRESSIONS = {
+    "gzip": (".gz", None, 6),
+    "xz": (".xz", None, 6),
+    "zstd": (".zst", "zstandard", 3),
+}
+
+
+def missing_compressor(compression):  # Error message if the module of a compression is missing
+    module = COMPRESSIONS[compression][1]
+    if module is None:
+        return None
+    try:
+        __import__(module)
+    except ImportError:
+        return (
+            f"The '{compression}' compression needs '{module}'."
+            f" Install it with: pip install {module}"
+        )
+    return None
+
+
+# OPEN A TEXT FILE FOR WRITING, COMPRESSED OR NOT
+def open_text(fn, compression=None, level=None, newline=None):
+    if compression is None:
+        return open(fn, "w", newline=newline)
+    return CompressedWriter(fn, compression, level, newline)
+
+
+# CLASS DEFINITION
+class CompressedWriter:
+    # Text file object whose content is compressed with gzip, xz or zstd. The newline argument
+    # works as in open(), so the decompressed text is the same as the one of a plain file.
+    # At most max_chunks written texts wait to be compressed, then write() blocks.
+    def __init__(self, fn, compression, level=None, newline=None, max_chunks=4):
+        if level is None:
+            level = COMPRESSIONS[compression][2]
+        self.name = fn
+        self.newline = os.linesep if newline is None else newline
+        self.raw = open(fn, "wb")
+        if compression == "gzip":  # No name nor time in the header, the files are reproducible
+            self.stream = gzip.GzipFile("", "wb", level, self.raw, mtime=0)
+        elif compression == "xz":
+            self.stream = lzma.LZMAFile(self.raw, "wb", preset=level)
+        elif compression == "zstd":
+            import zstandard
+
+            compressor = zstandard.ZstdCompressor(level=level)
+            self.stream = compressor.stream_writer(self.raw, closefd=False)
+        else:
+            self.raw.close()
+            raise ValueError(f"Unknown compression: {compression}")
+        self.error = None
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self.thread = threading.Thread(target=self.__compress__, daemon=True)
+        self.thread.start()
+
+    def __compress__(self):  # Runs in the background thread until close() sends None
+        while True:
+            data = self.queue.get()
+            if data is None:
+                return
+            if self.error is None:
+                try:
+                    self.stream.write(data)
+                except Exception as e:  # Raised in the main thread by write() or close()
+                    self.error = e
+
+    def write(self, text):
+        if self.error is not None:
+            raise self.error
+        if self.newline not in ("", "\n"):
+            text = text.replace("\n", self.newline)
+        self.queue.put(text.encode())
+        return len(text)
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        try:
+            self.stream.close()
+        finally:
+            self.raw.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# END OF CLASS DEFINITION
@@ -0,0 +1,172 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_expressions (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# Element-wise arithmetic expressions over the arrays of one or several meshes on the same
+# grid, e.g. "nhd + phd * 1.2". An expression has numbers, names of arrays, + - * / ** and the
+# functions abs, sqrt, exp, log and log10. It is evaluated by chunks of rows, so the
+# intermediate results are only chunk-sized: with numexpr if it is installed, otherwise with
+# numpy operations that write into the temporaries they already have.
+# The grids are compared by their fingerprint, a hash of their size and of a sample of their
+# coordinates, instead of comparing all the coordinates.
+
+import ast
+import hashlib
+
+import numpy as np
+import pyvista as pv
+
+from vtk.util.numpy_support import vtk_to_numpy
+
+try:
+    import numexpr
+except ImportError:  # The expressions are evaluated with numpy
+    numexpr = None
+
+FUNCTIONS = {"abs": np.abs, "sqrt": np.sqrt, "exp": np.exp, "log": np.log, "log10": np.log10}
+OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Pow: np.power,
+}
+UNARY_OPERATORS = {ast.USub: np.negative, ast.UAdd: np.positive}
+FINGERPRINT_SAMPLES = 4096  # Points (and connectivity values) hashed in the fingerprint
+
+
+# SYNTAX TREE OF AN EXPRESSION AND AN ERROR MESSAGE (NONE IF IT IS VALID)
+def parse_expression(expression):
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError:
+        return None, f"Invalid expression: {expression}"
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.Name, ast.Load)):
+            continue
+        if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+            continue
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            continue
+        if number(node) is not None or type(node) in OPERATORS or type(node) in UNARY_OPERATORS:
+            continue
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in FUNCTIONS
+            and len(node.args) == 1
+            and len(node.keywords) == 0
+        ):
+            continue
+        return None, (
+            f"Invalid expression: {expression}. It can only have numbers, arrays,"
+            f" + - * / ** and the functions {', '.join(FUNCTIONS)}"
+        )
+    if len(variable_names(tree)) == 0:
+        return None, "The expression must use at least one array"
+    return tree, None
+
+
+def number(node):  # Value of a number of the syntax tree, None if it is not a number
+    if type(node).__name__ not in ("Constant", "Num"):  # Num in Python 3.7
+        return None
+    value = node.n if type(node).__name__ == "Num" else node.value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def variable_names(tree):  # Names of the arrays used by the expression, in order
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    nodes = [
+        node for node in ast.walk(tree) if isinstance(node, ast.Name) and id(node) not in called
+    ]
+    nodes.sort(key=lambda node: node.col_offset)
+    return list(dict.fromkeys(node.id for node in nodes))
+
+
+# VALUES OF THE EXPRESSION FOR ALL THE ROWS OF THE ARRAYS (name -> values, same shape)
+def evaluate(tree, expression, arrays, chunk_size):
+    first = next(iter(arrays.values()))
+    result = np.empty(np.shape(first))
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for start in range(0, len(result), chunk_size):
+            end = min(start + chunk_size, len(result))
+            # float64 chunks, so that every operation can write into its temporaries
+            chunk = {
+                name: np.asarray(values[start:end], dtype=float) for name, values in arrays.items()
+            }
+            if numexpr is not None:
+                numexpr.evaluate(expression, local_dict=chunk, out=result[start:end])
+            else:
+                result[start:end] = evaluate_node(tree.body, chunk)[0]
+    return result
+
+
+def evaluate_node(node, chunk):  # (values, True if they are a temporary that can be reused)
+    if isinstance(node, ast.Name):
+        return chunk[node.id], False
+    value = number(node)
+    if value is not None:
+        return float(value), False
+    if isinstance(node, ast.UnaryOp):
+        operand, temporary = evaluate_node(node.operand, chunk)
+        return apply(UNARY_OPERATORS[type(node.op)], [operand], [temporary])
+    if isinstance(node, ast.Call):
+        argument, temporary = evaluate_node(node.args[0], chunk)
+        return apply(FUNCTIONS[node.func.id], [argument], [temporary])
+    left, left_temporary = evaluate_node(node.left, chunk)
+    right, right_temporary = evaluate_node(node.right, chunk)
+    return apply(OPERATORS[type(node.op)], [left, right], [left_temporary, right_temporary])
+
+
+def apply(function, operands, temporaries):
+    # The result is written into a temporary operand of the same shape, if there is one
+    shape = np.broadcast(*operands).shape
+    for operand, temporary in zip(operands, temporaries):
+        if temporary and operand.shape == shape:
+            return function(*operands, out=operand), True
+    result = function(*operands)
+    return result, isinstance(result, np.ndarray)
+
+
+# HASH OF A GRID: SIZE, BOUNDS AND A SAMPLE OF THE COORDINATES (THE WHOLE AXES OF A
+# RECTILINEARGRID) AND OF THE CONNECTIVITY OF AN UNSTRUCTUREDGRID
+def grid_fingerprint(mesh):
+    digest = hashlib.sha1(f"{type(mesh).__name__} {mesh.n_points} {mesh.n_cells}".encode())
+    if isinstance(mesh, (pv.StructuredGrid, pv.RectilinearGrid)):
+        digest.update(np.asarray(mesh.dimensions, dtype=np.int64).tobytes())
+    if isinstance(mesh, pv.RectilinearGrid):
+        for axis in (mesh.x, mesh.y, mesh.z):
+            digest.update(np.ascontiguousarray(axis, dtype=float).tobytes())
+    elif mesh.n_points > 0:
+        digest.update(np.ascontiguousarray(sample(mesh.points), dtype=float).tobytes())
+    if isinstance(mesh, pv.UnstructuredGrid):
+        connectivity = vtk_to_numpy(mesh.GetCells().GetConnectivityArray())
+        if len(connectivity) > 0:
+            digest.update(np.ascontiguousarray(sample(connectivity), dtype=np.int64).tobytes())
+    digest.update(np.asarray(mesh.bounds, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def sample(values):  # Evenly spaced rows
+    rows = np.linspace(0, len(values) - 1, min(len(values), FINGERPRINT_SAMPLES))
+    return np.asarray(values)[rows.astype(np.int64)]
@@ -28,41 +28,429 @@
 
 import pyvista as pv
 import numpy as np
-import csv
+import functools
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
 
-from copy import deepcopy
 from tqdm import tqdm
+from vtkconverter.cache import (
+    CACHED_MESH_TYPES,
+    DEFAULT_CACHE_DIRECTORY,
+    MeshCache,
+    load_mesh_arrays,
+    mesh_buffers,
+    save_kept_arrays,
+    save_mesh_arrays,
+)
+from vtkconverter.compressed import COMPRESSIONS, missing_compressor, open_text
+from vtkconverter.profiling import peak_memory, phase, profiled
+from vtkconverter.expressions import evaluate, grid_fingerprint, parse_expression, variable_names
+from vtkconverter.joining import join_meshes
+from vtkconverter.probe import (
+    PROBE_METHODS,
+    LatticeIndex,
+    build_index,
+    conservative_remap,
+    mesh_lattice,
+)
+from vtkconverter.readers import (
+    VTK_EXTENSIONS,
+    SlabReader,
+    close_mappings,
+    copy_mapped_arrays,
+    read_mesh,
+    read_point_list,
+)
+from vtkconverter.registry import MeshRegistry
+from vtkconverter.selection import box_mask, lattice_box_masks, plane_mask, threshold_mask
+from vtkconverter.transforms import Transform
+from vtkconverter.uncertainties import (
+    ErrorSum,
+    error_name,
+    error_pairs,
+    is_paired_error,
+    sum_relative_error,
+)
+from vtkconverter.writers import (
+    COLUMNAR_FORMATS,
+    column_names,
+    duplicated_column,
+    missing_dependency,
+    write_columnar,
+)
 
 
 # CLASS DEFINITION
 class MeshTally:
-    def __init__(self, fn):  # file name
+    # The attributes derived from the mesh (centers, volumes, bounds, array lists...) are only
+    # computed the first time they are used. Each one is saved together with the modification
+    # time of the part of the mesh it depends on, and it is computed again when that part changes.
+    def __init__(self, fn, mesh=None):  # file name, mesh already in memory (if any)
         self.filename = fn
-        self.mesh = pv.read(fn)
-        self.__read_mesh_info__()  # call this function to rewrite the mesh attributes after a change
+        self.spill_directory = None  # Where the mesh was saved when it was spilled to disk
+        self.kept = dict()  # Buffers shared with other meshes, not saved when it was spilled
+        # Region of interest: "cells" or "points" -> boolean mask of the selected ones. Only
+        # the selected rows are exported and used by the statistics (see selection.py).
+        self.selection = dict()
+        if mesh is None:
+            with phase("read"):
+                mesh = read_mesh(fn)
+        self.mesh = mesh
+
+    @property
+    def mesh(self):
+        if self._mesh is None:  # Spilled to disk by a MeshRegistry, it is read again
+            self.reload()
+        return self._mesh
+
+    @mesh.setter
+    def mesh(self, mesh):
+        self._mesh = mesh
+        self._cache = dict()
 
     def __read_mesh_info__(self):
-        self.centers = self.mesh.cell_centers().points
-        self.points = self.mesh.points
-        # List of arrays associated to cells
-        self.cells_info = list(self.mesh.cell_data)
-        # List of arrays associated to points
-        self.points_info = list(self.mesh.point_data)
-        self.n_coordinates = self.points.shape[1]  # Number of dimensions
-        self.mesh_type = str(type(self.mesh)).split(".")[-1][:-2]
+        # Forget every derived attribute, they will be computed again when they are needed
+        self._cache = dict()
+
+    def _cached(self, key, stamp, compute):
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, compute())
+            self._cache[key] = cached
+        return cached[1]
+
+    def geometry_time(self):  # last modification of the points, coordinates or cells
+        mesh = self.mesh
+        if isinstance(mesh, pv.RectilinearGrid):
+            parts = [mesh.GetXCoordinates(), mesh.GetYCoordinates(), mesh.GetZCoordinates()]
+        else:
+            parts = [mesh.GetPoints()]
+            if isinstance(mesh, pv.UnstructuredGrid):
+                parts.append(mesh.GetCells())
+        times = tuple(part.GetMTime() if part is not None else 0 for part in parts)
+        if isinstance(mesh, (pv.StructuredGrid, pv.RectilinearGrid)):
+            times += tuple(mesh.dimensions)
+        return times
+
+    def computed(self, key):  # Centers, volumes or bounds if they are already computed, or None
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != self.geometry_time():
+            return None
+        return cached[1]
+
+    def restamp_geometry(self, geometry_time):  # The geometry has not changed since then
+        new_time = self.geometry_time()
+        for key, cached in list(self._cache.items()):
+            if cached[0] == geometry_time:
+                self._cache[key] = (new_time, cached[1])
+
+    def set_geometry_cache(self, key, value):  # e.g. centers or cell volumes read from a cache
+        self._cache[key] = (self.geometry_time(), value)
+
+    def arrays_time(self):  # last modification of the cell or point arrays
+        return self.mesh.GetCellData().GetMTime(), self.mesh.GetPointData().GetMTime()
+
+    @property
+    def centers(self):
+        return self._cached("centers", self.geometry_time(), self.compute_centers)
+
+    def compute_centers(self):
+        # The centers of a RectilinearGrid are obtained directly from its axes
+        with phase("cell_centers"):
+            if self.mesh_type == "RectilinearGrid":
+                return rectilinear_centers(self.mesh)
+            return self.mesh.cell_centers().points
+
+    @property
+    def cell_volumes(self):
+        return self._cached("cell_volumes", self.geometry_time(), self.compute_cell_volumes)
+
+    def compute_cell_volumes(self):
+        with phase("cell_volumes"):
+            if self.mesh_type == "RectilinearGrid":
+                return rectilinear_volumes(self.mesh)
+            sizes = self.mesh.compute_cell_sizes(length=False, area=False, volume=True)
+            return np.abs(sizes["Volume"])
+
+    @property
+    def bounds(self):
+        return self._cached("bounds", self.geometry_time(), lambda: tuple(self.mesh.bounds))
+
+    @property
+    def points(self):
+        return self.mesh.points
+
+    @property
+    def spatial_index(self):  # Built the first time a point is probed (see probe.py)
+        return self._cached("spatial_index", self.geometry_time(), lambda: build_index(self.mesh))
+
+    @property
+    def fingerprint(self):  # Hash of the grid, equal for the meshes on the same grid
+        return self._cached(
+            "fingerprint", self.geometry_time(), lambda: grid_fingerprint(self.mesh)
+        )
+
+    def selected(self, values, values_type):  # Rows of the values in the region of interest
+        return take_rows(values, self.selection.get(values_type))
+
+    def n_selected(self, values_type):
+        mask = self.selection.get(values_type)
+        if mask is not None:
+            return int(np.count_nonzero(mask))
+        return self.mesh.n_cells if values_type == "cells" else self.mesh.n_points
+
+    @property
+    def cells_info(self):  # List of arrays associated to cells
+        return self._cached("cells_info", self.arrays_time(), lambda: list(self.mesh.cell_data))
+
+    @property
+    def points_info(self):  # List of arrays associated to points
+        return self._cached(
+            "points_info", self.arrays_time(), lambda: list(self.mesh.point_data)
+        )
+
+    @property
+    def n_coordinates(self):  # Number of dimensions
+        return self.points.shape[1]
+
+    @property
+    def mesh_type(self):
+        return type(self.mesh).__name__
+
+    # RELEASE THE MESH FROM MEMORY SAVING IT IN A DIRECTORY (SPILL TO DISK)
+    def spill(self, directory, shared=()):  # Returns the bytes written, None if not saved
+        # shared: addresses of the buffers also used by other meshes in memory. Saving them
+        # would not free them, so they are kept in memory and given back to the mesh when it
+        # is read again: it still shares them then
+        if self.mesh_type not in CACHED_MESH_TYPES:
+            return None
+        # The centers and volumes already computed are saved too
+        geometry_time = self.geometry_time()
+        extra = {
+            key: cached[1]
+            for key, cached in self._cache.items()
+            if key in ("centers", "cell_volumes") and cached[0] == geometry_time
+        }
+        kept = {
+            name: buffer
+            for name, buffer in mesh_buffers(self._mesh).items()
+            if buffer[0] in shared
+        }
+        with phase("spill"):
+            size = save_mesh_arrays(directory, self._mesh, extra, self.filename, list(kept))
+        self.spill_directory = directory
+        self.kept = kept
+        self._mesh = None
+        self._cache = dict()
+        return size
+
+    def save_kept(self, names):  # The shared buffers kept are not used by other meshes any more
+        with phase("spill"):
+            size = save_kept_arrays(
+                self.spill_directory, {name: self.kept.pop(name)[2] for name in names}
+            )
+        return size
+
+    def reload(self):
+        with phase("reload"):
+            kept = {name: buffer[2] for name, buffer in self.kept.items()}
+            mesh, extra = load_mesh_arrays(self.spill_directory, kept=kept)
+        self.kept = dict()
+        self.mesh = mesh
+        for key, value in extra.items():
+            self.set_geometry_cache(key, value)
+
+    # COPY INTO MEMORY THE ARRAYS THAT ARE VIEWS OF A MEMORY-MAPPED FILE (see readers.py)
+    def release_file(self, fn):
+        if self._mesh is None:  # Spilled to disk, its arrays were read again from a copy
+            return
+        geometry_time = self.geometry_time()
+        if copy_mapped_arrays(self._mesh, fn):
+            # The values are the same, so the centers and volumes are still valid, but the
+            # spatial index has its own references to the old points
+            self.restamp_geometry(geometry_time)
+            self._cache.pop("spatial_index", None)
+
+    @property
+    def resident(self):  # False while the mesh is spilled to disk
+        return self._mesh is not None
+
+    def memory_buffers(self):  # {address: bytes} of the arrays in memory
+        # An array shared with other meshes has the same address in all of them. A spilled mesh
+        # still has the shared buffers it keeps
+        if self._mesh is None:
+            return {address: nbytes for address, nbytes, _ in self.kept.values()}
+        buffers = {
+            address: nbytes for address, nbytes, _ in mesh_buffers(self._mesh).values()
+        }
+        for _, value in self._cache.values():
+            if isinstance(value, np.ndarray) and value.nbytes > 0:
+                buffers[value.__array_interface__["data"][0]] = value.nbytes
+        return buffers
 
 
 # END OF CLASS DEFINITION
 
 
+# RECTILINEAR GRID GEOMETRY
+# The cells of a RectilinearGrid are given by its three 1-D axes, so the centers and volumes
+# are obtained from the axes without building the explicit points of the grid.
+# The cells are ordered with x varying fastest, then y and then z, as in VTK.
+def axis_centers(axis):
+    axis = np.asarray(axis, dtype=float)
+    if len(axis) == 1:  # Flat axis (2D grid)
+        return axis
+    return axis[:-1] + 0.5 * (axis[1:] - axis[:-1])  # Same operation as VTK cell_centers
+
+
+def axis_sizes(axis):
+    if len(axis) == 1:  # Flat axis (2D grid), the cells have no volume
+        return np.zeros(1)
+    return np.abs(np.diff(np.asarray(axis, dtype=float)))
+
+
+def rectilinear_centers(mesh):
+    x, y, z = np.meshgrid(
+        axis_centers(mesh.x), axis_centers(mesh.y), axis_centers(mesh.z), indexing="ij"
+    )
+    centers = np.column_stack((x.ravel(order="F"), y.ravel(order="F"), z.ravel(order="F")))
+    return centers.astype(mesh.x.dtype if mesh.x.dtype.kind == "f" else float, copy=False)
+
+
+def rectilinear_volumes(mesh):
+    volumes = np.multiply.outer(
+        np.multiply.outer(axis_sizes(mesh.x), axis_sizes(mesh.y)), axis_sizes(mesh.z)
+    )
+    return volumes.ravel(order="F")
+
+
+# COPY A MESHTALLY SHARING ITS DATA
+def shallow_copy(meshtal, own_points=False):
+    # The cell and point arrays of the copy are the same arrays of the original mesh, not
+    # copies: writing in place in an array of one mesh changes the other one too. The
+    # operations never do it, they only replace the geometry of the copy or add new arrays.
+    # The copy gets its own vtkPoints so that replacing its points never changes the
+    # original, and with own_points those points are also a new array that can be modified
+    # in place.
+    with phase("copy"):
+        geometry_time = meshtal.geometry_time()
+        mesh = meshtal.mesh.copy(deep=False)
+        if not isinstance(mesh, pv.RectilinearGrid):
+            mesh.SetPoints(pv.vtk_points(meshtal.mesh.points, deep=own_points))
+        # Sharing the points marks them as modified in VTK, but they are the same, so the
+        # centers and volumes of the original are still valid
+        meshtal.restamp_geometry(geometry_time)
+    return MeshTally(meshtal.filename, mesh=mesh)
+
+
+# MESHTALLY TRANSFORMED BY THE 4x4 AFFINE MATRIX OF A Transform
+def transformed(meshtal, transform):
+    # The arrays are shared with the original mesh and the points are transformed in one pass.
+    # The centers and volumes already computed are transformed too instead of being computed
+    # again from the new mesh.
+    centers = meshtal.computed("centers")
+    cell_volumes = meshtal.computed("cell_volumes")
+    bounds = meshtal.computed("bounds")
+    if transform.is_identity():  # Even the points are shared
+        new_meshtal = shallow_copy(meshtal)
+    elif meshtal.mesh_type == "RectilinearGrid" and transform.keeps_axes():
+        new_meshtal = shallow_copy(meshtal)
+        mesh = new_meshtal.mesh
+        mesh.x, mesh.y, mesh.z = transform.apply_axes(mesh.x, mesh.y, mesh.z)
+    else:
+        if meshtal.mesh_type == "RectilinearGrid":  # The explicit points are needed
+            new_meshtal = convert_to_sg(meshtal)
+        else:
+            new_meshtal = shallow_copy(meshtal)
+        with phase("transform_points"):
+            new_points = transform.apply(new_meshtal.points)
+        new_meshtal.mesh.SetPoints(pv.vtk_points(new_points, deep=False))
+    new_meshtal.__read_mesh_info__()
+    if centers is not None:
+        with phase("transform_centers"):
+            new_meshtal.set_geometry_cache("centers", transform.apply(centers))
+    if cell_volumes is not None:
+        factor = transform.volume_factor()
+        if not np.isclose(factor, 1):
+            cell_volumes = cell_volumes * factor
+        new_meshtal.set_geometry_cache("cell_volumes", cell_volumes)
+    # The box of the bounds only stays the box of the mesh if the axes are kept
+    if bounds is not None and transform.keeps_axes():
+        low, high = transform.apply(np.array([bounds[0::2], bounds[1::2]], dtype=float))
+        new_bounds = tuple(value for pair in zip(low, high) for value in pair)
+        new_meshtal.set_geometry_cache("bounds", new_bounds)
+    return new_meshtal
+
+
+# MESHTALLY OBJECTS IN MEMORY, WITHOUT READING AGAIN THE ONES SPILLED TO DISK
+def resident_meshtals(meshtals):
+    if isinstance(meshtals, MeshRegistry):
+        return [meshtal for meshtal in meshtals.meshtals.values() if meshtal.resident]
+    return list(meshtals.values())
+
+
+# ROWS OF A MASK (ALL THE ROWS IF IT IS NONE)
+def take_rows(values, rows):
+    if rows is None:
+        return values
+    return values[rows]
+
+
+# COORDINATES MULTIPLIED BY THE SCALE FACTOR, NOT COPIED WHEN IT IS 1
+def scaled(points, factor):
+    if factor == 1:
+        return points
+    return points * factor
+
+
+# MEMORY USED BY A MESH
+def data_nbytes(mesh):  # cell and point arrays
+    arrays = [mesh.cell_data[name] for name in mesh.cell_data]
+    arrays += [mesh.point_data[name] for name in mesh.point_data]
+    return sum(np.asarray(array).nbytes for array in arrays)
+
+
+def geometry_nbytes(mesh):  # points or axes
+    if isinstance(mesh, pv.RectilinearGrid):
+        return mesh.x.nbytes + mesh.y.nbytes + mesh.z.nbytes
+    return mesh.points.nbytes
+
+
+def print_memory(new_meshtal, meshtal):
+    allocated = geometry_nbytes(new_meshtal.mesh) / 1024**2
+    shared = data_nbytes(meshtal.mesh) / 1024**2
+    peak = peak_memory()
+    message = (
+        f" Memory: {allocated:.1f} MB allocated,"
+        f" {shared:.1f} MB shared with '{meshtal.filename}'"
+    )
+    if peak is not None:
+        message += f", peak memory of the process {peak:.1f} MB"
+    print(message)
+
+
 # GLOBAL VARIABLES DEFINITION
 
 meshtals = (
-    dict()
+    MeshRegistry()
 )  # Here is where all MeshTally objects are saved. The key of each object (value) is its filename
 
 scale_factor = 1  # Defect value is 1
 safety_factor = 1  # Defect value is 1
+max_relative_error = None  # Values with a larger relative error are not exported, None for all
+chunk_size = 100000  # Number of rows formatted and written at once by the exporters
+export_workers = 1  # Processes writing the files of several arrays, threads probing points
+compression = None  # "gzip", "xz" or "zstd" to compress the text files written
+compression_level = None  # Default level of the compression if None
+mesh_cache = None  # On-disk cache of the opened meshes, only used if enabled (enable_cache)
 
 
 # GET IF AN ARRAY IS ASSOCIATED TO EITHER POINTS OR CELLS
@@ -75,34 +463,133 @@ def get_array_type(meshtal, array_name):
         return "Invalid"
 
 
-def open_mesh(filename):
-    if filename in meshtals:
-        print("This file is already open")
-    else:
-        meshtal = MeshTally(filename)
-        meshtals[meshtal.filename] = meshtal  # Open and save the MeshTally object
-        # An object is called by its file name
-        print("This file has been opened successfully")
+# DECORATOR: ONLY ONE OPERATION OF A SESSION RUNS AT A TIME
+def synchronized(method):
+    # The meshes used during an operation may be read again from disk through the references
+    # kept by the operation, so the memory budget is applied again when it ends
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            self.depth += 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.depth -= 1
+                if self.depth == 0 and isinstance(self.meshtals, MeshRegistry):
+                    self.meshtals.fit()
 
+    return wrapper
 
-# PRINT SOME INFORMATION OF A MESHTALLY OBJECT
-def print_general_info(meshtal_fn):
-    meshtal = meshtals[meshtal_fn]
-    dimensions = (
-        meshtal.mesh.bounds[1] - meshtal.mesh.bounds[0],
-        meshtal.mesh.bounds[3] - meshtal.mesh.bounds[2],
-        meshtal.mesh.bounds[5] - meshtal.mesh.bounds[4],
-    )
-    file = f"""
+
+class SessionVariable:
+    # Attribute of a ConverterSession saved in its namespace instead of in the object
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, session, owner):
+        if session is None:
+            return self
+        return getattr(session.namespace, self.name)
+
+    def __set__(self, session, value):
+        setattr(session.namespace, self.name, value)
+
+
+# CLASS DEFINITION
+class ConverterSession:
+    # Owns its MeshTally objects, factors, exporter options and mesh cache, so that several
+    # conversions can run at the same time in one process, e.g. one session per thread.
+    # The operations of a session run one at a time, independent sessions run in parallel.
+    # The variables are saved in a namespace: the default session (default_session), used by
+    # the functions of this module, has the module itself as namespace, so functions.meshtals,
+    # functions.scale_factor... are the variables of the default session.
+    meshtals = SessionVariable()
+    scale_factor = SessionVariable()
+    safety_factor = SessionVariable()
+    max_relative_error = SessionVariable()
+    chunk_size = SessionVariable()
+    export_workers = SessionVariable()
+    compression = SessionVariable()
+    compression_level = SessionVariable()
+    mesh_cache = SessionVariable()
+
+    def __init__(self, namespace=None):
+        if namespace is None:  # Same default values as the variables of the module
+            namespace = types.SimpleNamespace(
+                meshtals=MeshRegistry(),
+                scale_factor=1,
+                safety_factor=1,
+                max_relative_error=None,
+                chunk_size=100000,
+                export_workers=1,
+                compression=None,
+                compression_level=None,
+                mesh_cache=None,
+            )
+        self.namespace = namespace
+        self.lock = threading.RLock()
+        self.depth = 0  # Number of operations running, one inside another
+
+    @synchronized
+    @profiled
+    def open_mesh(self, filename):
+        if filename in self.meshtals:
+            print("This file is already open")
+        else:
+            meshtal = self.read_meshtal(filename)
+            self.meshtals[meshtal.filename] = meshtal  # Open and save the MeshTally object
+            # An object is called by its file name
+            print("This file has been opened successfully")
+
+    # READ A FILE, FROM THE CACHE IF IT HAS BEEN READ BEFORE
+    @synchronized
+    def read_meshtal(self, filename):
+        if self.mesh_cache is None:
+            return MeshTally(filename)
+        with phase("cache_load"):
+            cached = self.mesh_cache.load(filename)
+        if cached is None:
+            meshtal = MeshTally(filename)
+            with phase("cache_store"):
+                self.mesh_cache.store(filename, meshtal)
+        else:
+            mesh, geometry = cached
+            meshtal = MeshTally(filename, mesh=mesh)
+            for key, value in geometry.items():  # Only what was computed before it was saved
+                meshtal.set_geometry_cache(key, value)
+        return meshtal
+
+    # USE AN ON-DISK CACHE OF THE OPENED FILES
+    @synchronized
+    def enable_cache(self, directory=DEFAULT_CACHE_DIRECTORY, max_size=10 * 1024**3):  # bytes
+        self.mesh_cache = MeshCache(directory, max_size)
+        print(f"Mesh cache enabled in '{directory}'")
+
+    @synchronized
+    def disable_cache(self):
+        self.mesh_cache = None
+
+    # PRINT SOME INFORMATION OF A MESHTALLY OBJECT
+    @synchronized
+    @profiled
+    def print_general_info(self, meshtal_fn):
+        meshtal = self.meshtals[meshtal_fn]
+        bounds = meshtal.bounds
+        dimensions = (
+            bounds[1] - bounds[0],
+            bounds[3] - bounds[2],
+            bounds[5] - bounds[4],
+        )
+        file = f"""
 Name: {meshtal.filename}
     """
-    formatted_mesh_bounds = ""
-    for x in meshtal.mesh.bounds:
-        formatted_mesh_bounds += f" {x:.2f}"
-    formatted_dimensions = ""
-    for x in dimensions:
-        formatted_dimensions += f" {x:.2f}"
-    mesh = f"""
+        formatted_mesh_bounds = ""
+        for x in bounds:
+            formatted_mesh_bounds += f" {x:.2f}"
+        formatted_dimensions = ""
+        for x in dimensions:
+            formatted_dimensions += f" {x:.2f}"
+        mesh = f"""
 Number of cells: {meshtal.mesh.n_cells}
 Number of points: {meshtal.mesh.n_points}
 Cells arrays: {str(meshtal.cells_info)}
@@ -112,311 +599,1273 @@ Mesh bounds: {formatted_mesh_bounds}
 Mesh dimensions: {formatted_dimensions}
 Mesh type: {meshtal.mesh_type}
     """
-    print(file + "\n" + mesh)
+        print(file + "\n" + mesh)
+        if len(meshtal.selection) > 0:
+            print(
+                f"Selected: {meshtal.n_selected('cells')} cells and"
+                f" {meshtal.n_selected('points')} points"
+            )
+        if isinstance(self.meshtals, MeshRegistry):
+            print(self.meshtals.usage_info())
 
+    @synchronized
+    @profiled
+    def print_array_info(self, meshtal_fn, array_name):
+        meshtal = self.meshtals[meshtal_fn]
+        if get_array_type(meshtal, array_name) == "Invalid":
+            print("This array doesn't belong to neither cells nor points")
+            return
+        stats = self.array_statistics(meshtal_fn, [array_name]).get(array_name)
+        if stats is not None:
+            print_statistics(stats)
 
-def print_array_info(meshtal_fn, array_name):
-    meshtal = meshtals[meshtal_fn]
-    if get_array_type(meshtal, array_name) == "cells":  # For cells
-        min_value = min(meshtal.mesh[array_name])
-        max_value = max(meshtal.mesh[array_name])
-        (
-            integral_no_volume,
-            average_no_volume,
-            integral_volume,
-            average_volume,
-        ) = integral_and_average(meshtal_fn, array_name)
+    @synchronized
+    @profiled
+    def print_all_arrays_info(self, meshtal_fn):
+        # The statistics of all the arrays are computed together
+        all_stats = self.array_statistics(meshtal_fn)
+        for array_name, stats in all_stats.items():
+            print(f"\n            Array: {array_name}")
+            print_statistics(stats)
+
+    @synchronized
+    @profiled
+    def integral_and_average(self, meshtal_fn, array_name):
+        stats = self.array_statistics(meshtal_fn, [array_name], percentiles=()).get(array_name)
+        if stats is None:  # Invalid or vector array
+            return None
+        # for cells, the volume value is used to calculate the weight of each value of the array
+        if stats["type"] == "cells":
+            return (
+                stats["integral_no_volume"],
+                stats["average_no_volume"],
+                stats["integral_volume"],
+                stats["average_volume"],
+            )
+        else:  # In meshtal.points_info
+            return stats["integral"], stats["average"]
+
+    # STATISTICS OF ONE OR SEVERAL ARRAYS
+    @synchronized
+    @profiled
+    def array_statistics(self, meshtal_fn, list_array_names=None, percentiles=(5, 50, 95)):
+        # The statistics are reduced one array at a time, so only one array (and its copy if it
+        # has a selection or is not float64) is in memory besides the mesh. The integrals and
+        # averages follow the NaN values, while the minimum, maximum and percentiles ignore them.
+        # If no array is given, the statistics of all the arrays of the mesh are computed.
+        # The arrays with several components (vectors) have no statistics and are skipped.
+        # The value arrays with a relative error array (see uncertainties.py) also get the
+        # relative error of their integrals, which is the one of their averages too.
+        meshtal = self.meshtals[meshtal_fn]
+        if list_array_names is None:
+            list_array_names = meshtal.cells_info + meshtal.points_info
+        pairs = error_pairs(meshtal.cells_info + meshtal.points_info)
+        statistics = dict()
+        for array_name in list_array_names:
+            values_type = get_array_type(meshtal, array_name)
+            if values_type == "Invalid":
+                continue
+            rows = meshtal.selection.get(values_type)
+            values = scalar_values(meshtal, array_name, rows)
+            if values is None:
+                print(f" {array_name} has several components, only scalar arrays have statistics")
+                continue
+            stats = {"type": values_type}
+            stats.update(reduce_values(values, percentiles))
+            integral = values.sum()
+            if array_name in pairs:
+                errors = scalar_values(meshtal, pairs[array_name], rows)
+            if values_type == "cells":
+                # The volumes of the cells are computed once and saved in the MeshTally
+                volumes = meshtal.selected(meshtal.cell_volumes, "cells")
+                integral_volume = np.dot(volumes, values)
+                stats["integral_no_volume"] = integral.item()
+                stats["average_no_volume"] = divided(integral, len(values))
+                stats["integral_volume"] = integral_volume.item()
+                stats["average_volume"] = divided(integral_volume, volumes.sum())
+                if array_name in pairs:
+                    error = sum_relative_error(values, errors)
+                    stats["integral_no_volume_error"] = error.item()
+                    error = sum_relative_error(values, errors, volumes)
+                    stats["integral_volume_error"] = error.item()
+            else:
+                stats["integral"] = integral.item()
+                stats["average"] = divided(integral, len(values))
+                if array_name in pairs:
+                    stats["integral_error"] = sum_relative_error(values, errors).item()
+            statistics[array_name] = stats
+        return statistics
+
+    # CHANGE SCALE FACTOR
+    @synchronized
+    def change_scale_factor(self, n):
+        self.scale_factor = n
+        print(f"Scale factor = {n}")
+
+    # CHANGE THE MEMORY BUDGET OF THE OPENED MESHES
+    @synchronized
+    def change_memory_budget(self, n):  # MB, None for no limit
+        if not isinstance(self.meshtals, MeshRegistry):  # e.g. a dict given by the user
+            self.meshtals = MeshRegistry(self.meshtals)
+        self.meshtals.memory_budget = None if n is None else float(n) * 1024**2
+        self.meshtals.fit()
+        print("Memory budget = no limit" if n is None else f"Memory budget = {n} MB")
+
+    # CHANGE SAFETY FACTOR
+    @synchronized
+    def change_safety_factor(self, n):
+        self.safety_factor = n
+        print(f"Safety factor = {n}")
+
+    # CHANGE THE LARGEST RELATIVE ERROR OF THE VALUES EXPORTED
+    @synchronized
+    def change_max_relative_error(self, n):  # None to export all the values
+        # The rows whose value arrays have a larger relative error are not written by
+        # write_mesh (only for the arrays with a relative error array, see uncertainties.py)
+        self.max_relative_error = n
+        print(f"Maximum relative error = {n}")
+
+    # CHANGE THE NUMBER OF PROCESSES USED TO WRITE SEVERAL ARRAYS
+    @synchronized
+    def change_export_workers(self, n):
+        self.export_workers = max(1, int(n))
+        print(f"Export workers = {self.export_workers}")
+
+    # CHANGE THE COMPRESSION OF THE TEXT FILES
+    @synchronized
+    def change_compression(self, method=None, level=None):  # None to write plain text files
+        if method is not None and method not in COMPRESSIONS:
+            print(f"Invalid compression. It must be: {', '.join(COMPRESSIONS)} or None")
+            return
+        error = None if method is None else missing_compressor(method)
+        if error is not None:
+            print(error)
+            return
+        self.compression = method
+        self.compression_level = level
+        print(f"Compression = {method}" + ("" if level is None else f" (level {level})"))
+
+    # CHANGE COORDINATES SYSTEM
+    @synchronized
+    @profiled
+    def translate(self, meshtal_fn, x=0, y=0, z=0):
+        # A RectilinearGrid is translated by shifting its axes, so it stays a RectilinearGrid
+        # and its explicit points are never built
+        new_name = self.rigid_motion(meshtal_fn, Transform().translate(x, y, z))
+        if new_name is not None:
+            print(f"Translation applied successfully. '{new_name}' has been created.")
+            print_memory(self.meshtals[new_name], self.meshtals[meshtal_fn])
+
+    @synchronized
+    @profiled
+    def rotate(
+        self, meshtal_fn, theta_x=0, theta_y=0, theta_z=0
+    ):  # Only around one axis. If not, assume order: x --> y --> z
+        # A RectilinearGrid is converted to StructuredGrid, unless the rotation leaves the mesh
+        # as it is
+        new_name = self.rigid_motion(meshtal_fn, Transform().rotate(theta_x, theta_y, theta_z))
+        if new_name is not None:
+            print(f"Rotation applied successfully. '{new_name}' has been created.")
+            print_memory(self.meshtals[new_name], self.meshtals[meshtal_fn])
+
+    def rigid_motion(self, meshtal_fn, transform):  # Returns the name of the new mesh
+        # The points are moved with one matrix product, and the centers, volumes and bounds
+        # already known are moved too instead of being computed again from the new mesh
+        meshtal = self.meshtals[meshtal_fn]
+        if meshtal.mesh_type not in ("RectilinearGrid", "StructuredGrid", "UnstructuredGrid"):
+            print(
+                " Mesh type must be either RectilinearGrid, StructuredGrid or UnstructuredGrid"
+            )
+            return None
+        new_meshtal = transformed(meshtal, transform)
+        new_name = meshtal.filename[:-4] + transform.name + new_meshtal.filename[-4:]
+        new_meshtal.filename = new_name
+        self.meshtals[new_name] = new_meshtal
+        return new_name
+
+    # VALUES OF THE ARRAYS AT ANY POINTS
+    @synchronized
+    @profiled
+    def probe(self, meshtal_fn, points, list_array_names=None, method="nearest"):
+        # points: (n, 3) coordinates. Returns {array name: values at the points, NaN out of the
+        # mesh}. The points are probed in batches of chunk_size with the spatial index of the
+        # mesh, which is built the first time and reused while the mesh is not changed.
+        meshtal = self.meshtals[meshtal_fn]
+        if method not in PROBE_METHODS:
+            print(f" Invalid method. It must be: {', '.join(PROBE_METHODS)}")
+            return None
+        arrays = probed_arrays(meshtal, list_array_names)
+        if arrays is None:
+            return None
+        points = np.asarray(points, dtype=float).reshape((-1, 3))
+        return self.probe_batches(meshtal, points, arrays, method)
+
+    def probe_batches(self, meshtal, points, arrays, method):
+        # The batches are probed by export_workers threads, which share the mesh and its index
+        with phase("spatial_index"):
+            index = meshtal.spatial_index
+        ranges = list(chunk_ranges(len(points), self.chunk_size))
+
+        def probe_batch(start_end):
+            start, end = start_end
+            return index.probe(points[start:end], arrays, method)
+
+        if self.export_workers > 1 and len(ranges) > 1:
+            with ThreadPoolExecutor(max_workers=self.export_workers) as executor:
+                batches = list(executor.map(probe_batch, ranges))
+        else:
+            batches = [probe_batch(start_end) for start_end in ranges]
+        return {
+            array_name: np.concatenate([batch[array_name] for batch in batches])
+            if len(batches) > 0
+            else np.empty(0)
+            for array_name in arrays
+        }
+
+    # RESAMPLE THE ARRAYS ON ANOTHER MESH (VTK FILE) OR ON A LIST OF POINTS (TEXT FILE)
+    @synchronized
+    @profiled
+    def remap(self, meshtal_fn, target_fn, list_array_names=None, method="nearest"):
+        # The new MeshTally has the geometry of the target and the arrays of the meshtal: the
+        # cell arrays at the target cell centers and the point arrays at the target points (at
+        # the points of a list for both). With "conservative", every target cell gets the
+        # integral of a cell array over it divided by its volume (both meshes must be
+        # lattices); the point arrays are then interpolated with "trilinear".
+        meshtal = self.meshtals[meshtal_fn]
+        if method not in PROBE_METHODS + ("conservative",):
+            print(f" Invalid method. It must be: {', '.join(PROBE_METHODS)}, conservative")
+            return None
+        arrays = probed_arrays(meshtal, list_array_names)
+        if arrays is None:
+            return None
+        point_list = not target_fn.lower().endswith(VTK_EXTENSIONS + (".vtp",))
+        with phase("read"):
+            if point_list:
+                target_mesh = pv.PolyData(read_point_list(target_fn))
+            else:
+                target_mesh = read_mesh(target_fn).copy(deep=False)
+                target_mesh.clear_data()
+        extension = ".vtp" if point_list else target_fn[-4:]
+        source_name = os.path.basename(meshtal.filename)[:-4]
+        new_name = f"{target_fn[:-4]}+Remap({source_name}){extension}"
+        target = MeshTally(new_name, mesh=target_mesh)
+        if method == "conservative":
+            target_index = None if point_list else build_index(target_mesh)
+            source_index = meshtal.spatial_index
+            if not isinstance(source_index, LatticeIndex) or not isinstance(
+                target_index, LatticeIndex
+            ):
+                print(
+                    " Conservative remapping needs RectilinearGrid meshes, or StructuredGrid"
+                    " meshes whose points are a rectilinear lattice"
+                )
+                return None
+        for values_type in ("cells", "points"):
+            group = {name: item for name, item in arrays.items() if item[0] == values_type}
+            if len(group) == 0:
+                continue
+            if point_list or values_type == "points":
+                data, points = target_mesh.point_data, target.points
+            else:
+                data, points = target_mesh.cell_data, target.centers
+            if method == "conservative" and values_type == "cells":
+                with phase("conservative"):
+                    for array_name, (_, values) in group.items():
+                        remapped = conservative_remap(
+                            source_index.axes, target_index.axes, values
+                        )
+                        if remapped is None:
+                            print(" The meshes must be both flat or not along each axis")
+                            return None
+                        data[array_name] = remapped
+            else:
+                group_method = "trilinear" if method == "conservative" else method
+                points = np.asarray(points, dtype=float)
+                for array_name, values in self.probe_batches(
+                    meshtal, points, group, group_method
+                ).items():
+                    data[array_name] = values
+        target.__read_mesh_info__()
+        self.meshtals[new_name] = target
+        print(f"Remap applied successfully. '{new_name}' has been created.")
+        return new_name
+
+    # REGION OF INTEREST: ONLY THE SELECTED CELLS AND POINTS ARE EXPORTED AND USED BY THE
+    # STATISTICS. Each selection is combined with the previous ones (only what is in all of
+    # them stays selected) until clear_selection. The mesh is not copied. The streaming
+    # exports and the meshes created from this one (translate, remap...) ignore the selection.
+    @synchronized
+    @profiled
+    def select_box(self, meshtal_fn, bounds):  # bounds: x_min, x_max, y_min, y_max, z_min, z_max
+        # A cell is selected if its center is in the box. In a RectilinearGrid (or a lattice
+        # StructuredGrid) the box is one range of indices per axis: the centers are not needed
+        meshtal = self.meshtals[meshtal_fn]
+        axes = None
+        if meshtal.mesh_type in ("RectilinearGrid", "StructuredGrid"):
+            axes = mesh_lattice(meshtal.mesh)
+        if axes is not None:
+            masks = lattice_box_masks(LatticeIndex(axes), bounds)
+        else:
+            masks = {
+                "cells": box_mask(np.asarray(meshtal.centers), bounds),
+                "points": box_mask(np.asarray(meshtal.points), bounds),
+            }
+        self.add_selection(meshtal, masks)
+
+    @synchronized
+    @profiled
+    def select_plane(self, meshtal_fn, origin, normal):  # The side the normal points to is kept
+        meshtal = self.meshtals[meshtal_fn]
+        masks = {
+            "cells": plane_mask(np.asarray(meshtal.centers), origin, normal),
+            "points": plane_mask(np.asarray(meshtal.points), origin, normal),
+        }
+        self.add_selection(meshtal, masks)
+
+    @synchronized
+    @profiled
+    def select_threshold(self, meshtal_fn, array_name, lower=None, upper=None, component=None):
+        # Only the cells (or points) of the array are selected, by its values. An array with
+        # several components is selected by its magnitude, or by the component given
+        meshtal = self.meshtals[meshtal_fn]
+        values_type = get_array_type(meshtal, array_name)
+        if values_type == "Invalid":
+            print("This array doesn't belong to neither cells nor points")
+            return
+        values = meshtal.mesh[array_name]
+        n_components = 1 if np.ndim(values) == 1 else int(np.prod(np.shape(values)[1:]))
+        if component is not None and not 0 <= component < n_components:
+            print(f" Invalid component: {component}. {array_name} has {n_components}")
+            return
+        masks = {values_type: threshold_mask(values, lower, upper, component)}
+        self.add_selection(meshtal, masks)
+
+    @synchronized
+    def clear_selection(self, meshtal_fn):
+        meshtal = self.meshtals[meshtal_fn]
+        meshtal.selection = dict()
+        print(f"Selection cleared: {meshtal.mesh.n_cells} cells and {meshtal.mesh.n_points} points")
+
+    def add_selection(self, meshtal, masks):
+        for values_type, mask in masks.items():
+            previous = meshtal.selection.get(values_type)
+            meshtal.selection[values_type] = mask if previous is None else previous & mask
+        print(
+            f"{meshtal.n_selected('cells')} of {meshtal.mesh.n_cells} cells and"
+            f" {meshtal.n_selected('points')} of {meshtal.mesh.n_points} points selected"
+        )
+
+    # NEW ARRAY FROM AN EXPRESSION OF THE ARRAYS OF ONE OR SEVERAL MESHES ON THE SAME GRID
+    @synchronized
+    @profiled
+    def calculate_array(self, meshtal_fn, new_array_name, expression, variables=None):
+        # e.g. calculate_array("nhd.vts", "Heating", "nhd + phd * 1.2",
+        #                      {"nhd": "Value - Total", "phd": ("phd.vts", "Value - Total")})
+        # variables: name in the expression -> array of meshtal_fn, or (file name, array name)
+        # of another opened mesh. The names that are not in variables are arrays of meshtal_fn.
+        # The new array is added to meshtal_fn. See expressions.py.
+        meshtal = self.meshtals[meshtal_fn]
+        tree, error = parse_expression(expression)
+        if error is not None:
+            print(error)
+            return None
+        variables = dict() if variables is None else variables
+        arrays = dict()
+        values_type = None
+        for name in variable_names(tree):
+            source = variables.get(name, name)
+            source_fn, array_name = (meshtal_fn, source) if isinstance(source, str) else source
+            source_meshtal = self.grid_array(meshtal_fn, source_fn, array_name, values_type)
+            if source_meshtal is None:
+                return None
+            values_type = get_array_type(source_meshtal, array_name)
+            arrays[name] = source_meshtal.mesh[array_name]
+        if len({np.shape(values) for values in arrays.values()}) > 1:
+            print(" All arrays must have the same number of components")
+            return None
+        with phase("evaluate"):
+            result = evaluate(tree, expression, arrays, self.chunk_size)
+        if values_type == "cells":
+            meshtal.mesh.cell_data[new_array_name] = result
+        else:
+            meshtal.mesh.point_data[new_array_name] = result
+        print(f"'{new_array_name}' = {expression} added to '{meshtal_fn}'")
+        return new_array_name
+
+    # SUM OF VALUE ARRAYS OF ONE OR SEVERAL MESHES ON THE SAME GRID, WITH ITS RELATIVE ERROR
+    @synchronized
+    @profiled
+    def sum_with_errors(self, meshtal_fn, new_value_name, terms):
+        # e.g. sum_with_errors("nhd.vts", "Value - Heating",
+        #                      [("nhd.vts", "Value - Total"), ("phd.vts", "Value - Total", 1.2)])
+        # terms: (file name, value array name) or (file name, value array name, weight). Each
+        # value array must have its relative error array ("Error - Total"). The sum and its
+        # relative error ("Error - Heating") are added to meshtal_fn (see uncertainties.py).
+        new_error_name = error_name(new_value_name)
+        if new_error_name is None:
+            print(" The name of the new array must start with 'Value'")
+            return None
+        values_type = None
+        sources = []
+        for term in terms:
+            source_fn, value_name = term[0], term[1]
+            weight = term[2] if len(term) > 2 else 1
+            source_meshtal = self.grid_array(meshtal_fn, source_fn, value_name, values_type)
+            if source_meshtal is None:
+                return None
+            pairs = error_pairs(source_meshtal.cells_info + source_meshtal.points_info)
+            if value_name not in pairs:
+                print(f" '{value_name}' ('{source_fn}') has no relative error array")
+                return None
+            values_type = get_array_type(source_meshtal, value_name)
+            sources.append((source_meshtal, value_name, pairs[value_name], weight))
+        if len(sources) == 0:
+            print(" There are no arrays to sum")
+            return None
+        meshtal = self.meshtals[meshtal_fn]
+        with phase("sum_with_errors"):
+            error_sum = ErrorSum(len(sources[0][0].mesh[sources[0][1]]))
+            for source_meshtal, value_name, source_error_name, weight in sources:
+                mesh = source_meshtal.mesh
+                error_sum.add(mesh[value_name], mesh[source_error_name], weight)
+            data = meshtal.mesh.cell_data if values_type == "cells" else meshtal.mesh.point_data
+            data[new_value_name] = error_sum.total
+            data[new_error_name] = error_sum.relative_error()
+        print(f"'{new_value_name}' and '{new_error_name}' added to '{meshtal_fn}'")
+        return new_value_name
+
+    def grid_array(self, meshtal_fn, source_fn, array_name, values_type=None):
+        # MeshTally of an array used to compute a new array of meshtal_fn, or None if the array
+        # cannot be used: it must be of values_type (if any) and on the same grid
+        if source_fn not in self.meshtals:
+            print(f" '{source_fn}' is not opened")
+            return None
+        source_meshtal = self.meshtals[source_fn]
+        array_type = get_array_type(source_meshtal, array_name)
+        if array_type == "Invalid":
+            print(f" Invalid array name: {array_name} ('{source_fn}')")
+            return None
+        if values_type is not None and array_type != values_type:
+            print(" All arrays must correspond to either cells or points")
+            return None
+        # Only the fingerprints are compared, not all the coordinates
+        meshtal = self.meshtals[meshtal_fn]
+        if source_fn != meshtal_fn and source_meshtal.fingerprint != meshtal.fingerprint:
+            print(f" '{source_fn}' and '{meshtal_fn}' are not on the same grid")
+            return None
+        return source_meshtal
+
+    # APPLY A TRANSFORM (TRANSLATIONS, ROTATIONS AND SCALINGS) IN ONE PASS
+    @synchronized
+    @profiled
+    def transform(self, meshtal_fn, transform, intermediates=False):
+        # Only the final mesh is created, unless intermediates: then there is also a mesh after
+        # every operation, named as if the operations had been applied one by one
+        meshtal = self.meshtals[meshtal_fn]
+        if meshtal.mesh_type not in ("RectilinearGrid", "StructuredGrid", "UnstructuredGrid"):
+            print(
+                " Mesh type must be either RectilinearGrid, StructuredGrid or UnstructuredGrid"
+            )
+            return
+        if len(transform.steps) == 0:
+            print(" The transform has no operations")
+            return
+        steps = list(transform.intermediates()) if intermediates else [transform]
+        for step in steps:
+            new_meshtal = transformed(meshtal, step)
+            new_name = meshtal.filename[:-4] + step.name + new_meshtal.filename[-4:]
+            new_meshtal.filename = new_name
+            self.meshtals[new_name] = new_meshtal
+            print(f"Transform applied successfully. '{new_name}' has been created.")
+        print_memory(new_meshtal, meshtal)
+        return new_name
+
+    # JOINT SEVERAL MESHTALLY OBJECTS
+    @synchronized
+    @profiled
+    def joint_mesh(self, meshtal_fn_1, meshtal_fn_2, *meshtal_fns, tolerance=0.0):
+        # All the meshes are joined in one pass (see joining.py). The points closer than the
+        # tolerance are merged, or none with tolerance=None. StructuredGrid or RectilinearGrid
+        # meshes that follow each other along one axis stay a StructuredGrid or RectilinearGrid,
+        # the other meshes give an UnstructuredGrid
+        meshtals = [self.meshtals[fn] for fn in (meshtal_fn_1, meshtal_fn_2) + meshtal_fns]
+        meshes = [meshtal.mesh for meshtal in meshtals]
+        with phase("joint"):
+            mesh = join_meshes(meshes, tolerance)
+        extension = {"StructuredGrid": ".vts", "RectilinearGrid": ".vtr"}
+        extension = extension.get(type(mesh).__name__, ".vtu")
+        new_name = "+".join(meshtal.filename[:-4] for meshtal in meshtals) + extension
+        j_meshtal = MeshTally(new_name, mesh=mesh)
+        if j_meshtal.mesh_type == "UnstructuredGrid":
+            # The cells are the cells of the meshes one after the other
+            for key in ("centers", "cell_volumes"):
+                values = [meshtal.computed(key) for meshtal in meshtals]
+                if all(value is not None for value in values):
+                    j_meshtal.set_geometry_cache(key, np.concatenate(values))
+        self.meshtals[j_meshtal.filename] = j_meshtal
+        print(f"Joint applied to '{new_name}'")
+        return new_name
+
+    # EXPORT AGAIN TO VTK/VTS/VTR
+    @synchronized
+    @profiled
+    def export_mesh(self, meshtal_fn, out_format):
+        meshtal = self.meshtals[meshtal_fn]
+        if out_format in ("binary", "ascii"):
+            # The arrays of the opened meshes may be views of the file (see readers.py). They
+            # are copied into memory and the file unmapped, so that it can be replaced
+            for other in resident_meshtals(self.meshtals):
+                other.release_file(meshtal_fn)
+            if not close_mappings(meshtal_fn):
+                print(f" '{meshtal_fn}' is still memory-mapped, it cannot be replaced on Windows")
+        if out_format == "binary":
+            save_mesh(meshtal.mesh, meshtal_fn, binary=True)
+            print(f"Meshtally exported to {meshtal_fn[-3:]} with {out_format} format")
+        elif out_format == "ascii":
+            save_mesh(meshtal.mesh, meshtal_fn, binary=False)
+            print(f"Meshtally exported to {meshtal_fn[-3:]} with {out_format} format")
+        else:
+            print("Invalid format. It must be: 'binary' or 'ascii'")
+
+    # WRITE A FILE IN A CHOSEN FORMAT
+    @synchronized
+    @profiled
+    def write_mesh(self, meshtal_fn, list_array_names, out_format, streaming=False):
+        if streaming:  # The file is read from disk by slabs instead of using an opened MeshTally
+            return self.stream_mesh(meshtal_fn, list_array_names, out_format)
+        meshtal = self.meshtals[meshtal_fn]
+        if out_format in ("point_cloud", "ip_fluent", "csv") and self.compression is not None:
+            error = missing_compressor(self.compression)
+            if error is not None:
+                return error
+        if out_format == "point_cloud" or out_format == "ip_fluent":
+            for array_name in list_array_names:
+                if get_array_type(meshtal, array_name) == "Invalid":
+                    return f"Invalid array name: {array_name}"
+            start_time = time.perf_counter()
+            new_names = dict()
+            # The arrays of cells share the centers and the arrays of points share the points, so
+            # the coordinates are scaled and formatted only once for each group of arrays
+            for values_type in ("cells", "points"):
+                names = [
+                    name
+                    for name in dict.fromkeys(list_array_names)  # Each file is written once
+                    if get_array_type(meshtal, name) == values_type
+                ]
+                if len(names) == 0:
+                    continue
+                # Each file only drops the rows of its own array (see row_groups)
+                for group in self.row_groups(meshtal, names):
+                    # multiply the coordinate points chosen by the scale factor and
+                    # the values of the arrays selected by the safety factor
+                    # (the relative errors are not multiplied, see array_factors)
+                    rows = self.export_rows(meshtal, group, values_type)
+                    if values_type == "cells":  # Take points or centers
+                        f_points = take_rows(meshtal.centers, rows)
+                    else:
+                        f_points = take_rows(meshtal.points, rows)
+                    f_points = scaled(f_points, self.scale_factor)
+                    arrays = [
+                        np.asarray(take_rows(meshtal.mesh[name], rows)) * factor
+                        for name, factor in zip(group, self.array_factors(meshtal, group))
+                    ]
+                    for array_name in group:
+                        str_array_name = str(array_name).replace(r"/", "-")
+                        new_name = f"{meshtal.filename[:-4]}_{str_array_name}_{out_format}.txt"
+                        new_names[array_name] = self.text_name(new_name)
+                    group_names = [new_names[array_name] for array_name in group]
+                    n_coord = meshtal.n_coordinates
+                    self.write_array_files(out_format, f_points, arrays, group_names, n_coord)
+            for array_name in list_array_names:
+                print(f"{new_names[array_name]} created successfully!")
+            print(f"{len(new_names)} files written in {time.perf_counter() - start_time:.2f} s")
+
+        elif out_format == "csv" or out_format in COLUMNAR_FORMATS:
+            # First, ensure all values correspond to either cells or points, and they are the
+            # same type
+            values_type = get_array_type(meshtal, list_array_names[0])
+            for array_name in list_array_names:
+                if get_array_type(meshtal, array_name) == "Invalid":
+                    return f"Invalid array name: {array_name}"
+                elif np.ndim(meshtal.mesh[array_name]) > 1:  # One column per array
+                    return f"{array_name} has several components, only scalar arrays can be written"
+                elif get_array_type(meshtal, array_name) != values_type:
+                    return (
+                        "All arrays must correspond to either cells or points."
+                        ' "{}" corresponds to {} and "{}" to {}'.format(
+                            list_array_names[0],
+                            values_type,
+                            array_name,
+                            get_array_type(meshtal, array_name),
+                        )
+                    )
+            # multiply the coordinate points chosen by the scale factor
+            rows = self.export_rows(meshtal, list_array_names, values_type)
+            if values_type == "cells":  # Take points or centers
+                f_points = take_rows(meshtal.centers, rows)
+            else:  # Points
+                f_points = take_rows(meshtal.points, rows)
+            f_points = scaled(f_points, self.scale_factor)
+            factors = self.array_factors(meshtal, list_array_names)
+            str_list_array_names = str(list_array_names).replace(r"/", "-")
+            if out_format == "csv":
+                new_name = f"{meshtal.filename[:-4]}_{str_list_array_names}_{out_format}.csv"
+                new_name = self.text_name(new_name)
+                f = open_text(new_name, self.compression, self.compression_level, newline="")
+                self.csv_format(f, meshtal, f_points, list_array_names, rows)
+                print(f"{new_name} created successfully!")
+                f.close()
+            else:
+                error = missing_dependency(out_format)
+                if error is None:
+                    error = duplicated_column(column_names(list_array_names), out_format)
+                if error is not None:
+                    return error
+                extension = COLUMNAR_FORMATS[out_format][0]
+                new_name = f"{meshtal.filename[:-4]}_{str_list_array_names}_{out_format}{extension}"
+                arrays = [take_rows(meshtal.mesh[name], rows) for name in list_array_names]
+                blocks = (
+                    self.table_block(
+                        f_points[start:end], [array[start:end] for array in arrays], factors
+                    )
+                    for start, end in chunk_ranges(len(f_points), self.chunk_size)
+                )
+                write_columnar(
+                    new_name,
+                    out_format,
+                    column_names(list_array_names),
+                    len(f_points),
+                    blocks,
+                    self.columnar_attributes(meshtal.filename, values_type),
+                )
+                print(f"{new_name} created successfully!")
+        else:
+            print(
+                "Invalid format. It must be: 'point_cloud','ip_fluent','csv',"
+                " 'npz', 'hdf5' o 'parquet'"
+            )
+
+    # WRITE A FILE IN A CHOSEN FORMAT READING THE VTK FILE BY SLABS
+    @synchronized
+    @profiled
+    def stream_mesh(self, filename, list_array_names, out_format):
+        # Only one slab of at most chunk_size cells (or points) is kept in memory at a time, so
+        # the memory used does not depend on the size of the file
+        if out_format in ("point_cloud", "ip_fluent", "csv") and self.compression is not None:
+            error = missing_compressor(self.compression)
+            if error is not None:
+                return error
+        reader = SlabReader(filename, self.chunk_size)
+        if not reader.streamed:
+            print(f" Only .vts and .vtr files are read by slabs, '{filename}' is read at once")
+        if list_array_names is None:  # All the cell arrays of the file
+            list_array_names = reader.cells_info
+        if out_format == "point_cloud" or out_format == "ip_fluent":
+            for array_name in list_array_names:
+                values_type = reader.get_array_type(array_name)
+                if values_type == "Invalid":
+                    return f"Invalid array name: {array_name}"
+                str_array_name = str(array_name).replace(r"/", "-")
+                new_name = self.text_name(f"{filename[:-4]}_{str_array_name}_{out_format}.txt")
+                slabs = self.reliable_slabs(reader, [array_name], values_type)
+                n_rows = reader.n_rows(values_type)
+                with open_text(new_name, self.compression, self.compression_level) as f:
+                    factor = self.array_factors(reader, [array_name])[0]
+                    if out_format == "point_cloud":
+                        self.stream_point_cloud(f, slabs, n_rows, factor)
+                    else:
+                        # The number of rows is only known at the end if some are dropped
+                        if self.drops_rows(reader, [array_name]):
+                            n_rows = None
+                        self.stream_ip_fluent(f, reader.n_coordinates, slabs, n_rows, factor)
+                print(f"{new_name} created successfully!")
+
+        elif out_format == "csv" or out_format in COLUMNAR_FORMATS:
+            values_type = reader.get_array_type(list_array_names[0])
+            for array_name in list_array_names:
+                if reader.get_array_type(array_name) == "Invalid":
+                    return f"Invalid array name: {array_name}"
+                elif reader.get_array_type(array_name) != values_type:
+                    return (
+                        "All arrays must correspond to either cells or points."
+                        ' "{}" corresponds to {} and "{}" to {}'.format(
+                            list_array_names[0],
+                            values_type,
+                            array_name,
+                            reader.get_array_type(array_name),
+                        )
+                    )
+            str_list_array_names = str(list_array_names).replace(r"/", "-")
+            slabs = self.reliable_slabs(reader, list_array_names, values_type)
+            n_rows = reader.n_rows(values_type)  # At most, if some rows are dropped
+            factors = self.array_factors(reader, list_array_names)
+            if out_format == "csv":
+                new_name = f"{filename[:-4]}_{str_list_array_names}_{out_format}.csv"
+                new_name = self.text_name(new_name)
+                with open_text(new_name, self.compression, self.compression_level, newline="") as f:
+                    self.stream_csv(f, slabs, n_rows, factors)
+            else:
+                error = missing_dependency(out_format)
+                if error is None:
+                    error = duplicated_column(column_names(list_array_names), out_format)
+                if error is not None:
+                    return error
+                extension = COLUMNAR_FORMATS[out_format][0]
+                new_name = f"{filename[:-4]}_{str_list_array_names}_{out_format}{extension}"
+                blocks = (
+                    self.table_block(scaled(coordinates, self.scale_factor), values, factors)
+                    for coordinates, values in slabs
+                )
+                write_columnar(
+                    new_name,
+                    out_format,
+                    column_names(list_array_names),
+                    n_rows,
+                    blocks,
+                    self.columnar_attributes(filename, values_type),
+                )
+            print(f"{new_name} created successfully!")
+        else:
+            print(
+                "Invalid format. It must be: 'point_cloud','ip_fluent','csv',"
+                " 'npz', 'hdf5' o 'parquet'"
+            )
+
+    # SLABS OF A FILE WITHOUT THE ROWS WHOSE RELATIVE ERROR IS OVER max_relative_error
+    def reliable_slabs(self, reader, list_array_names, values_type):
+        # Same rows as write_mesh (see export_rows): the relative error arrays that are not
+        # written are also read with each slab, only to know which of its rows are dropped
+        if not self.drops_rows(reader, list_array_names):
+            yield from reader.slabs(list_array_names, values_type)
+            return
+        errors_names = [
+            name
+            for name in dict.fromkeys(self.error_arrays(reader, list_array_names))
+            if name is not None
+        ]
+        read_names = list(list_array_names)
+        read_names += [name for name in errors_names if name not in read_names]
+        n_arrays = len(list_array_names)
+        for coordinates, values in reader.slabs(read_names, values_type):
+            rows = np.ones(len(coordinates), dtype=bool)
+            for errors_name in errors_names:
+                rows &= np.asarray(values[read_names.index(errors_name)]) <= self.max_relative_error
+            yield coordinates[rows], [np.asarray(array)[rows] for array in values[:n_arrays]]
+
+    def drops_rows(self, source, list_array_names):  # Some rows may be over max_relative_error
+        if self.max_relative_error is None:
+            return False
+        return any(name is not None for name in self.error_arrays(source, list_array_names))
+
+    # NAME OF A TEXT FILE, WITH THE EXTENSION OF THE COMPRESSION IF ANY
+    def text_name(self, new_name):
+        if self.compression is None:
+            return new_name
+        return new_name + COMPRESSIONS[self.compression][0]
+
+    # BLOCK OF ROWS: SCALED COORDINATES AND VALUES MULTIPLIED BY THEIR FACTORS
+    def table_block(self, f_points, arrays, factors):
+        block = np.empty((len(f_points), 3 + len(arrays)))
+        block[:, :3] = f_points
+        for j, (array, factor) in enumerate(zip(arrays, factors)):
+            block[:, 3 + j] = array * factor
+        return block
+
+    # FACTOR OF EACH ARRAY WRITTEN: THE SAFETY FACTOR, BUT 1 FOR THE RELATIVE ERROR ARRAYS
+    def array_factors(self, source, list_array_names):  # source: MeshTally or SlabReader
+        # A value multiplied by the safety factor keeps its relative error
+        array_names = source.cells_info + source.points_info
+        return [
+            1 if is_paired_error(name, array_names) else self.safety_factor
+            for name in list_array_names
+        ]
+
+    # RELATIVE ERROR ARRAY THAT DECIDES WHICH ROWS OF EACH ARRAY ARE WRITTEN
+    def error_arrays(self, source, list_array_names):  # source: MeshTally or SlabReader
+        # The one of a value array, the array itself for a relative error array and None for
+        # the arrays without relative error
+        pairs = error_pairs(source.cells_info + source.points_info)
+        errors = set(pairs.values())
+        return [pairs.get(name, name if name in errors else None) for name in list_array_names]
+
+    # ARRAYS WRITTEN IN ONE FILE EACH (POINT CLOUD, IP FLUENT) GROUPED BY THE ROWS THEY KEEP
+    def row_groups(self, source, list_array_names):
+        # The arrays of a group share the text of their coordinates. With max_relative_error,
+        # each array only loses the rows where its own relative error is too large
+        if self.max_relative_error is None:
+            return [list(list_array_names)]
+        groups = dict()
+        errors_names = self.error_arrays(source, list_array_names)
+        for name, errors_name in zip(list_array_names, errors_names):
+            groups.setdefault(errors_name, []).append(name)
+        return list(groups.values())
+
+    # ROWS WRITTEN: THE SELECTION OF THE MESHTALLY, WITHOUT THE VALUES WHOSE RELATIVE ERROR IS
+    # OVER max_relative_error (boolean mask, or None for all the rows). All the arrays are
+    # written in the same rows, so a row is dropped if any of them is over the maximum
+    def export_rows(self, meshtal, list_array_names, values_type):
+        rows = meshtal.selection.get(values_type)
+        if self.max_relative_error is None:
+            return rows
+        for errors_name in dict.fromkeys(self.error_arrays(meshtal, list_array_names)):
+            if errors_name is not None:
+                reliable = np.asarray(meshtal.mesh[errors_name]) <= self.max_relative_error
+                rows = reliable if rows is None else rows & reliable
+        return rows
+
+    def columnar_attributes(self, filename, values_type):  # Saved with the binary columnar formats
+        return {
+            "source": filename,
+            "values_type": values_type,
+            "scale_factor": self.scale_factor,
+            "safety_factor": self.safety_factor,
+        }
+
+    # WRITE ONE FILE PER ARRAY (POINT CLOUD OR IP FLUENT)
+    def write_array_files(self, out_format, f_points, arrays, new_names, n_coord):
+        # The arrays are shared out among export_workers processes. Each process formats the text
+        # of the coordinates once and writes it to all the files of its arrays
+        n_workers = min(self.export_workers, len(new_names))
+        # The variables of the session are passed to the worker processes as arguments
+        options = {"progress": n_workers <= 1, "compression": self.compression}
+        options["level"] = self.compression_level
+        size = self.chunk_size
+        if n_workers <= 1:
+            write_array_group(out_format, f_points, arrays, new_names, n_coord, size, options)
+            return
+        # Each process only receives its own arrays. The coordinates, needed by all of them,
+        # are saved once to a .npy file that the processes memory-map, so they share the pages
+        # of the file instead of receiving a pickled copy each
+        with tempfile.TemporaryDirectory() as directory:
+            points_fn = os.path.join(directory, "points.npy")
+            with phase("write"):
+                np.save(points_fn, f_points)
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [
+                    executor.submit(
+                        write_array_group,
+                        out_format,
+                        points_fn,
+                        arrays[i::n_workers],
+                        new_names[i::n_workers],
+                        n_coord,
+                        size,
+                        options,
+                    )
+                    for i in range(n_workers)
+                ]
+                for future in futures:
+                    future.result()
+
+    # CSV
+    def csv_format(self, f, meshtal, points, list_array_names, rows=None):
+        # Same layout as csv.writer with fields " {x:.3f}": comma separated and "\r\n" line ends
+        row_format = ", ".join(["%.3f"] * (3 + len(list_array_names))) + "\r\n"
+        # Coordinates and the values of the array/s selected multiplied by the safety factor
+        # are put together in one contiguous block before writing
+        table = np.empty((len(points), 3 + len(list_array_names)))
+        table[:, :3] = points
+        factors = self.array_factors(meshtal, list_array_names)
+        table[:, 3:] = stack_arrays(meshtal, list_array_names, factors, rows)
+        bar = tqdm(unit=" Points", desc="Writing", total=len(points))
+        for start, end in chunk_ranges(len(points), self.chunk_size):
+            write_rows(f, table[start:end], row_format, bar)
+        bar.close()
+
+    # POINT CLOUD BY SLABS
+    def stream_point_cloud(self, f, slabs, n_rows, factor):
+        f.write("x, y, z, value\n")
+        bar = tqdm(unit=" Points", desc="Writing", total=n_rows)
+        for coordinates, values in slabs:
+            values = values[0] * factor
+            block = np.column_stack((scaled(coordinates, self.scale_factor), values))
+            write_rows(f, block, "%.3f,%.3f,%.3f,%.3f\n", bar)
+        bar.close()
+
+    # IP FLUENT BY SLABS
+    def stream_ip_fluent(self, f, n_coord, slabs, n_rows, factor):
+        # n_rows: number of rows written, None if it is only known after reading all the slabs.
+        # The x column goes directly to the file while y, z and the values are kept in temporary
+        # files until all the slabs have been read (x too if the header has to wait)
+        spills = [tempfile.TemporaryFile("w+") for _ in range(3 if n_rows is not None else 4)]
+        columns = spills if n_rows is None else [f] + spills
+        if n_rows is not None:
+            f.write(f"3\n{n_coord}\n{n_rows}\n1\nuds-0\n")
+            f.write("(")
+        n_written = 0
+        bar = tqdm(unit=" Points", desc="Writing", total=n_rows)
+        for coordinates, values in slabs:
+            coordinates = scaled(coordinates, self.scale_factor)
+            write_rows(columns[0], coordinates[:, 0], "%.3f\n")
+            write_rows(columns[1], coordinates[:, 1], "%.3f\n")
+            write_rows(columns[2], coordinates[:, 2], "%.3f\n")
+            write_rows(columns[3], values[0] * factor, "%.3f\n", bar)
+            n_written += len(coordinates)
+        bar.close()
+        if n_rows is None:
+            f.write(f"3\n{n_coord}\n{n_written}\n1\nuds-0\n")
+        else:
+            f.write(")\n")
+        for spill in spills:
+            f.write("(")
+            spill.seek(0)
+            shutil.copyfileobj(spill, f)
+            spill.close()
+            f.write(")\n")
+
+    # CSV BY SLABS
+    def stream_csv(self, f, slabs, n_rows, factors):
+        row_format = ", ".join(["%.3f"] * (3 + len(factors))) + "\r\n"
+        bar = tqdm(unit=" Points", desc="Writing", total=n_rows)
+        for coordinates, values in slabs:
+            block = self.table_block(scaled(coordinates, self.scale_factor), values, factors)
+            write_rows(f, block, row_format, bar)
+        bar.close()
+
+
+# END OF CLASS DEFINITION
+
+
+# ARRAYS OF A MESHTALLY TO PROBE: {array name: ("cells" or "points", values)}, OR NONE
+def probed_arrays(meshtal, list_array_names=None):
+    if list_array_names is None:
+        list_array_names = meshtal.cells_info + meshtal.points_info
+    arrays = dict()
+    for array_name in list_array_names:
+        values_type = get_array_type(meshtal, array_name)
+        if values_type == "Invalid":
+            print(f" Invalid array name: {array_name}")
+            return None
+        arrays[array_name] = (values_type, np.asarray(meshtal.mesh[array_name]))
+    return arrays
+
+
+def print_statistics(stats):
+    formatted_percentiles = ""
+    for q, value in stats["percentiles"].items():
+        formatted_percentiles += f" P{q:g}={value:.2e}"
+    # Relative errors of the integrals (and averages) of the value arrays with an error array
+    formatted_errors = ""
+    if "integral_volume_error" in stats:
+        formatted_errors = (
+            f"Relative error without volume: {stats['integral_no_volume_error']:.2e}\n"
+            f"            Relative error with volume: {stats['integral_volume_error']:.2e}\n"
+        )
+    elif "integral_error" in stats:
+        formatted_errors = f"Relative error: {stats['integral_error']:.2e}\n"
+    if stats["type"] == "cells":  # For cells
         print(
             f"""
-            Minimum value: {min_value:.2e}
-            Maximum value: {max_value:.2e}
+            Minimum value: {stats["min"]:.2e}
+            Maximum value: {stats["max"]:.2e}
 
-            Integral without volume: {integral_no_volume:.2e}
-            Integral with volume: {integral_volume:.2e}
+            Integral without volume: {stats["integral_no_volume"]:.2e}
+            Integral with volume: {stats["integral_volume"]:.2e}
 
-            Average without volume: {average_no_volume:.2e}
-            Average with volume: {average_volume:.2e}
+            Average without volume: {stats["average_no_volume"]:.2e}
+            Average with volume: {stats["average_volume"]:.2e}
+            {formatted_errors}
+            NaN values: {stats["nan_count"]}
+            Zero values: {stats["zero_count"]}
+            Percentiles:{formatted_percentiles}
             """
         )
-    elif get_array_type(meshtal, array_name) == "points":  # For points
-        min_value = min(meshtal.mesh[array_name])
-        max_value = max(meshtal.mesh[array_name])
-        integral, average = integral_and_average(meshtal_fn, array_name)
+    else:  # For points
         print(
             f"""
-            Minimum value: {min_value:.2e}
-            Maximum value: {max_value:.2e}
+            Minimum value: {stats["min"]:.2e}
+            Maximum value: {stats["max"]:.2e}
 
-            Integral: {integral:.2e}
-            Average: {average:.2e}
+            Integral: {stats["integral"]:.2e}
+            Average: {stats["average"]:.2e}
+            {formatted_errors}
+            NaN values: {stats["nan_count"]}
+            Zero values: {stats["zero_count"]}
+            Percentiles:{formatted_percentiles}
             """
         )
+
+
+# CONVERT TO STRUCTURED GRID
+@profiled
+def convert_to_sg(meshtal):
+    # The explicit points are new, the arrays are shared with the RectilinearGrid
+    sg_mesh = meshtal.mesh.cast_to_structured_grid()
+    return MeshTally(meshtal.filename[:-4] + ".vts", mesh=sg_mesh)
+
+
+def save_mesh(mesh, fn, binary):
+    # fn is not overwritten in place: the mesh is saved in a temporary file that then replaces
+    # it, so that fn is still complete if the mesh cannot be saved. The arrays of the mesh must
+    # not be views of fn any more (see export_mesh)
+    handle, temporary_fn = tempfile.mkstemp(
+        suffix=fn[-4:], dir=os.path.dirname(os.path.abspath(fn))
+    )
+    os.close(handle)
+    try:
+        with phase("save"):
+            mesh.save(temporary_fn, binary=binary)
+        os.replace(temporary_fn, fn)
+    finally:
+        if os.path.exists(temporary_fn):
+            os.remove(temporary_fn)
+
+
+# SPLIT THE ROWS OF AN EXPORT IN CHUNKS
+def chunk_ranges(n_rows, size):
+    for start in range(0, n_rows, size):
+        yield start, min(start + size, n_rows)
+
+
+# WRITE A BLOCK OF ROWS
+def write_rows(f, block, row_format, bar=None):
+    # The whole block is formatted with a single % operation and written in one call.
+    # "%.3f" gives the same text as the f"{x:.3f}" formatting used before
+    block = np.asarray(block)
+    with phase("format"):
+        text = (row_format * len(block)) % tuple(block.ravel().tolist())
+    with phase("write"):
+        f.write(text)
+    if bar is not None:
+        bar.update(len(block))
+
+
+def write_array_group(out_format, f_points, arrays, new_names, n_coord, size, options):
+    # f_points: the coordinates, or the name of the .npy file they were saved to
+    if isinstance(f_points, str):
+        f_points = np.load(f_points, mmap_mode="r")
+    show_progress = options["progress"]
+    n_rows = len(f_points)
+    with ExitStack() as stack:  # The files opened are closed even if another one fails to open
+        files = [
+            stack.enter_context(open_text(fn, options["compression"], options["level"]))
+            for fn in new_names
+        ]
+        if out_format == "point_cloud":
+            for f in files:
+                f.write("x, y, z, value\n")
+            bar = tqdm(unit=" Points", desc="Writing", total=n_rows, disable=not show_progress)
+            for start, end in chunk_ranges(n_rows, size):
+                n = end - start
+                # The rows are split at the null characters, so that the text of the
+                # coordinates can be joined to the text of the values of every array
+                with phase("format"):
+                    coordinates = tuple(f_points[start:end].ravel().tolist())
+                    prefixes = (("%.3f,%.3f,%.3f,\0" * n) % coordinates).split("\0")
+                for f, array in zip(files, arrays):
+                    with phase("format"):
+                        texts = (("%.3f\n\0" * n) % tuple(array[start:end].tolist())).split("\0")
+                        text = "".join([prefix + text for prefix, text in zip(prefixes, texts)])
+                    with phase("write"):
+                        f.write(text)
+                bar.update(n)
+            bar.close()
+        else:  # ip_fluent
+            for f in files:
+                f.write(f"3\n{n_coord}\n{n_rows}\n1\nuds-0\n")
+            # Each coordinate and the values are written as a separated column between brackets
+            for axis, desc in ((0, "Writing x"), (1, "Writing y"), (2, "Writing z")):
+                for f in files:
+                    f.write("(")
+                bar = tqdm(unit=" points", desc=desc, total=n_rows, disable=not show_progress)
+                for start, end in chunk_ranges(n_rows, size):
+                    with phase("format"):
+                        column = tuple(f_points[start:end, axis].tolist())
+                        text = ("%.3f\n" * (end - start)) % column
+                    with phase("write"):
+                        for f in files:
+                            f.write(text)
+                    bar.update(end - start)
+                bar.close()
+                for f in files:
+                    f.write(")\n")
+            for f, array in zip(files, arrays):
+                f.write("(")
+                for start, end in chunk_ranges(n_rows, size):
+                    write_rows(f, array[start:end], "%.3f\n")
+                f.write(")\n")
+
+
+# STACK SEVERAL ARRAYS AS THE COLUMNS OF A MATRIX
+def stack_arrays(meshtal, list_array_names, factor=1, rows=None):
+    # Each array is fetched from the mesh only once and multiplied by the factor (one for all
+    # the arrays or one per array) in its own dtype, so the values are the same as when they
+    # were scaled one by one. The factors are kept as Python numbers: a NumPy float64 factor
+    # would scale a float32 array in float64. Only the rows of the mask are taken, all of them
+    # if it is None.
+    if isinstance(factor, (list, tuple)):
+        factors = factor
     else:
-        print("This array doesn't belong to neither cells nor points")
+        factors = [factor] * len(list_array_names)
+    n_rows = len(take_rows(meshtal.mesh[list_array_names[0]], rows))
+    matrix = np.empty((n_rows, len(list_array_names)))
+    for j, array_name in enumerate(list_array_names):
+        matrix[:, j] = take_rows(meshtal.mesh[array_name], rows) * factors[j]
+    return matrix
+
+
+# VALUES OF A SCALAR ARRAY AS FLOAT64, NONE FOR AN ARRAY WITH SEVERAL COMPONENTS
+def scalar_values(meshtal, array_name, rows=None):
+    values = np.asarray(meshtal.mesh[array_name])
+    if values.ndim > 1:
+        return None
+    # No copy for a float64 array without selection
+    return np.asarray(take_rows(values, rows), dtype=float)
+
+
+# MINIMUM, MAXIMUM, PERCENTILES AND COUNTS OF THE VALUES OF ONE ARRAY
+def reduce_values(values, percentiles):
+    nan_mask = np.isnan(values)
+    n_nan = int(np.count_nonzero(nan_mask))
+    stats = {
+        "min": np.nan,
+        "max": np.nan,
+        "nan_count": n_nan,
+        "zero_count": int(np.count_nonzero(values == 0)),
+        "percentiles": {q: np.nan for q in percentiles},
+    }
+    if n_nan == len(values):  # Empty or only NaN values
+        return stats
+    # The NaN values are only removed (one copy) when there are some
+    finite = values if n_nan == 0 else values[~nan_mask]
+    stats["min"] = finite.min().item()
+    stats["max"] = finite.max().item()
+    if len(percentiles) > 0:
+        percentile_values = np.percentile(finite, percentiles)
+        stats["percentiles"] = {q: percentile_values[i].item() for i, q in enumerate(percentiles)}
+    return stats
+
+
+def divided(total, n):  # NaN instead of a division by 0 (e.g. an empty selection)
+    return (total / n).item() if n != 0 else np.nan
+
+
+# FUNCTIONS OF THE DEFAULT SESSION
+# Each operation of the module runs in the default session, whose variables are the ones of the
+# module (meshtals, scale_factor, safety_factor...)
+default_session = ConverterSession(namespace=sys.modules[__name__])
+
+
+def open_mesh(filename):
+    return default_session.open_mesh(filename)
+
+
+def read_meshtal(filename):
+    return default_session.read_meshtal(filename)
+
+
+def enable_cache(directory=DEFAULT_CACHE_DIRECTORY, max_size=10 * 1024**3):  # bytes
+    return default_session.enable_cache(directory, max_size)
+
+
+def disable_cache():
+    return default_session.disable_cache()
+
+
+def print_general_info(meshtal_fn):
+    return default_session.print_general_info(meshtal_fn)
+
+
+def print_array_info(meshtal_fn, array_name):
+    return default_session.print_array_info(meshtal_fn, array_name)
+
+
+def print_all_arrays_info(meshtal_fn):
+    return default_session.print_all_arrays_info(meshtal_fn)
 
 
 def integral_and_average(meshtal_fn, array_name):
-    meshtal = meshtals[meshtal_fn]
-    # for cells, the volume value is used to calculate the weight of each value of the array
-    if get_array_type(meshtal, array_name) == "cells":
-        integral_no_volume = sum(meshtal.mesh[array_name])
-        average_no_volume = integral_no_volume / meshtal.mesh.n_cells
-        cells_volume = abs(meshtal.mesh.compute_cell_sizes()["Volume"])
-        values = np.multiply(meshtal.mesh[array_name], cells_volume)
-        integral_volume = float(sum(values))
-        average_volume = integral_volume / sum(cells_volume)
-        return integral_no_volume, average_no_volume, integral_volume, average_volume
-    else:  # In meshtal.points_info
-        integral = sum(meshtal.mesh[array_name])
-        average = integral / meshtal.mesh.n_points
-        return integral, average
-
-
-# CHANGE SCALE FACTOR
+    return default_session.integral_and_average(meshtal_fn, array_name)
+
+
+def array_statistics(meshtal_fn, list_array_names=None, percentiles=(5, 50, 95)):
+    return default_session.array_statistics(meshtal_fn, list_array_names, percentiles)
+
+
 def change_scale_factor(n):
-    global scale_factor
-    scale_factor = n
-    print(f"Scale factor = {n}")
+    return default_session.change_scale_factor(n)
 
 
-# CHANGE SAFETY FACTOR
 def change_safety_factor(n):
-    global safety_factor
-    safety_factor = n
-    print(f"Safety factor = {n}")
+    return default_session.change_safety_factor(n)
+
+
+def change_max_relative_error(n):
+    return default_session.change_max_relative_error(n)
+
+
+def change_memory_budget(n):
+    return default_session.change_memory_budget(n)
+
+
+def change_export_workers(n):
+    return default_session.change_export_workers(n)
+
+
+def change_compression(method=None, level=None):  # None to write plain text files
+    return default_session.change_compression(method, level)
 
 
-# CHANGE COORDINATES SYSTEM
 def translate(meshtal_fn, x=0, y=0, z=0):
-    meshtal = meshtals[meshtal_fn]
-    if meshtal.mesh_type == "StructuredGrid" or meshtal.mesh_type == "UnstructuredGrid":
-        new_meshtal = deepcopy(meshtal)
-    # The translate function does not work with RectilinearGrid Meshes.
-    # So, a RectilinearGrid Mesh must be first converted to StructuredGrid
-    elif meshtal.mesh_type == "RectilinearGrid":
-        new_meshtal = convert_to_sg(meshtal)
-    else:
-        print(
-            " Mesh type must be either RectilinearGrid, StructuredGrid or UnstructuredGrid"
-        )
-        return
-    new_meshtal.mesh.translate((x, y, z), inplace=True)
-    new_meshtal.__read_mesh_info__()
-    new_name = (
-        meshtal.filename[:-4] + f"+Trans({x},{y},{z})" + new_meshtal.filename[-4:]
-    )
-    new_meshtal.filename = new_name
-    meshtals[new_name] = new_meshtal
-    print(f"Translation applied successfully. '{new_name}' has been created.")
-
-
-def rotate(
-    meshtal_fn, theta_x=0, theta_y=0, theta_z=0
-):  # Only around one axis. If not, assume order: x --> y --> z
-    meshtal = meshtals[meshtal_fn]
-    if meshtal.mesh_type == "StructuredGrid" or meshtal.mesh_type == "UnstructuredGrid":
-        new_meshtal = deepcopy(meshtal)
-    # The rotate function does not work with RectilinearGrid Meshes.
-    # So, a RectilinearGrid Mesh must be first converted to StructuredGrid
-    elif meshtal.mesh_type == "RectilinearGrid":
-        new_meshtal = convert_to_sg(meshtal)
-    else:
-        print(
-            " Mesh type must be either RectilinearGrid, StructuredGrid or UnstructuredGrid"
-        )
-        return
-    new_meshtal.mesh.rotate_x(theta_x, inplace=True)
-    new_meshtal.mesh.rotate_y(theta_y, inplace=True)
-    new_meshtal.mesh.rotate_z(theta_z, inplace=True)
-    new_meshtal.__read_mesh_info__()
-    new_name = (
-        meshtal.filename[:-4]
-        + "+Rot({},{},{})".format(theta_x, theta_y, theta_z)
-        + new_meshtal.filename[-4:]
+    return default_session.translate(meshtal_fn, x, y, z)
+
+
+def rotate(meshtal_fn, theta_x=0, theta_y=0, theta_z=0):  # Order: x --> y --> z
+    return default_session.rotate(meshtal_fn, theta_x, theta_y, theta_z)
+
+
+def probe(meshtal_fn, points, list_array_names=None, method="nearest"):
+    return default_session.probe(meshtal_fn, points, list_array_names, method)
+
+
+def remap(meshtal_fn, target_fn, list_array_names=None, method="nearest"):
+    return default_session.remap(meshtal_fn, target_fn, list_array_names, method)
+
+
+def select_box(meshtal_fn, bounds):
+    return default_session.select_box(meshtal_fn, bounds)
+
+
+def select_plane(meshtal_fn, origin, normal):
+    return default_session.select_plane(meshtal_fn, origin, normal)
+
+
+def select_threshold(meshtal_fn, array_name, lower=None, upper=None, component=None):
+    return default_session.select_threshold(meshtal_fn, array_name, lower, upper, component)
+
+
+def clear_selection(meshtal_fn):
+    return default_session.clear_selection(meshtal_fn)
+
+
+def calculate_array(meshtal_fn, new_array_name, expression, variables=None):
+    return default_session.calculate_array(meshtal_fn, new_array_name, expression, variables)
+
+
+def sum_with_errors(meshtal_fn, new_value_name, terms):
+    return default_session.sum_with_errors(meshtal_fn, new_value_name, terms)
+
+
+def transform(meshtal_fn, transform, intermediates=False):
+    return default_session.transform(meshtal_fn, transform, intermediates)
+
+
+def joint_mesh(meshtal_fn_1, meshtal_fn_2, *meshtal_fns, tolerance=0.0):
+    return default_session.joint_mesh(
+        meshtal_fn_1, meshtal_fn_2, *meshtal_fns, tolerance=tolerance
     )
-    new_meshtal.filename = new_name
-    meshtals[new_name] = new_meshtal
-    print(f"Rotation applied successfully. '{new_name}' has been created.")
 
 
-# CONVERT TO STRUCTURED GRID
-def convert_to_sg(meshtal):
-    sg_meshtal = deepcopy(meshtal)
-    sg_meshtal.mesh = meshtal.mesh.cast_to_structured_grid()
-    sg_meshtal.__read_mesh_info__()
-    sg_meshtal.filename = sg_meshtal.filename[:-4] + ".vts"
-    return sg_meshtal
-
-
-# JOINT TWO MESHTALLY OBJECTS
-def joint_mesh(meshtal_fn_1, meshtal_fn_2):
-    meshtal_1 = meshtals[meshtal_fn_1]
-    meshtal_2 = meshtals[meshtal_fn_2]
-    j_meshtal = deepcopy(meshtal_1)
-    j_meshtal.mesh = meshtal_1.mesh.merge(meshtal_2.mesh)
-    # Regardless of the initial meshes, the resulted mesh is an UnstructuredGrid
-    j_meshtal.__read_mesh_info__()
-    new_name = meshtal_1.filename[:-4] + "+" + meshtal_2.filename[:-4] + ".vtu"
-    j_meshtal.filename = new_name
-    meshtals[j_meshtal.filename] = j_meshtal
-    print(f"Joint applied to '{new_name}'")
-
-
-# EXPORT AGAIN TO VTK/VTS/VTR
 def export_mesh(meshtal_fn, out_format):
-    meshtal = meshtals[meshtal_fn]
-    if out_format == "binary":
-        meshtal.mesh.save(meshtal_fn, binary=True)
-        print(f"Meshtally exported to {meshtal_fn[-3:]} with {out_format} format")
-    elif out_format == "ascii":
-        meshtal.mesh.save(meshtal_fn, binary=False)
-        print(f"Meshtally exported to {meshtal_fn[-3:]} with {out_format} format")
-    else:
-        print("Invalid format. It must be: 'binary' or 'ascii'")
+    return default_session.export_mesh(meshtal_fn, out_format)
 
 
-# WRITE A FILE IN A CHOSEN FORMAT
-def write_mesh(meshtal_fn, list_array_names, out_format):
-    global scale_factor
-    global safety_factor
-    meshtal = meshtals[meshtal_fn]
-    if out_format == "point_cloud":
-        for array_name in list_array_names:
-            # multiply the coordinate points chosen by the scale factor and
-            # the values of the array selected by the safety factor
-            if get_array_type(meshtal, array_name) == "cells":  # Take points or centers
-                f_points = meshtal.centers * scale_factor
-                values = meshtal.mesh[array_name] * safety_factor
-            elif get_array_type(meshtal, array_name) == "points":
-                f_points = meshtal.points * scale_factor
-                values = meshtal.mesh[array_name] * safety_factor
-            else:
-                return f"Invalid array name: {array_name}"
-            str_array_name = str(array_name).replace(r"/", "-")
-            new_name = f"{meshtal.filename[:-4]}_{str_array_name}_{out_format}.txt"
-            f = open(new_name, "w")
-            point_cloud(f, f_points, values)
-            print(f"{new_name} created successfully!")
-            f.close()
+def write_mesh(meshtal_fn, list_array_names, out_format, streaming=False):
+    return default_session.write_mesh(meshtal_fn, list_array_names, out_format, streaming)
 
-    elif out_format == "ip_fluent":
-        for array_name in list_array_names:
-            # multiply the coordinate points chosen by the scale factor and
-            # the values of the array selected by the safety factor
-            if get_array_type(meshtal, array_name) == "cells":  # Take points or centers
-                f_points = meshtal.centers * scale_factor
-                values = meshtal.mesh[array_name] * safety_factor
-            elif get_array_type(meshtal, array_name) == "points":
-                f_points = meshtal.points * scale_factor
-                values = meshtal.mesh[array_name] * safety_factor
-            else:
-                return f"Invalid array name: {array_name}"
-            str_array_name = str(array_name).replace(r"/", "-")
-            new_name = f"{meshtal.filename[:-4]}_{str_array_name}_{out_format}.txt"
-            f = open(new_name, "w")
-            ip_fluent(f, meshtal, f_points, values)
-            print(f"{new_name} created successfully!")
-            f.close()
 
-    elif out_format == "csv":
-        # First, ensure all values correspond to either cells or points, and they are the same type
-        values_type = get_array_type(meshtal, list_array_names[0])
-        for array_name in list_array_names:
-            if get_array_type(meshtal, array_name) == "Invalid":
-                return f"Invalid array name: {array_name}"
-            elif get_array_type(meshtal, array_name) != values_type:
-                return (
-                    "All arrays must correspond to either cells or points."
-                    ' "{}" corresponds to {} and "{}" to {}'.format(
-                        list_array_names[0],
-                        values_type,
-                        array_name,
-                        get_array_type(meshtal, array_name),
-                    )
-                )
-        # multiply the coordinate points chosen by the scale factor
-        if values_type == "cells":  # Take points or centers
-            f_points = meshtal.centers * scale_factor
-        else:  # Points
-            f_points = meshtal.points * scale_factor
-        str_list_array_names = str(list_array_names).replace(r"/", "-")
-        new_name = f"{meshtal.filename[:-4]}_{str_list_array_names}_{out_format}.csv"
-        f = open(new_name, "w", newline="")
-        csv_format(f, meshtal, f_points, list_array_names)
-        print(f"{new_name} created successfully!")
-        f.close()
-    else:
-        print("Invalid format. It must be: 'point_cloud','ip_fluent' o 'csv'")
-
-
-# POINT CLOUD
-def point_cloud(f, points, values):
-    f.write("x, y, z, value\n")
-    bar = tqdm(unit=" Points", desc="Writing", total=len(points))
-    for i in range(len(points)):
-        f.write(f"{points[i][0]:.3f},")
-        f.write(f"{points[i][1]:.3f},")
-        f.write(f"{points[i][2]:.3f},")
-        f.write(f"{values[i]:.3f}\n")
-        bar.update()
-    bar.close()
-
-
-# IP FLUENT
-def ip_fluent(f, meshtal, points, values):
-    guion1 = "3"
-    n_coord = meshtal.n_coordinates
-    n_values = str(len(points))
-    guion2 = "1"
-    uds = "uds-0"
-    beginning = f"{guion1}\n{n_coord}\n{n_values}\n{guion2}\n{uds}\n"
-    f.write(beginning)
-    f.write("(")
-    bar_x = tqdm(unit=" x points", desc="Writing x", total=len(points))
-    for i in range(len(points)):
-        f.write(f"{points[i][0]:.3f}\n")
-        bar_x.update()
-    bar_x.close()
-    f.write(")\n")
-    f.write("(")
-    bar_y = tqdm(unit=" y points", desc="Writing y", total=len(points))
-    for i in range(len(points)):
-        f.write(f"{points[i][1]:.3f}\n")
-        bar_y.update()
-    bar_y.close()
-    f.write(")\n")
-    f.write("(")
-    bar_z = tqdm(unit=" z points", desc="Writing z", total=len(points))
-    for i in range(len(points)):
-        f.write(f"{points[i][2]:.3f}\n")
-        bar_z.update()
-    bar_z.close()
-    f.write(")\n")
-    f.write("(")
-    bar_val = tqdm(unit=" values", desc="Writing values", total=len(values))
-    for i in range(len(points)):
-        f.write(f"{values[i]:.3f}\n")
-        bar_val.update()
-    bar_val.close()
-    f.write(")\n")
-
-
-# CSV
-def csv_format(f, meshtal, points, list_array_names):
-    writer = csv.writer(f)
-    bar = tqdm(unit=" Points", desc="Writing", total=len(points))
-    for i in range(len(points)):
-        csv_points = [
-            f"{points[i][0]:.3f}",
-            f" {points[i][1]:.3f}",
-            f" {points[i][2]:.3f}",
-        ]
-        # multiply the values of the array/s selected by the safety factor
-        for array_name in list_array_names:
-            csv_points.append(f" {meshtal.mesh[array_name][i] * safety_factor:.3f}")
-        writer.writerow(csv_points)
-        bar.update()
-    bar.close()
+def stream_mesh(filename, list_array_names, out_format):
+    return default_session.stream_mesh(filename, list_array_names, out_format)
 
 
 # END OF FUNCTION DEFINITIONS
@@ -0,0 +1,321 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_joining (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# Join any number of meshes in one pass. The points, cells and arrays of the result are
+# allocated once with their final size and every mesh is copied into its part of them.
+# - StructuredGrid (or RectilinearGrid) meshes that follow each other along one axis, in the
+#   order they are given and sharing the points of their common face, give a StructuredGrid
+#   (or RectilinearGrid).
+# - Any other meshes give an UnstructuredGrid. The points closer than the tolerance are
+#   merged with a hashed grid of cells whose diagonal is the tolerance.
+# The merged points keep the values of the first mesh. Only the arrays that are in all the
+# meshes (with the same number of components) are kept. A tolerance of None keeps all the
+# points, and then the result is always an UnstructuredGrid.
+
+import itertools
+
+import numpy as np
+import pyvista as pv
+import vtk
+
+from vtk.util.numpy_support import vtk_to_numpy
+
+VTK_POLYHEDRON = 42
+PAIRS_PER_CHUNK = 2**20  # Pairs of points compared at once when the points are merged
+
+
+def join_meshes(meshes, tolerance=0.0):
+    if tolerance is not None:
+        mesh = structured_join(meshes, tolerance)
+        if mesh is not None:
+            return mesh
+    grids = [
+        mesh if isinstance(mesh, pv.UnstructuredGrid) else mesh.cast_to_unstructured_grid()
+        for mesh in meshes
+    ]
+    if any(np.any(np.asarray(grid.celltypes) == VTK_POLYHEDRON) for grid in grids):
+        return append_filter(grids, tolerance)  # The faces of the polyhedra are kept by VTK
+    return append_unstructured(grids, tolerance)
+
+
+# NAMES OF THE ARRAYS IN ALL THE MESHES WITH THE SAME NUMBER OF COMPONENTS
+def common_arrays(datas):
+    names = []
+    for name in datas[0].keys():
+        shapes = [data[name].shape[1:] if name in data.keys() else None for data in datas]
+        if all(shape == shapes[0] for shape in shapes):
+            names.append(name)
+    return names
+
+
+# ARRAYS OF SEVERAL MESHES ONE AFTER THE OTHER IN ONE NEW ARRAY
+def concatenated(datas, name):
+    arrays = [data[name] for data in datas]
+    dtype = np.result_type(*[array.dtype for array in arrays])
+    result = np.empty((sum(len(array) for array in arrays),) + arrays[0].shape[1:], dtype=dtype)
+    start = 0
+    for array in arrays:
+        result[start : start + len(array)] = array
+        start += len(array)
+    return result
+
+
+def empty_vtk_array(vtk_array, n_values):  # VTK array and a numpy view of its memory
+    vtk_array.SetNumberOfValues(n_values)
+    return vtk_array, vtk_to_numpy(vtk_array)
+
+
+# UNSTRUCTURED GRIDS
+def append_unstructured(grids, tolerance):
+    n_points = [grid.n_points for grid in grids]
+    n_cells = [grid.n_cells for grid in grids]
+    connectivities = [vtk_to_numpy(grid.GetCells().GetConnectivityArray()) for grid in grids]
+    offsets_list = [vtk_to_numpy(grid.GetCells().GetOffsetsArray()) for grid in grids]
+    points = np.empty((sum(n_points), 3), dtype=np.result_type(*[grid.points for grid in grids]))
+    vtk_offsets, offsets = empty_vtk_array(vtk.vtkIdTypeArray(), sum(n_cells) + 1)
+    n_connectivity = sum(len(connectivity) for connectivity in connectivities)
+    vtk_connectivity, connectivity = empty_vtk_array(vtk.vtkIdTypeArray(), n_connectivity)
+    vtk_types, celltypes = empty_vtk_array(vtk.vtkUnsignedCharArray(), sum(n_cells))
+    point_start, cell_start, connectivity_start = 0, 0, 0
+    for grid, grid_connectivity, grid_offsets in zip(grids, connectivities, offsets_list):
+        point_end = point_start + grid.n_points
+        cell_end = cell_start + grid.n_cells
+        connectivity_end = connectivity_start + len(grid_connectivity)
+        points[point_start:point_end] = grid.points
+        connectivity[connectivity_start:connectivity_end] = grid_connectivity + point_start
+        offsets[cell_start:cell_end] = grid_offsets[:-1] + connectivity_start
+        celltypes[cell_start:cell_end] = grid.celltypes
+        point_start, cell_start, connectivity_start = point_end, cell_end, connectivity_end
+    offsets[-1] = n_connectivity
+    point_datas = [grid.point_data for grid in grids]
+    point_arrays = {name: concatenated(point_datas, name) for name in common_arrays(point_datas)}
+    if tolerance is not None and len(points) > 0:
+        groups = coincident_points(points, tolerance)
+        kept = groups == np.arange(len(points))
+        new_ids = np.cumsum(kept) - 1
+        connectivity[:] = new_ids[groups][connectivity]
+        points = points[kept]
+        point_arrays = {name: array[kept] for name, array in point_arrays.items()}
+    cells = vtk.vtkCellArray()
+    cells.SetData(vtk_offsets, vtk_connectivity)
+    mesh = pv.UnstructuredGrid()
+    mesh.SetPoints(pv.vtk_points(points, deep=False))
+    mesh.SetCells(vtk_types, cells)
+    for name, array in point_arrays.items():
+        mesh.point_data[name] = array
+    cell_datas = [grid.cell_data for grid in grids]
+    for name in common_arrays(cell_datas):
+        mesh.cell_data[name] = concatenated(cell_datas, name)
+    return mesh
+
+
+def append_filter(grids, tolerance):
+    append = vtk.vtkAppendFilter()
+    for grid in grids:
+        append.AddInputData(grid)
+    if tolerance is not None:
+        append.MergePointsOn()
+        append.SetTolerance(tolerance)
+    append.Update()
+    return pv.wrap(append.GetOutput())
+
+
+# GROUPS OF POINTS CLOSER THAN THE TOLERANCE: INDEX OF THE FIRST POINT OF THE GROUP OF EACH ONE
+def coincident_points(points, tolerance):
+    # Hashed grid of cells whose diagonal is the tolerance: the points of a cell are all
+    # closer than the tolerance, so they are grouped without being compared, and two points
+    # closer than the tolerance are at most 2 cells away along each axis. Only the pairs of
+    # cells whose points are not in the same group yet are compared, by chunks of about
+    # PAIRS_PER_CHUNK pairs of points, so that neither the time nor the memory grow with the
+    # square of the number of points when the tolerance is close to the point spacing.
+    # The cells are at most 2**20 per axis so that their keys fit in an int64, in which case
+    # the points of a cell are compared too.
+    points = np.asarray(points, dtype=float)
+    n_points = len(points)
+    low = points.min(axis=0)
+    diagonal_size = tolerance / np.sqrt(3) * (1 - 1e-9)
+    size = max(diagonal_size, np.max(points.max(axis=0) - low) / 2**20) or 1.0
+    reach = int(np.ceil(tolerance / size))  # Cells away along each axis
+    cells = np.floor((points - low) / size).astype(np.int64) + reach  # Empty layers around
+    shape = cells.max(axis=0) + reach + 1
+    keys = (cells[:, 2] * shape[1] + cells[:, 1]) * shape[0] + cells[:, 0]
+    order, distinct, starts, counts = grouped(keys)
+    first_points = order[starts]  # First point of each cell
+    whole_cells = size == diagonal_size and tolerance > 0
+    ranges = []  # (start, count) of the cells compared with each other
+    if whole_cells:
+        groups = connected_groups(n_points, order, np.repeat(first_points, counts))
+    else:
+        groups = np.arange(n_points)
+        several = counts > 1
+        ranges.append((starts[several], counts[several], starts[several], counts[several]))
+    for offset in itertools.product(range(-reach, reach + 1), repeat=3):
+        if offset[::-1] > (0, 0, 0):  # Each pair of neighbour cells once
+            delta = (offset[2] * shape[1] + offset[1]) * shape[0] + offset[0]
+            _, found, neighbour = np.intersect1d(
+                distinct + delta, distinct, assume_unique=True, return_indices=True
+            )
+            ranges.append((starts[found], counts[found], starts[neighbour], counts[neighbour]))
+    for k, (starts_a, counts_a, starts_b, counts_b) in enumerate(ranges):
+        chunk_ids = np.cumsum(counts_a * counts_b) // PAIRS_PER_CHUNK
+        for chunk in np.split(np.arange(len(chunk_ids)), np.nonzero(np.diff(chunk_ids))[0] + 1):
+            if whole_cells:  # Only the cells not in the same group yet
+                chunk = chunk[
+                    groups[order[starts_a[chunk]]] != groups[order[starts_b[chunk]]]
+                ]
+            i, j = cell_pairs(starts_a[chunk], counts_a[chunk], starts_b[chunk], counts_b[chunk])
+            if k == 0 and not whole_cells:  # Each pair of points of the same cell once
+                i, j = i[i < j], j[i < j]
+            i, j = order[i], order[j]
+            apart = groups[i] != groups[j]
+            i, j = i[apart], j[apart]
+            close = np.sum((points[i] - points[j]) ** 2, axis=1) <= tolerance**2
+            if np.any(close):  # Joined to the groups found before
+                groups = connected_groups(
+                    n_points,
+                    np.concatenate((i[close], np.arange(n_points))),
+                    np.concatenate((j[close], groups)),
+                )
+    return groups
+
+
+def grouped(keys):  # Order of the keys, and the distinct keys with their start and count
+    order = np.argsort(keys, kind="stable")
+    distinct, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    return order, distinct, starts, counts
+
+
+# ALL THE PAIRS OF POSITIONS OF TWO RANGES (START, COUNT), FOR MANY PAIRS OF RANGES
+def cell_pairs(starts_a, counts_a, starts_b, counts_b):
+    n_pairs = counts_a * counts_b
+    pair = np.repeat(np.arange(len(n_pairs)), n_pairs)
+    local = np.arange(n_pairs.sum()) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+    return (
+        starts_a[pair] + local // counts_b[pair],
+        starts_b[pair] + local % counts_b[pair],
+    )
+
+
+# LOWEST INDEX OF THE GROUP OF EACH POINT, THE GROUPS BEING JOINED BY THE PAIRS (i, j)
+def connected_groups(n_points, i, j):
+    groups = np.arange(n_points)
+    while True:
+        lowest = np.minimum(groups[i], groups[j])
+        new_groups = groups.copy()
+        np.minimum.at(new_groups, i, lowest)
+        np.minimum.at(new_groups, j, lowest)
+        new_groups = new_groups[new_groups]
+        if np.array_equal(new_groups, groups):
+            return groups
+        groups = new_groups
+
+
+# STRUCTURED GRIDS ONE AFTER THE OTHER ALONG ONE AXIS, AS ONE GRID, OR NONE
+def structured_join(meshes, tolerance):
+    if all(isinstance(mesh, pv.RectilinearGrid) for mesh in meshes):
+        following, joined_geometry = following_axes, joined_axes
+    elif all(isinstance(mesh, pv.StructuredGrid) for mesh in meshes):
+        following, joined_geometry = following_faces, joined_points
+    else:
+        return None
+    axis = next((i for i in range(3) if following(meshes, i, tolerance)), None)
+    if axis is None:
+        return None
+    joined = joined_geometry(meshes, axis)
+    for data_name, cells in (("point_data", False), ("cell_data", True)):
+        datas = [getattr(mesh, data_name) for mesh in meshes]
+        for name in common_arrays(datas):
+            layers = [
+                lattice(data[name], mesh.dimensions, cells) for mesh, data in zip(meshes, datas)
+            ]
+            values = join_layers(layers, axis, shared=not cells)
+            getattr(joined, data_name)[name] = values.reshape((-1,) + values.shape[3:])
+    return joined
+
+
+def joined_axes(meshes, axis):  # RectilinearGrids
+    axes = [np.asarray(values) for values in (meshes[0].x, meshes[0].y, meshes[0].z)]
+    # The first coordinate of each grid is the last one of the previous grid
+    parts = [np.asarray((mesh.x, mesh.y, mesh.z)[axis])[1:] for mesh in meshes[1:]]
+    axes[axis] = np.concatenate([axes[axis]] + parts)
+    return pv.RectilinearGrid(*axes)
+
+
+def joined_points(meshes, axis):  # StructuredGrids
+    layers = [lattice(mesh.points, mesh.dimensions) for mesh in meshes]
+    dimensions = list(meshes[0].dimensions)
+    dimensions[axis] = sum(mesh.dimensions[axis] - 1 for mesh in meshes) + 1
+    joined = pv.StructuredGrid()
+    joined.points = join_layers(layers, axis, shared=True).reshape((-1, 3))
+    joined.dimensions = dimensions
+    return joined
+
+
+# VALUES OF THE POINTS (OR CELLS) OF A STRUCTURED GRID AS A (z, y, x, ...) ARRAY
+def lattice(values, dimensions, cells=False):
+    nx, ny, nz = (max(n - 1, 1) for n in dimensions) if cells else dimensions
+    values = np.asarray(values)
+    return values.reshape((nz, ny, nx) + values.shape[1:])
+
+
+def join_layers(layers, axis, shared):  # shared: the first layer of each grid is skipped
+    numpy_axis = 2 - axis
+    parts = [layers[0]]
+    for layer in layers[1:]:
+        index = [slice(None)] * layer.ndim
+        index[numpy_axis] = slice(1 if shared else 0, None)
+        parts.append(layer[tuple(index)])
+    return np.concatenate(parts, axis=numpy_axis)
+
+
+def following_axes(meshes, axis, tolerance):  # RectilinearGrids
+    mesh_axes = [[np.asarray(values) for values in (mesh.x, mesh.y, mesh.z)] for mesh in meshes]
+    for axes, next_axes in zip(mesh_axes[:-1], mesh_axes[1:]):
+        if len(axes[axis]) < 2 or len(next_axes[axis]) < 2:
+            return False
+        if not np.isclose(axes[axis][-1], next_axes[axis][0], rtol=0, atol=tolerance):
+            return False
+        for other in range(3):
+            if other != axis and not same_values(axes[other], next_axes[other], tolerance):
+                return False
+    return True
+
+
+def following_faces(meshes, axis, tolerance):  # StructuredGrids
+    numpy_axis = 2 - axis
+    for mesh, next_mesh in zip(meshes[:-1], meshes[1:]):
+        dimensions, next_dimensions = mesh.dimensions, next_mesh.dimensions
+        if dimensions[axis] < 2 or next_dimensions[axis] < 2:
+            return False
+        if any(dimensions[i] != next_dimensions[i] for i in range(3) if i != axis):
+            return False
+        last = np.take(lattice(mesh.points, dimensions), -1, axis=numpy_axis)
+        first = np.take(lattice(next_mesh.points, next_dimensions), 0, axis=numpy_axis)
+        if not np.allclose(last, first, rtol=0, atol=tolerance):
+            return False
+    return True
+
+
+def same_values(values, other_values, tolerance):
+    return len(values) == len(other_values) and np.allclose(
+        values, other_values, rtol=0, atol=tolerance
+    )
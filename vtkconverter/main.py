@@ -101,6 +101,7 @@ info_menu = """
 
  * Mesh info                  (mesh)
  * Array info                 (array)
+ * All arrays info            (all)
  * Exit                       (end)
 """
 
@@ -112,6 +113,9 @@ write_menu = """
    - point_cloud             
    - ip_fluent            
    - csv                     
+   - npz                      (NumPy, all arrays in one file)
+   - hdf5                     (needs h5py)
+   - parquet                  (needs pyarrow)
  * Exit                       (end)
 """
 
@@ -252,8 +256,8 @@ def answer_loop(menu):  # each menu accepts some specific keys
         "safety",
         "end",
     ]
-    info_keys = ["mesh", "array", "end"]
-    write_keys = ["point_cloud", "ip_fluent", "csv", "end"]
+    info_keys = ["mesh", "array", "all", "end"]
+    write_keys = ["point_cloud", "ip_fluent", "csv", "npz", "hdf5", "parquet", "end"]
     operation_keys = ["translate", "rotate", "joint", "end"]
     export_keys = ["binary", "ascii", "end"]
     menu_list = {
@@ -303,6 +307,8 @@ def info():
             input_arrays(filename)
             array = select_array(filename)
             functions.print_array_info(filename, array)
+        elif ans == "all":
+            functions.print_all_arrays_info(filename)
 
 
 def write():
@@ -317,7 +323,9 @@ def write():
             filename = list_of_files[0]
         input_arrays(filename)
         list_of_arrays = select_multi_array(filename)
-        functions.write_mesh(filename, list_of_arrays, ans)
+        error = functions.write_mesh(filename, list_of_arrays, ans)
+        if error is not None:  # e.g. an invalid array or a missing module of the format
+            print(f" {error}")
 
 
 def operate():
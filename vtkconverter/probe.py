@@ -0,0 +1,291 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_probe (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# Values of the arrays of a mesh at any points. A spatial index is built once per mesh (see
+# MeshTally.spatial_index) and used for all the queries:
+# - RectilinearGrid, and StructuredGrid whose points are a rectilinear lattice: the cell of a
+#   point is found with a binary search on each axis, without any VTK filter.
+# - Other meshes: a VTK static cell locator, used by a probe filter.
+# "nearest" gives the value of the cell that contains the point (cell arrays) or of the
+# closest point of that cell (point arrays). "trilinear" interpolates between the cell
+# centers (cell arrays) or between the points of the cell (point arrays). The points out of
+# the mesh get NaN.
+
+import itertools
+
+import numpy as np
+import pyvista as pv
+import vtk
+
+from vtk.util.numpy_support import vtk_to_numpy
+
+PROBE_METHODS = ("nearest", "trilinear")
+
+
+# LOWER NEIGHBOUR OF EVERY COORDINATE IN AN AXIS AND THE WEIGHT OF THE UPPER ONE
+def lattice_position(axis, coordinates):
+    if len(axis) == 1:  # Flat axis (2D grid)
+        return np.zeros(len(coordinates), dtype=np.intp), np.zeros(len(coordinates))
+    lower = np.searchsorted(axis, coordinates, side="right") - 1
+    lower = np.clip(lower, 0, len(axis) - 2)
+    weight = (coordinates - axis[lower]) / (axis[lower + 1] - axis[lower])
+    return lower, np.clip(weight, 0, 1)  # Constant beyond the first and last values
+
+
+def flat_index(indices, shape):  # VTK order: x varies fastest, then y and then z
+    return indices[0] + shape[0] * (indices[1] + shape[1] * indices[2])
+
+
+# TRILINEAR INTERPOLATION OF VALUES GIVEN AT THE NODES OF A LATTICE
+def lattice_interpolation(axes, values, points):
+    shape = [len(axis) for axis in axes]
+    positions = [lattice_position(axis, points[:, i]) for i, axis in enumerate(axes)]
+    result = 0.0
+    for corner in itertools.product((0, 1), repeat=3):
+        indices = []
+        weight = 1.0
+        for i, (lower, upper_weight) in enumerate(positions):
+            if corner[i] == 1 and shape[i] > 1:
+                indices.append(lower + 1)
+                weight = weight * upper_weight
+            elif corner[i] == 1:  # Flat axis, only the lower corner is used
+                indices.append(lower)
+                weight = weight * 0.0
+            else:
+                indices.append(lower)
+                weight = weight * (1 - upper_weight)
+        corner_values = values[flat_index(indices, shape)]
+        result = result + weight.reshape((-1,) + (1,) * (values.ndim - 1)) * corner_values
+    return result
+
+
+# AXES OF A STRUCTUREDGRID WHOSE POINTS ARE A RECTILINEAR LATTICE, OR NONE
+def lattice_axes(mesh):
+    nx, ny, nz = mesh.dimensions
+    points = np.asarray(mesh.points).reshape((nz, ny, nx, 3))
+    axes = (points[0, 0, :, 0], points[0, :, 0, 1], points[:, 0, 0, 2])
+    if not all(increasing(axis) for axis in axes):
+        return None
+    lattice = (
+        np.allclose(points[..., 0], axes[0][None, None, :])
+        and np.allclose(points[..., 1], axes[1][None, :, None])
+        and np.allclose(points[..., 2], axes[2][:, None, None])
+    )
+    return tuple(np.array(axis, dtype=float) for axis in axes) if lattice else None
+
+
+def increasing(axis):  # The lattice indices are found with searchsorted
+    return len(axis) == 1 or bool(np.all(np.diff(axis) > 0))
+
+
+# CLASS DEFINITION
+class LatticeIndex:
+    # Index of a mesh whose points are the lattice of three increasing axes
+    def __init__(self, axes):
+        self.axes = axes
+        # The cell centers are the middle of each interval, the same as VTK cell_centers
+        self.centers = tuple(
+            axis if len(axis) == 1 else axis[:-1] + 0.5 * (axis[1:] - axis[:-1]) for axis in axes
+        )
+
+    def inside(self, points):
+        mask = np.ones(len(points), dtype=bool)
+        for i, axis in enumerate(self.axes):
+            if len(axis) == 1:
+                mask &= np.isclose(points[:, i], axis[0])
+            else:
+                mask &= (points[:, i] >= axis[0]) & (points[:, i] <= axis[-1])
+        return mask
+
+    def probe(self, points, arrays, method):  # arrays: name -> ("cells" or "points", values)
+        inside = self.inside(points)
+        results = dict()
+        for name, (values_type, values) in arrays.items():
+            if method == "trilinear":
+                axes = self.centers if values_type == "cells" else self.axes
+                result = lattice_interpolation(axes, values, points)
+            elif values_type == "cells":
+                cells = [
+                    lattice_position(axis, points[:, i])[0] for i, axis in enumerate(self.axes)
+                ]
+                result = values[flat_index(cells, [len(axis) for axis in self.centers])]
+            else:  # Closest point: the upper neighbour if the weight is over one half
+                nodes = []
+                for i, axis in enumerate(self.axes):
+                    lower, weight = lattice_position(axis, points[:, i])
+                    nodes.append(lower + (weight > 0.5))
+                result = values[flat_index(nodes, [len(axis) for axis in self.axes])]
+            results[name] = masked(result, inside)
+        return results
+
+
+# END OF CLASS DEFINITION
+
+
+# CLASS DEFINITION
+class LocatorIndex:
+    # Index of any other mesh: a VTK static cell locator, built once, used by a probe filter.
+    # The cell that contains each point is obtained by probing an array of cell ids.
+    def __init__(self, mesh):
+        if isinstance(mesh, pv.RectilinearGrid):  # Decreasing axes, which VTK does not search
+            mesh = mesh.cast_to_unstructured_grid()  # Same cell and point ids
+        self.mesh = mesh.copy(deep=False)
+        self.mesh.clear_data()
+        self.mesh.cell_data["cell_id"] = np.arange(mesh.n_cells, dtype=float)
+        self.locator = vtk.vtkStaticCellLocator()
+        self.locator.SetDataSet(self.mesh)
+        self.locator.BuildLocator()
+        self.point_data = dict()  # Cell arrays converted to point arrays for "trilinear"
+        self.cells = None  # (offsets, connectivity) of the cells, for "nearest" point arrays
+        # The locator is only read once it is built, so several threads can probe batches at
+        # the same time. Each batch adds the arrays probed to its own shallow copy of the mesh
+        # and uses its own probe filter
+
+    def cell_ids(self, points, source=None):  # -1 out of the mesh, and the interpolated arrays
+        source = self.mesh if source is None else source
+        probe = vtk.vtkProbeFilter()
+        if hasattr(probe, "SetCellLocator"):  # Newer VTK, the strategies are deprecated
+            probe.SetCellLocator(self.locator)
+        else:
+            strategy = vtk.vtkCellLocatorStrategy()
+            strategy.SetCellLocator(self.locator)
+            probe.SetFindCellStrategy(strategy)
+        probe.ComputeToleranceOff()  # The default one gives the neighbour cell near a face
+        probe.SetTolerance(1e-9 * self.mesh.length)
+        probe.SetInputData(pv.PolyData(points))
+        probe.SetSourceData(source)
+        probe.Update()
+        output = pv.wrap(probe.GetOutput())
+        valid = np.asarray(output.point_data["vtkValidPointMask"]).astype(bool)
+        cell_ids = np.where(valid, np.asarray(output.point_data["cell_id"]), -1)
+        return cell_ids.astype(np.intp), output
+
+    def probe(self, points, arrays, method):
+        source = self.mesh.copy(deep=False)  # Same geometry and cell ids, no copy of them
+        for name, (values_type, values) in arrays.items():
+            if values_type == "points":
+                source.point_data[name] = values
+            elif method == "trilinear":  # Interpolated from the values at the points
+                source.point_data[name] = self.cell_to_point(name, values)
+        cell_ids, output = self.cell_ids(points, source)
+        inside = cell_ids >= 0
+        results = dict()
+        for name, (values_type, values) in arrays.items():
+            if method == "nearest" and values_type == "cells":
+                result = values[np.where(inside, cell_ids, 0)]
+            elif method == "nearest":
+                result = values[self.closest_points(points, cell_ids)]
+            else:
+                result = np.asarray(output.point_data[name])
+            results[name] = masked(result, inside)
+        return results
+
+    def cell_to_point(self, name, values):
+        # Saved with the values it comes from, so that a new array with the same name is
+        # converted again
+        converted = self.point_data.get(name)
+        if converted is None or converted[0] is not values:
+            mesh = self.mesh.copy(deep=False)
+            mesh.clear_data()
+            mesh.cell_data[name] = values
+            converted = (values, mesh.cell_data_to_point_data().point_data[name])
+            self.point_data[name] = converted
+        return converted[1]
+
+    def closest_points(self, points, cell_ids):  # Closest point of the cell of every point
+        mesh = self.mesh
+        if self.cells is None:
+            cells = mesh
+            if not isinstance(mesh, pv.UnstructuredGrid):
+                cells = mesh.cast_to_unstructured_grid()
+            self.cells = (
+                vtk_to_numpy(cells.GetCells().GetOffsetsArray()),
+                vtk_to_numpy(cells.GetCells().GetConnectivityArray()),
+            )
+        offsets, connectivity = self.cells
+        cell_ids = np.where(cell_ids >= 0, cell_ids, 0)
+        starts = offsets[cell_ids]
+        sizes = offsets[cell_ids + 1] - starts
+        columns = np.arange(sizes.max(initial=1))
+        # One row per point with the ids of the points of its cell, padded with the first one
+        ids = starts[:, None] + np.where(columns[None, :] < sizes[:, None], columns[None, :], 0)
+        candidates = connectivity[ids]
+        differences = np.asarray(mesh.points)[candidates] - points[:, None, :]
+        distances = np.sum(differences**2, axis=2)
+        return candidates[np.arange(len(points)), np.argmin(distances, axis=1)]
+
+
+# END OF CLASS DEFINITION
+
+
+def masked(result, inside):  # NaN out of the mesh
+    result = np.array(result, dtype=float)
+    result[~inside] = np.nan
+    return result
+
+
+# AXES OF A MESH WHOSE POINTS ARE A RECTILINEAR LATTICE OF INCREASING AXES, OR NONE
+def mesh_lattice(mesh):
+    # A RectilinearGrid with a decreasing (or repeated) coordinate uses a LocatorIndex
+    if isinstance(mesh, pv.RectilinearGrid):
+        axes = tuple(np.array(axis, dtype=float) for axis in (mesh.x, mesh.y, mesh.z))
+        return axes if all(increasing(axis) for axis in axes) else None
+    if isinstance(mesh, pv.StructuredGrid):
+        return lattice_axes(mesh)
+    return None
+
+
+def build_index(mesh):
+    axes = mesh_lattice(mesh)
+    if axes is not None:
+        return LatticeIndex(axes)
+    return LocatorIndex(mesh)
+
+
+# VOLUME-CONSERVATIVE REMAP BETWEEN TWO LATTICES
+def overlap_matrix(source_axis, target_axis):
+    # Length of the overlap of every target interval (rows) with every source interval, or
+    # None if only one of the axes is flat
+    if len(source_axis) == 1 or len(target_axis) == 1:
+        if len(source_axis) != len(target_axis):
+            return None
+        return np.array([[1.0 if np.isclose(source_axis[0], target_axis[0]) else 0.0]])
+    low = np.maximum(target_axis[:-1, None], source_axis[None, :-1])
+    high = np.minimum(target_axis[1:, None], source_axis[None, 1:])
+    return np.clip(high - low, 0, None)
+
+
+def conservative_remap(source_axes, target_axes, values):
+    # Every target cell gets the integral of the source values over it divided by its volume,
+    # so the integral over the region covered by both meshes is kept. The overlap volumes are
+    # the products of the overlaps along each axis, applied one axis at a time.
+    matrices = [overlap_matrix(s, t) for s, t in zip(source_axes, target_axes)]
+    if any(matrix is None for matrix in matrices):
+        return None
+    shape = tuple(max(len(axis) - 1, 1) for axis in source_axes)
+    result = np.asarray(values, dtype=float).reshape(shape[::-1] + np.shape(values)[1:])
+    for axis, matrix in zip((2, 1, 0), matrices):  # x is the last axis of the reshaped array
+        result = np.moveaxis(np.tensordot(matrix, result, axes=([1], [axis])), 0, axis)
+    sizes = [np.diff(axis) if len(axis) > 1 else np.ones(1) for axis in target_axes]
+    volumes = np.multiply.outer(np.multiply.outer(sizes[2], sizes[1]), sizes[0])  # (z, y, x)
+    result = result / np.reshape(volumes, volumes.shape + (1,) * (result.ndim - 3))
+    return result.reshape((-1,) + np.shape(values)[1:])
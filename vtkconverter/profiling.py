@@ -0,0 +1,194 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_profiling (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# Timing of the operations of vtkconverter. The operations (@profiled) and their phases
+# (with phase("name"):) are only measured while a Profiler is active (start_profiling), so
+# they cost nothing otherwise. For each phase the wall time, the CPU time, the bytes read and
+# written by the process and the peak resident memory are added up. Nested phases are
+# reported with their full path, e.g. "write_mesh/format".
+
+import contextlib
+import functools
+import json
+import sys
+import threading
+import time
+
+profiler = None  # Active Profiler, None when nothing is measured
+NO_PHASE = contextlib.nullcontext()
+
+
+def peak_memory():  # peak resident memory of the process in MB, if it can be known
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def io_counters():  # (bytes read, bytes written) by the process, if they can be known
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):  # Only Linux has /proc/self/io
+        return None, None
+
+
+def snapshot():
+    return (time.perf_counter(), time.process_time()) + io_counters() + (peak_memory(),)
+
+
+def new_record():
+    return {
+        "calls": 0,
+        "wall_s": 0.0,
+        "cpu_s": 0.0,
+        "bytes_read": None,
+        "bytes_written": None,
+        "peak_rss_mb": None,
+    }
+
+
+def add_to_record(record, before, after):  # before and after are snapshots
+    record["calls"] += 1
+    record["wall_s"] += after[0] - before[0]
+    record["cpu_s"] += after[1] - before[1]
+    for key, i in (("bytes_read", 2), ("bytes_written", 3)):
+        if after[i] is not None:
+            record[key] = (record[key] or 0) + after[i] - before[i]
+    if after[4] is not None:
+        record["peak_rss_mb"] = max(record["peak_rss_mb"] or 0, after[4])
+
+
+# CLASS DEFINITION
+class Profiler:
+    # The phases of several threads (e.g. one session per thread) are added up together,
+    # each thread has its own stack of nested phases
+    def __init__(self):
+        self.records = dict()  # path -> totals of the phase
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.start = snapshot()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        stack = self.local.__dict__.setdefault("stack", [])
+        stack.append(name)
+        path = "/".join(stack)
+        with self.lock:
+            if path not in self.records:  # The phases are reported in the order they start
+                self.records[path] = new_record()
+        before = snapshot()
+        try:
+            yield
+        finally:
+            after = snapshot()
+            stack.pop()
+            with self.lock:
+                add_to_record(self.records[path], before, after)
+
+    def report(self):
+        total = new_record()
+        add_to_record(total, self.start, snapshot())
+        with self.lock:
+            phases = [dict(name=path, **record) for path, record in self.records.items()]
+        return {"total": total, "phases": phases}
+
+    def save(self, fn):
+        with open(fn, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_report(self):
+        report = self.report()
+        print(f"\n {'Phase':<40} {'Calls':>6} {'Wall (s)':>9} {'CPU (s)':>9} {'MB written':>10}")
+        for record in report["phases"] + [dict(name="total", **report["total"])]:
+            written = record["bytes_written"]
+            written = "" if written is None else f"{written / 1024**2:.1f}"
+            print(
+                f" {record['name']:<40} {record['calls']:>6} {record['wall_s']:>9.3f}"
+                f" {record['cpu_s']:>9.3f} {written:>10}"
+            )
+        if report["total"]["peak_rss_mb"] is not None:
+            print(f" Peak memory of the process: {report['total']['peak_rss_mb']:.1f} MB")
+
+
+# END OF CLASS DEFINITION
+
+
+def start_profiling():
+    global profiler
+    profiler = Profiler()
+    return profiler
+
+
+def stop_profiling():  # Returns the report of the profiler that was active
+    global profiler
+    if profiler is None:
+        return None
+    report = profiler.report()
+    profiler = None
+    return report
+
+
+def phase(name):  # with phase("read"): ...
+    if profiler is None:
+        return NO_PHASE
+    return profiler.phase(name)
+
+
+def profiled(function):  # Decorator: the whole function is a phase with its name
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if profiler is None:
+            return function(*args, **kwargs)
+        with profiler.phase(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+# DUMP OF A PYTHON PROFILER: cProfile (.prof, read with pstats) OR pyinstrument (.html)
+@contextlib.contextmanager
+def profile_dump(fn):
+    if fn.endswith(".html"):
+        from pyinstrument import Profiler as HTMLProfiler
+
+        html_profiler = HTMLProfiler()
+        html_profiler.start()
+        try:
+            yield
+        finally:
+            html_profiler.stop()
+            with open(fn, "w") as f:
+                f.write(html_profiler.output_html())
+    else:
+        import cProfile
+
+        python_profiler = cProfile.Profile()
+        python_profiler.enable()
+        try:
+            yield
+        finally:
+            python_profiler.disable()
+            python_profiler.dump_stats(fn)
@@ -0,0 +1,397 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_readers (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+import pyvista as pv
+import numpy as np
+import mmap
+import os
+import sys
+import vtk
+import weakref
+import xml.etree.ElementTree as ET
+
+from vtk.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+
+VTK_EXTENSIONS = (".vtk", ".vts", ".vtr", ".vtu")
+
+# DataArray types of the VTK XML format
+VTK_XML_TYPES = {
+    "Int8": "i1",
+    "UInt8": "u1",
+    "Int16": "i2",
+    "UInt16": "u2",
+    "Int32": "i4",
+    "UInt32": "u4",
+    "Int64": "i8",
+    "UInt64": "u8",
+    "Float32": "f4",
+    "Float64": "f8",
+}
+
+# Open memory mappings of the files read by RawXMLReader: absolute path -> set of mmap objects.
+# A mapping is closed when it is garbage collected, i.e. when no array is a view of it any more
+mapped_files = dict()
+
+# VTK XML readers able to read only a sub-extent of the file
+XML_STRUCTURED_READERS = {
+    ".vts": vtk.vtkXMLStructuredGridReader,
+    ".vtr": vtk.vtkXMLRectilinearGridReader,
+}
+
+
+# CLASS DEFINITION
+class SlabReader:
+    # Reads the centers (or points) and the values of a VTK file in slabs of whole k-layers,
+    # so that only one slab is kept in memory at a time. Only the .vts and .vtr formats can
+    # be read by pieces, any other file (e.g. legacy .vtk or .vtu) is read at once and then
+    # split in chunks: streamed is False and the memory used is the one of the whole mesh.
+    def __init__(self, fn, slab_size):  # file name, maximum number of rows per slab
+        self.filename = fn
+        self.slab_size = slab_size
+        extension = fn[-4:].lower()
+        if extension in XML_STRUCTURED_READERS:
+            self.reader = XML_STRUCTURED_READERS[extension]()
+            self.reader.SetFileName(fn)
+            self.reader.UpdateInformation()
+            information = self.reader.GetOutputInformation(0)
+            self.extent = information.Get(vtk.vtkStreamingDemandDrivenPipeline.WHOLE_EXTENT())
+            reader = self.reader
+            self.cells_info = [
+                reader.GetCellArrayName(i) for i in range(reader.GetNumberOfCellArrays())
+            ]
+            self.points_info = [
+                reader.GetPointArrayName(i) for i in range(reader.GetNumberOfPointArrays())
+            ]
+            self.mesh = None
+            self.streamed = True
+        else:
+            self.reader = None
+            self.mesh = pv.read(fn)
+            self.streamed = False
+            self.cells_info = list(self.mesh.cell_data)
+            self.points_info = list(self.mesh.point_data)
+        self.n_coordinates = 3
+
+    def get_array_type(self, array_name):
+        if array_name in self.cells_info:
+            return "cells"
+        elif array_name in self.points_info:
+            return "points"
+        else:
+            return "Invalid"
+
+    def n_rows(self, values_type):  # number of cells or points that will be read
+        if self.reader is None:
+            return self.mesh.n_cells if values_type == "cells" else self.mesh.n_points
+        dimensions = [self.extent[1] - self.extent[0], self.extent[3] - self.extent[2]]
+        dimensions.append(self.extent[5] - self.extent[4])
+        if values_type == "cells":
+            return int(np.prod([max(n, 1) for n in dimensions]))
+        return int(np.prod([n + 1 for n in dimensions]))
+
+    def slabs(self, list_array_names, values_type):
+        # Yields (coordinates, values) for consecutive groups of rows, in the same order as
+        # the whole mesh. The values are a list with one array per array name.
+        if self.reader is None:
+            if values_type == "cells":
+                coordinates = self.mesh.cell_centers().points
+            else:
+                coordinates = self.mesh.points
+            arrays = [self.mesh[array_name] for array_name in list_array_names]
+            for start in range(0, len(coordinates), self.slab_size):
+                end = start + self.slab_size
+                yield coordinates[start:end], [array[start:end] for array in arrays]
+            return
+
+        # Only the requested arrays are read from the file
+        for selection in (
+            self.reader.GetCellDataArraySelection(),
+            self.reader.GetPointDataArraySelection(),
+        ):
+            selection.DisableAllArrays()
+            for array_name in list_array_names:
+                selection.EnableArray(array_name)
+
+        i0, i1, j0, j1, k0, k1 = self.extent
+        if values_type == "cells":
+            layer_size = max(i1 - i0, 1) * max(j1 - j0, 1)
+            n_layers = max(k1 - k0, 1)
+        else:
+            layer_size = (i1 - i0 + 1) * (j1 - j0 + 1)
+            n_layers = k1 - k0 + 1
+        layers_per_slab = max(self.slab_size // layer_size, 1)
+        for first_layer in range(0, n_layers, layers_per_slab):
+            last_layer = min(first_layer + layers_per_slab, n_layers)
+            if values_type == "cells":
+                # The cells of the layers [first, last) need the points of [first, last]
+                slab_extent = (i0, i1, j0, j1, k0 + first_layer, min(k0 + last_layer, k1))
+            else:
+                slab_extent = (i0, i1, j0, j1, k0 + first_layer, k0 + last_layer - 1)
+            self.reader.UpdateExtent(slab_extent)
+            slab = pv.wrap(self.reader.GetOutput())
+            if values_type == "cells":
+                coordinates = slab.cell_centers().points
+                values = [slab.cell_data[array_name] for array_name in list_array_names]
+            else:
+                coordinates = slab.points
+                values = [slab.point_data[array_name] for array_name in list_array_names]
+            yield coordinates, values
+
+
+# END OF CLASS DEFINITION
+
+
+# CLASS DEFINITION
+class RawXMLReader:
+    # Reads a VTK XML file (.vts, .vtr, .vtu) whose data is appended in raw binary. The file is
+    # memory-mapped and every DataArray is a NumPy view of the file, so nothing is copied or
+    # decoded: only the pages of the arrays that are actually used are read from disk.
+    # If the file cannot be read this way (compressed, base64, ascii or inline data, several
+    # pieces, different byte order...) self.supported is False and pv.read must be used.
+    # A mapped file cannot be replaced or deleted on Windows: the arrays of the meshes read
+    # must be copied into memory first (copy_mapped_arrays), and then the reader closed.
+    def __init__(self, fn):  # file name
+        self.filename = fn
+        self.supported = False
+        self.map = None
+        self.arrays = {"cells": dict(), "points": dict(), "field": dict()}
+        with open(fn, "rb") as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            except ValueError:  # Empty file
+                return
+        mapped_files.setdefault(os.path.abspath(fn), weakref.WeakSet()).add(self.map)
+        appended = self.map.find(b"<AppendedData")
+        if appended == -1:
+            return
+        start = self.map.find(b"_", appended)
+        if start == -1 or b'encoding="raw"' not in self.map[appended:start]:
+            return
+        self.data_start = start + 1
+        root = ET.fromstring(self.map[:appended] + b"</VTKFile>")
+        self.supported = self.__read_header__(root)
+
+    def __read_header__(self, root):
+        self.mesh_type = root.get("type")
+        if self.mesh_type not in ("StructuredGrid", "RectilinearGrid", "UnstructuredGrid"):
+            return False
+        if root.get("compressor") is not None:
+            return False
+        byte_order = "<" if root.get("byte_order", "LittleEndian") == "LittleEndian" else ">"
+        if byte_order != ("<" if sys.byteorder == "little" else ">"):
+            return False
+        self.header_type = np.dtype(byte_order + VTK_XML_TYPES[root.get("header_type", "UInt32")])
+        self.byte_order = byte_order
+        grid = root.find(self.mesh_type)
+        pieces = grid.findall("Piece")
+        if len(pieces) != 1:
+            return False
+        piece = pieces[0]
+        if self.mesh_type == "UnstructuredGrid":
+            self.n_points = int(piece.get("NumberOfPoints"))
+            self.n_cells = int(piece.get("NumberOfCells"))
+            if piece.find("Cells/DataArray[@Name='faces']") is not None:  # Polyhedra
+                return False
+        else:
+            extent = [int(i) for i in piece.get("Extent").split()]
+            self.dimensions = [extent[1] - extent[0] + 1, extent[3] - extent[2] + 1]
+            self.dimensions.append(extent[5] - extent[4] + 1)
+        groups = {
+            "cells": piece.findall("CellData/DataArray"),
+            "points": piece.findall("PointData/DataArray"),
+            "field": grid.findall("FieldData/Array") + grid.findall("FieldData/DataArray"),
+            "geometry": piece.findall("Points/DataArray")
+            + piece.findall("Coordinates/DataArray")
+            + piece.findall("Cells/DataArray"),
+        }
+        self.geometry = []
+        for group, elements in groups.items():
+            for element in elements:
+                if element.get("format") != "appended":
+                    return False
+                if element.get("type") not in VTK_XML_TYPES and element.get("type") != "String":
+                    return False
+                description = (
+                    element.get("type"),
+                    int(element.get("NumberOfComponents", "1")),
+                    int(element.get("offset")),
+                )
+                if group == "geometry":
+                    self.geometry.append(description)
+                else:
+                    self.arrays[group][element.get("Name")] = description
+        return True
+
+    # RELEASE THE MAPPING OF THE FILE
+    def close(self):  # BufferError if an array read is still a view of the file
+        if self.map is not None:
+            close_mapping(self.filename, self.map)
+            self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    @property
+    def cells_info(self):
+        return list(self.arrays["cells"])
+
+    @property
+    def points_info(self):
+        return list(self.arrays["points"])
+
+    def __view__(self, description):
+        # Each appended block is the number of bytes (header_type) followed by the data
+        vtk_type, n_components, offset = description
+        position = self.data_start + offset
+        nbytes = int(np.frombuffer(self.map, self.header_type, 1, position)[0])
+        position += self.header_type.itemsize
+        if vtk_type == "String":  # Strings ended with a null character
+            strings = self.map[position : position + nbytes].split(b"\0")[:-1]
+            return np.array([string.decode() for string in strings])
+        dtype = np.dtype(self.byte_order + VTK_XML_TYPES[vtk_type])
+        view = np.frombuffer(self.map, dtype, nbytes // dtype.itemsize, position)
+        return view.reshape(-1, n_components) if n_components > 1 else view
+
+    def get_array(self, array_name):  # NumPy view of a cell or point array
+        for association in ("cells", "points"):
+            if array_name in self.arrays[association]:
+                return self.__view__(self.arrays[association][array_name])
+        raise KeyError(array_name)
+
+    # BUILD A PYVISTA MESH WHOSE ARRAYS ARE VIEWS OF THE FILE
+    def read(self, list_array_names=None):
+        # Only the arrays in list_array_names are attached to the mesh (all of them if None)
+        geometry = [self.__view__(description) for description in self.geometry]
+        if self.mesh_type == "StructuredGrid":
+            mesh = pv.StructuredGrid()
+            mesh.SetDimensions(self.dimensions)
+            mesh.SetPoints(pv.vtk_points(geometry[0], deep=False))
+        elif self.mesh_type == "RectilinearGrid":
+            mesh = pv.RectilinearGrid()
+            mesh.SetDimensions(self.dimensions)
+            mesh.SetXCoordinates(numpy_to_vtk(geometry[0]))
+            mesh.SetYCoordinates(numpy_to_vtk(geometry[1]))
+            mesh.SetZCoordinates(numpy_to_vtk(geometry[2]))
+        else:
+            points, connectivity, offsets, cell_types = geometry
+            mesh = pv.UnstructuredGrid()
+            mesh.SetPoints(pv.vtk_points(points, deep=False))
+            cells = vtk.vtkCellArray()
+            offsets = np.concatenate(([0], offsets)).astype(np.int64)
+            cells.SetData(
+                numpy_to_vtkIdTypeArray(offsets, deep=True),
+                numpy_to_vtkIdTypeArray(connectivity.astype(np.int64), deep=True),
+            )
+            mesh.SetCells(numpy_to_vtk(cell_types.astype(np.uint8), deep=True), cells)
+        for association, data in (("cells", mesh.cell_data), ("points", mesh.point_data)):
+            for array_name, description in self.arrays[association].items():
+                if list_array_names is None or array_name in list_array_names:
+                    data[array_name] = self.__view__(description)
+        for array_name, description in self.arrays["field"].items():
+            mesh.field_data[array_name] = self.__view__(description)
+        return mesh
+
+
+# END OF CLASS DEFINITION
+
+
+def close_mapping(fn, file_map):
+    file_map.close()
+    maps = mapped_files.get(os.path.abspath(fn), weakref.WeakSet())
+    maps.discard(file_map)
+    if len(maps) == 0:
+        mapped_files.pop(os.path.abspath(fn), None)
+
+
+# COPY INTO MEMORY THE ARRAYS OF A MESH THAT ARE VIEWS OF A MEMORY-MAPPED FILE
+def copy_mapped_arrays(mesh, fn):
+    # Returns True if any array was copied. The mesh is modified in place
+    ranges = []
+    for file_map in list(mapped_files.get(os.path.abspath(fn), ())):
+        if not file_map.closed:
+            view = np.frombuffer(file_map, np.uint8)
+            ranges.append((view.ctypes.data, view.ctypes.data + view.nbytes))
+            del view
+
+    def mapped(array):
+        address = np.asarray(array).__array_interface__["data"][0]
+        return any(start <= address < end for start, end in ranges)
+
+    copied = False
+    if len(ranges) == 0:
+        return copied
+    for data in (mesh.cell_data, mesh.point_data, mesh.field_data):
+        for array_name in list(data):
+            if mapped(data[array_name]):
+                data[array_name] = np.array(data[array_name])
+                copied = True
+    if isinstance(mesh, pv.RectilinearGrid):
+        for axis in ("x", "y", "z"):
+            if mapped(getattr(mesh, axis)):
+                setattr(mesh, axis, np.array(getattr(mesh, axis)))
+                copied = True
+    elif mesh.GetPoints() is not None and mapped(mesh.points):
+        mesh.SetPoints(pv.vtk_points(np.array(mesh.points), deep=False))
+        copied = True
+    return copied
+
+
+# CLOSE THE MAPPINGS OF A FILE THAT ARE NOT USED ANY MORE
+def close_mappings(fn):  # True if the file is not mapped any more
+    for file_map in list(mapped_files.get(os.path.abspath(fn), ())):
+        try:
+            close_mapping(fn, file_map)
+        except BufferError:  # Some array is still a view of the file
+            pass
+    if len(mapped_files.get(os.path.abspath(fn), ())) > 0:
+        return False
+    mapped_files.pop(os.path.abspath(fn), None)  # The mappings may have been collected
+    return True
+
+
+# READ A VTK FILE
+def read_mesh(fn):
+    # Raw binary VTK XML files are memory-mapped, any other file is read with pv.read. The
+    # mapping stays open while the arrays of the mesh are used (see copy_mapped_arrays)
+    if fn[-4:].lower() in (".vts", ".vtr", ".vtu"):
+        reader = RawXMLReader(fn)
+        if reader.supported:
+            return reader.read()
+        reader.close()
+    return pv.read(fn)
+
+
+# READ A LIST OF POINTS: x, y, z IN THE FIRST THREE COLUMNS, SEPARATED BY COMMAS OR SPACES
+def read_point_list(fn):
+    # An optional header line (e.g. "x, y, z, value" of the point_cloud files) is skipped
+    with open(fn, "r") as f:
+        first_line = f.readline()
+    delimiter = "," if "," in first_line else None
+    try:
+        [float(field) for field in first_line.split(delimiter)[:3]]
+        header = 0
+    except ValueError:
+        header = 1
+    return np.loadtxt(fn, delimiter=delimiter, skiprows=header, usecols=(0, 1, 2), ndmin=2)
@@ -0,0 +1,158 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_registry (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+import collections
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+
+from collections.abc import MutableMapping
+
+
+# CLASS DEFINITION
+class MeshRegistry(MutableMapping):
+    # Dictionary of the opened MeshTally objects (file name -> object) with a memory budget.
+    # When the meshes in memory use more than memory_budget bytes, the least recently used
+    # ones are spilled to a temporary directory (see MeshTally.spill) and they are read again
+    # the next time they are used. The memory of an array shared by several meshes (e.g. the
+    # values of a translated copy) is only counted once. Spilling a mesh does not free the
+    # arrays that other meshes in memory also use: they are kept in memory, not saved, and
+    # shared again when the mesh is read again. They are only saved when no mesh in memory
+    # uses them any more.
+    def __init__(self, meshtals=(), memory_budget=None, directory=None):
+        # memory_budget in bytes, None for no limit
+        self.memory_budget = memory_budget
+        self.directory = directory  # Where the spill directory is created, temporary if None
+        self.spill_root = None
+        self.meshtals = collections.OrderedDict()  # The least recently used first
+        self.spilled_sizes = dict()  # file name -> bytes on disk
+        self.n_spills = 0
+        self.lock = threading.RLock()
+        self.update(meshtals)
+
+    def __getitem__(self, filename):
+        with self.lock:
+            meshtal = self.meshtals[filename]
+            self.meshtals.move_to_end(filename)
+            if not meshtal.resident:
+                meshtal.reload()
+                self.fit(keep=filename)
+            return meshtal
+
+    def __setitem__(self, filename, meshtal):
+        with self.lock:
+            self.forget_spill(filename)
+            self.meshtals[filename] = meshtal
+            self.meshtals.move_to_end(filename)
+            self.fit(keep=filename)
+
+    def __delitem__(self, filename):
+        with self.lock:
+            self.forget_spill(filename)
+            del self.meshtals[filename]
+
+    def __contains__(self, filename):  # Without reading a spilled mesh again
+        return filename in self.meshtals
+
+    def __iter__(self):
+        return iter(list(self.meshtals))
+
+    def __len__(self):
+        return len(self.meshtals)
+
+    def new_spill_directory(self):
+        if self.spill_root is None:
+            if self.directory is not None:
+                os.makedirs(self.directory, exist_ok=True)
+            self.spill_root = tempfile.mkdtemp(prefix="vtkconverter-", dir=self.directory)
+            # The spilled meshes are deleted with the registry or at the exit
+            weakref.finalize(self, shutil.rmtree, self.spill_root, True)
+        self.n_spills += 1
+        return os.path.join(self.spill_root, str(self.n_spills))
+
+    def forget_spill(self, filename):  # The copy on disk is not needed any more
+        meshtal = self.meshtals.get(filename)
+        self.spilled_sizes.pop(filename, None)
+        if meshtal is not None and meshtal.spill_directory is not None:
+            shutil.rmtree(meshtal.spill_directory, ignore_errors=True)
+            meshtal.spill_directory = None
+            meshtal.kept = dict()
+
+    # MEMORY OF THE MESHES THAT ARE IN MEMORY, IN BYTES
+    def memory_usage(self):
+        buffers = dict()
+        for meshtal in self.meshtals.values():
+            buffers.update(meshtal.memory_buffers())
+        return sum(buffers.values())
+
+    def resident_buffers(self, exclude=None):  # {address: bytes} of the meshes in memory
+        buffers = dict()
+        for filename, meshtal in self.meshtals.items():
+            if filename != exclude and meshtal.resident:
+                buffers.update(meshtal.memory_buffers())
+        return buffers
+
+    # SPILL THE LEAST RECENTLY USED MESHES UNTIL THE OTHERS FIT IN THE BUDGET
+    def fit(self, keep=None):  # keep: file name of the mesh being used, never spilled
+        if self.memory_budget is None:
+            return
+        with self.lock:
+            self.save_unused_kept()
+            for filename, meshtal in list(self.meshtals.items()):
+                if self.memory_usage() <= self.memory_budget:
+                    break
+                if filename == keep or not meshtal.resident:
+                    continue
+                if meshtal.spill_directory is not None:  # Spilled before, read again since
+                    shutil.rmtree(meshtal.spill_directory, ignore_errors=True)
+                shared = self.resident_buffers(exclude=filename)
+                size = meshtal.spill(self.new_spill_directory(), shared)
+                if size is not None:  # Mesh types that cannot be saved stay in memory
+                    self.spilled_sizes[filename] = size
+                    self.save_unused_kept()
+
+    # SAVE THE SHARED ARRAYS KEPT BY SPILLED MESHES THAT NO MESH IN MEMORY USES ANY MORE
+    def save_unused_kept(self):
+        resident = self.resident_buffers()
+        for filename, meshtal in self.meshtals.items():
+            if meshtal.resident:
+                continue
+            unused = [name for name, buffer in meshtal.kept.items() if buffer[0] not in resident]
+            if len(unused) > 0:
+                self.spilled_sizes[filename] = meshtal.save_kept(unused)
+
+    def usage_info(self):
+        spilled = [filename for filename, meshtal in self.meshtals.items() if not meshtal.resident]
+        disk = sum(self.spilled_sizes.get(filename, 0) for filename in spilled)
+        budget = "no limit"
+        if self.memory_budget is not None:
+            budget = f"{self.memory_budget / 1024**2:.1f} MB"
+        return (
+            f"Memory of the opened meshes: {self.memory_usage() / 1024**2:.1f} MB"
+            f" (budget: {budget}), {len(spilled)} of {len(self.meshtals)} spilled to disk"
+            f" ({disk / 1024**2:.1f} MB)"
+        )
+
+
+# END OF CLASS DEFINITION
@@ -0,0 +1,74 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_selection (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# Regions of interest of a mesh, as boolean masks of its cells and of its points. A cell is
+# selected by a box or a plane if its center is selected. The mesh itself is never copied:
+# the exporters and the statistics take only the rows of the masks.
+
+import numpy as np
+
+
+# CELLS OR POINTS INSIDE A BOX (x_min, x_max, y_min, y_max, z_min, z_max)
+def box_mask(coordinates, bounds):
+    mask = np.ones(len(coordinates), dtype=bool)
+    for i in range(3):
+        mask &= (coordinates[:, i] >= bounds[2 * i]) & (coordinates[:, i] <= bounds[2 * i + 1])
+    return mask
+
+
+# BOX OF A LATTICE: ONE RANGE OF INDICES PER AXIS, WITHOUT THE CENTERS OR POINTS OF THE MESH
+def lattice_box_masks(index, bounds):  # index: probe.LatticeIndex
+    masks = dict()
+    for values_type, axes in (("cells", index.centers), ("points", index.axes)):
+        x_mask, y_mask, z_mask = (np.zeros(len(axis), dtype=bool) for axis in axes)
+        for i, (axis, axis_mask) in enumerate(zip(axes, (x_mask, y_mask, z_mask))):
+            start = np.searchsorted(axis, bounds[2 * i], side="left")
+            end = np.searchsorted(axis, bounds[2 * i + 1], side="right")
+            axis_mask[start:end] = True
+        # x varies fastest, as in VTK
+        mask = np.logical_and.outer(np.logical_and.outer(z_mask, y_mask), x_mask)
+        masks[values_type] = mask.ravel()
+    return masks
+
+
+# CELLS OR POINTS ON THE SIDE OF A PLANE THE NORMAL POINTS TO
+def plane_mask(coordinates, origin, normal):
+    return (coordinates - np.asarray(origin, dtype=float)) @ np.asarray(normal, dtype=float) >= 0
+
+
+# VALUES BETWEEN TWO LIMITS (NONE FOR NO LIMIT), NaN IS NEVER SELECTED WITH A LIMIT
+def threshold_mask(values, lower=None, upper=None, component=None):
+    # The arrays with several components (vectors) are compared by their magnitude, or by
+    # one of their components
+    values = np.asarray(values)
+    if values.ndim > 1:
+        values = values.reshape((len(values), -1))
+        if component is None:
+            values = np.linalg.norm(values, axis=1)
+        else:
+            values = values[:, component]
+    mask = np.ones(len(values), dtype=bool)
+    if lower is not None:
+        mask &= values >= lower
+    if upper is not None:
+        mask &= values <= upper
+    return mask
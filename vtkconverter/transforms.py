@@ -0,0 +1,119 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_transforms (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+import numpy as np
+
+
+# ROTATION MATRIX OF A ROTATION AROUND X, THEN Y AND THEN Z (DEGREES)
+def rotation_matrix(theta_x=0, theta_y=0, theta_z=0):
+    cx, sx = np.cos(np.radians(theta_x)), np.sin(np.radians(theta_x))
+    cy, sy = np.cos(np.radians(theta_y)), np.sin(np.radians(theta_y))
+    cz, sz = np.cos(np.radians(theta_z)), np.sin(np.radians(theta_z))
+    rotation_x = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    rotation_y = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    rotation_z = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    return rotation_z @ rotation_y @ rotation_x
+
+
+# CLASS DEFINITION
+class Transform:
+    # Sequence of translations, rotations and scalings composed into one 4x4 affine matrix, so
+    # that a mesh is transformed in one pass whatever the number of operations:
+    #     Transform().rotate(0, 0, 30).translate(10, 0, 0).scale(100)
+    # The operations are applied in the order they are added. Each one is also kept, with the
+    # matrix of the operations up to it, to create the intermediate meshes when they are asked.
+    def __init__(self):
+        self.matrix = np.identity(4)
+        self.steps = []  # (name suffix, matrix of the transform up to this operation)
+
+    def add(self, name, matrix):
+        self.matrix = matrix @ self.matrix
+        self.steps.append((name, self.matrix))
+        return self
+
+    def translate(self, x=0, y=0, z=0):
+        matrix = np.identity(4)
+        matrix[:3, 3] = x, y, z
+        return self.add(f"+Trans({x},{y},{z})", matrix)
+
+    def rotate(self, theta_x=0, theta_y=0, theta_z=0):  # Around x, then y and then z (degrees)
+        matrix = np.identity(4)
+        matrix[:3, :3] = rotation_matrix(theta_x, theta_y, theta_z)
+        return self.add("+Rot({},{},{})".format(theta_x, theta_y, theta_z), matrix)
+
+    def scale(self, x=1, y=None, z=None):  # One factor, or one factor per axis
+        y = x if y is None else y
+        z = x if z is None else z
+        name = f"+Scale({x})" if x == y == z else f"+Scale({x},{y},{z})"
+        return self.add(name, np.diag([x, y, z, 1.0]))
+
+    @property
+    def name(self):  # Added to the file name of the transformed mesh
+        return "".join(name for name, _ in self.steps)
+
+    def intermediates(self):  # Transform up to every operation
+        for i in range(1, len(self.steps) + 1):
+            transform = Transform()
+            transform.steps = self.steps[:i]
+            transform.matrix = self.steps[i - 1][1]
+            yield transform
+
+    @property
+    def linear(self):
+        return self.matrix[:3, :3]
+
+    @property
+    def offset(self):
+        return self.matrix[:3, 3]
+
+    def is_identity(self):
+        return np.allclose(self.matrix, np.identity(4))
+
+    def is_translation(self):
+        return np.allclose(self.linear, np.identity(3))
+
+    def keeps_axes(self):  # Only positive scalings and translations: a grid stays rectilinear
+        linear = self.linear
+        return np.allclose(linear, np.diag(np.diag(linear))) and np.all(np.diag(linear) > 0)
+
+    def volume_factor(self):  # Ratio between the volume of a transformed cell and the original
+        return abs(np.linalg.det(self.linear))
+
+    # TRANSFORMED POINTS (OR CELL CENTERS) IN ONE VECTORIZED PASS
+    def apply(self, points):
+        points = np.asarray(points)
+        dtype = points.dtype if points.dtype.kind == "f" else float
+        if self.is_translation():
+            new_points = points + self.offset
+        else:
+            new_points = points @ self.linear.T
+            new_points += self.offset
+        return new_points.astype(dtype, copy=False)
+
+    def apply_axes(self, x, y, z):  # Axes of a RectilinearGrid, only if keeps_axes()
+        diagonal = np.diag(self.linear)
+        return tuple(
+            np.asarray(axis) * diagonal[i] + self.offset[i] for i, axis in enumerate((x, y, z))
+        )
+
+
+# END OF CLASS DEFINITION
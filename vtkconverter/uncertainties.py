@@ -0,0 +1,95 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_uncertainties (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# Pairs of value and relative error arrays, as written by MESH2VTK: "Value - Total" and
+# "Error - Total". The errors are relative (standard deviation / value) and the values of
+# different cells, or of different meshtals, are statistically independent:
+# - A value multiplied by a factor (e.g. the safety factor) keeps its relative error.
+# - A sum of values v_i (times weights w_i, e.g. the volumes of an integral) has the relative
+#   error sqrt(sum (w_i v_i r_i)^2) / |sum w_i v_i|, and an average the same one.
+
+import numpy as np
+
+VALUE_PREFIX = "Value"
+ERROR_PREFIX = "Error"
+
+
+# {VALUE ARRAY: ITS RELATIVE ERROR ARRAY} OF A LIST OF ARRAY NAMES
+def error_pairs(array_names):
+    names = set(array_names)
+    pairs = dict()
+    for name in array_names:
+        if name.startswith(VALUE_PREFIX):
+            error_name = ERROR_PREFIX + name[len(VALUE_PREFIX) :]
+            if error_name in names:
+                pairs[name] = error_name
+    return pairs
+
+
+def is_paired_error(array_name, array_names):  # Relative error array of a value array
+    return array_name in error_pairs(array_names).values()
+
+
+def error_name(value_name):  # Name of the error array of a new value array, None if invalid
+    if not value_name.startswith(VALUE_PREFIX):
+        return None
+    return ERROR_PREFIX + value_name[len(VALUE_PREFIX) :]
+
+
+# RELATIVE ERROR OF THE (WEIGHTED) SUMS OF THE COLUMNS OF VALUES
+def sum_relative_error(values, errors, weights=None):
+    sigma = values * errors
+    total = values
+    if weights is not None:
+        weights = np.reshape(weights, (-1,) + (1,) * (np.ndim(values) - 1))
+        sigma = sigma * weights
+        total = values * weights
+    return relative(np.sqrt(np.sum(np.square(sigma), axis=0)), np.sum(total, axis=0))
+
+
+def relative(sigma, total):  # sigma / |total|, 0 for a total of 0 (as MCNP)
+    sigma, total = np.asarray(sigma, dtype=float), np.abs(np.asarray(total, dtype=float))
+    return np.divide(sigma, total, out=np.zeros_like(sigma), where=total != 0)
+
+
+# CLASS DEFINITION
+class ErrorSum:
+    # Sum of several value arrays with relative errors, e.g. of several meshtals on the same
+    # grid, added term by term in place: only the sum, the variance and one buffer for the
+    # term being added are allocated, whatever the number of terms
+    def __init__(self, n_values):
+        self.total = np.zeros(n_values)
+        self.variance = np.zeros(n_values)
+        self.term = np.empty(n_values)
+
+    def add(self, values, errors, weight=1):
+        term = np.multiply(values, weight, out=self.term)
+        self.total += term
+        term *= errors  # Standard deviation of the term
+        np.square(term, out=term)
+        self.variance += term
+
+    def relative_error(self):
+        return relative(np.sqrt(self.variance), self.total)
+
+
+# END OF CLASS DEFINITION
@@ -0,0 +1,157 @@
+""""
+########################################################################################################
+# Copyright 2022 F4E | European Joint Undertaking for ITER and the Development                         #
+# of Fusion Energy (‘Fusion for Energy’). Licensed under the EUPL, Version 1.2                         #
+# or - as soon they will be approved by the European Commission - subsequent versions                  #
+# of the EUPL (the “Licence”). You may not use this work except in compliance                          #
+# with the Licence. You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl.html       #
+# Unless required by applicable law or agreed to in writing, software distributed                      #
+# under the Licence is distributed on an “AS IS” basis, WITHOUT WARRANTIES                             #
+# OR CONDITIONS OF ANY KIND, either express or implied. See the Licence permissions                    #
+# and limitations under the Licence.                                                                   #
+########################################################################################################
+"""
+
+# CODE: vtkConv_writers (module used in conjunction with vtkConverter)
+
+# LANGUAGE: PYTHON 3.7
+
+# AUTHOR/S: F4E Radiation-Transport
+
+# Copyright F4E 2022
+
+# Binary columnar output formats. The coordinates and all the selected arrays are written to a
+# single file, one column each, in full precision. The rows are received in blocks (2-D arrays
+# with one column per name) so that a file can be written while the mesh is read by slabs.
+# n_rows is the number of rows expected, the files get the rows actually received (fewer if
+# some rows were dropped while reading, e.g. by their relative error).
+
+import json
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+
+# Output format: (extension, optional module needed)
+COLUMNAR_FORMATS = {
+    "npz": (".npz", None),
+    "hdf5": (".h5", "h5py"),
+    "parquet": (".parquet", "pyarrow"),
+}
+
+
+def missing_dependency(out_format):  # Error message if the module of a format is missing
+    module = COLUMNAR_FORMATS[out_format][1]
+    if module is None:
+        return None
+    try:
+        __import__(module)
+    except ImportError:
+        return f"The '{out_format}' format needs '{module}'. Install it with: pip install {module}"
+    return None
+
+
+def column_names(list_array_names):  # The coordinates and then one column per array
+    return ["x", "y", "z"] + list(list_array_names)
+
+
+def duplicated_column(column_names, out_format=None):  # Error message if two columns clash
+    seen = dict()  # Name in the file: name of the column
+    for name in column_names:
+        stored_name = dataset_name(name) if out_format == "hdf5" else name
+        if stored_name in seen:
+            if name in ("x", "y", "z"):
+                return f'The array "{name}" has the name of a coordinate column, rename it'
+            if seen[stored_name] == name:
+                return f'The array "{name}" is given twice'
+            return (
+                f'The arrays "{seen[stored_name]}" and "{name}" are both written as'
+                f' "{stored_name}" in hdf5, rename one of them'
+            )
+        seen[stored_name] = name
+    return None
+
+
+def dataset_name(name):  # "/" would create a group, it is written as "-"
+    return str(name).replace("/", "-")
+
+
+def write_columnar(fn, out_format, column_names, n_rows, blocks, attributes):
+    if out_format == "npz":
+        write_npz(fn, column_names, n_rows, blocks, attributes)
+    elif out_format == "hdf5":
+        write_hdf5(fn, column_names, n_rows, blocks, attributes)
+    elif out_format == "parquet":
+        write_parquet(fn, column_names, blocks, attributes)
+
+
+# NUMPY .NPZ
+def write_npz(fn, column_names, n_rows, blocks, attributes):
+    # A zip archive can only receive one member at a time, so the columns are kept in temporary
+    # files while the blocks arrive and then copied into their .npy members
+    spills = [tempfile.TemporaryFile() for _ in column_names]
+    dtype = np.dtype(float)
+    n_received = 0
+    for block in blocks:
+        for j, spill in enumerate(spills):
+            spill.write(np.ascontiguousarray(block[:, j], dtype=dtype).tobytes())
+        n_received += len(block)
+    header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False}
+    header["shape"] = (n_received,)
+    with zipfile.ZipFile(fn, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, spill in zip(column_names, spills):
+            with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                np.lib.format.write_array_header_2_0(member, header)
+                spill.seek(0)
+                shutil.copyfileobj(spill, member)
+            spill.close()
+        with archive.open("__metadata__.npy", "w") as member:
+            np.lib.format.write_array(member, np.array(json.dumps(attributes)))
+
+
+# HDF5
+def write_hdf5(fn, column_names, n_rows, blocks, attributes, compression="gzip", level=4):
+    import h5py
+
+    with h5py.File(fn, "w") as f:
+        chunk_rows = max(1, min(n_rows, 2**16))
+        datasets = []
+        for name in column_names:
+            # The original name is saved as an attribute
+            dataset = f.create_dataset(
+                dataset_name(name),
+                shape=(n_rows,),
+                maxshape=(None,),
+                dtype=float,
+                chunks=(chunk_rows,),
+                compression=compression,
+                compression_opts=level,
+                shuffle=True,
+            )
+            dataset.attrs["name"] = name
+            datasets.append(dataset)
+        start = 0
+        for block in blocks:
+            end = start + len(block)
+            for j, dataset in enumerate(datasets):
+                dataset[start:end] = block[:, j]
+            start = end
+        if start != n_rows:
+            for dataset in datasets:
+                dataset.resize((start,))
+        for key, value in attributes.items():
+            f.attrs[key] = value
+
+
+# APACHE PARQUET
+def write_parquet(fn, column_names, blocks, attributes):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.float64()) for name in column_names])
+    schema = schema.with_metadata({"vtkconverter": json.dumps(attributes)})
+    with pq.ParquetWriter(fn, schema) as writer:
+        for block in blocks:  # One row group per block
+            columns = [pa.array(block[:, j]) for j in range(len(column_names))]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))